@@ -1,13 +1,50 @@
 from __future__ import annotations
 
-from consultorio.config import load_config
-from consultorio.db.connection import connect
+import argparse
+
+from consultorio.config import settings_provider
+from consultorio.db.connection import ConnectionManager
 from consultorio.db.schema import migrate
+from consultorio.db.tracing import SqlTracer, install_slow_log
+from consultorio.services.startup import StartupTimeline
 from consultorio.ui.main_window import run_main_window
 
 
-def main() -> None:
-    cfg = load_config()
-    conn = connect(cfg.storage.db_path, wal_mode=cfg.storage.wal_mode)
-    migrate(conn)
-    run_main_window(cfg, conn)
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="consultorio")
+    ap.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="imprime los tiempos del arranque (config, migrate, primer pintado, datos)",
+    )
+    ap.add_argument(
+        "--trace-sql",
+        action="store_true",
+        help="mide cada consulta (Ctrl+Shift+D) y registra las lentas",
+    )
+    args = ap.parse_args(argv)
+
+    timeline = StartupTimeline()
+    settings = settings_provider()
+    cfg = settings.get()
+    timeline.mark("config")
+
+    diag = cfg.diagnostics
+    tracer = None
+    if args.trace_sql or diag.sql_trace:
+        tracer = SqlTracer(slow_ms=diag.slow_query_ms, recent=diag.recent_queries)
+        install_slow_log(diag.slow_log)
+
+    db = ConnectionManager(cfg.storage.db_path, wal_mode=cfg.storage.wal_mode, tracer=tracer)
+    try:
+        migrate(db.writer)
+        timeline.mark("migrate")
+        run_main_window(
+            settings,
+            db,
+            timeline=timeline,
+            profile_startup=args.profile_startup,
+            tracer=tracer,
+        )
+    finally:
+        db.close()
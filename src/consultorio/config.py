@@ -1,17 +1,32 @@
 from __future__ import annotations
 
+import logging
+import os
+import threading
+from collections.abc import Callable
 from dataclasses import dataclass
+from functools import cached_property
 from pathlib import Path
 from typing import Any
 
 import yaml
 
+log = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_PATH = "config/config.yaml"
+
 
 @dataclass(frozen=True)
 class StorageConfig:
     db_path: Path
     backups_dir: Path
     wal_mode: bool = True
+    backup_interval_minutes: int = 0  # 0 = sin respaldo programado
+    backup_on_exit: bool = False
+    # Retención abuelo-padre-hijo del almacén de respaldos
+    keep_daily: int = 7
+    keep_weekly: int = 4
+    keep_monthly: int = 12
 
 
 @dataclass(frozen=True)
@@ -29,6 +44,11 @@ class ClinicConfig:
     histology_centers: list[str]
     limits: ClinicLimits
 
+    # Búsqueda O(1) para validar (calculada una vez por instancia)
+    @cached_property
+    def payment_method_set(self) -> frozenset[str]:
+        return frozenset(self.payment_methods)
+
 
 @dataclass(frozen=True)
 class DashboardConfig:
@@ -39,6 +59,18 @@ class DashboardConfig:
 class AppConfig:
     title: str = "Consultorio - Offline"
     locale: str = "es_VE"
+    # Búsqueda de pacientes mientras se escribe
+    search_debounce_ms: int = 250
+    search_cache_size: int = 32
+
+
+@dataclass(frozen=True)
+class DiagnosticsConfig:
+    # Instrumentación de SQL (también con --trace-sql); apagada no cuesta nada
+    sql_trace: bool = False
+    slow_query_ms: float = 100.0
+    recent_queries: int = 200
+    slow_log: Path = Path("logs/sql_lentas.log")
 
 
 @dataclass(frozen=True)
@@ -47,13 +79,14 @@ class Settings:
     storage: StorageConfig
     clinic: ClinicConfig
     dashboard: DashboardConfig
+    diagnostics: DiagnosticsConfig = DiagnosticsConfig()
 
 
 def _as_path(p: str) -> Path:
     return Path(p).resolve()
 
 
-def load_config(path: str | Path = "config/config.yaml") -> Settings:
+def load_config(path: str | Path = DEFAULT_CONFIG_PATH) -> Settings:
     with open(path, "r", encoding="utf-8") as f:
         raw: dict[str, Any] = yaml.safe_load(f) or {}
 
@@ -61,8 +94,10 @@ def load_config(path: str | Path = "config/config.yaml") -> Settings:
     storage_raw = raw.get("storage", {}) or {}
     clinic_raw = raw.get("clinic", {}) or {}
     dash_raw = raw.get("dashboard", {}) or {}
+    diag_raw = raw.get("diagnostics", {}) or {}
 
     limits_raw = clinic_raw.get("limits", {}) or {}
+    retention_raw = storage_raw.get("retention", {}) or {}
     limits = ClinicLimits(
         max_cytologies_per_visit=int(limits_raw.get("max_cytologies_per_visit", 3)),
         max_biopsies_per_visit=int(limits_raw.get("max_biopsies_per_visit", 1)),
@@ -81,11 +116,93 @@ def load_config(path: str | Path = "config/config.yaml") -> Settings:
         db_path=_as_path(storage_raw.get("db_path", "./data/consultorio.db")),
         backups_dir=_as_path(storage_raw.get("backups_dir", "./backups")),
         wal_mode=bool(storage_raw.get("wal_mode", True)),
+        backup_interval_minutes=int(storage_raw.get("backup_interval_minutes", 0)),
+        backup_on_exit=bool(storage_raw.get("backup_on_exit", False)),
+        keep_daily=int(retention_raw.get("daily", 7)),
+        keep_weekly=int(retention_raw.get("weekly", 4)),
+        keep_monthly=int(retention_raw.get("monthly", 12)),
     )
 
     dash = DashboardConfig(overdue_days=int(dash_raw.get("overdue_days", 30)))
     app = AppConfig(
         title=str(app_raw.get("title", "Consultorio - Offline")),
         locale=str(app_raw.get("locale", "es_VE")),
+        search_debounce_ms=int(app_raw.get("search_debounce_ms", 250)),
+        search_cache_size=int(app_raw.get("search_cache_size", 32)),
+    )
+    diagnostics = DiagnosticsConfig(
+        sql_trace=bool(diag_raw.get("sql_trace", False)),
+        slow_query_ms=float(diag_raw.get("slow_query_ms", 100.0)),
+        recent_queries=int(diag_raw.get("recent_queries", 200)),
+        slow_log=_as_path(diag_raw.get("slow_log", "./logs/sql_lentas.log")),
+    )
+    return Settings(
+        app=app, storage=storage, clinic=clinic, dashboard=dash, diagnostics=diagnostics
     )
-    return Settings(app=app, storage=storage, clinic=clinic, dashboard=dash)
+
+
+class SettingsProvider:
+    """
+    Settings compartidos por todo el proceso:
+    - el YAML se parsea una vez (ruta absoluta: no depende del cwd posterior)
+    - get() devuelve la misma instancia; reload_if_changed() solo re-parsea si
+      cambió el mtime del archivo y avisa a `on_change`
+    - si el YAML nuevo no se puede leer se conserva el anterior
+    """
+
+    def __init__(
+        self,
+        path: str | Path = DEFAULT_CONFIG_PATH,
+        *,
+        on_change: Callable[[Settings], None] | None = None,
+    ) -> None:
+        self.path = Path(path).resolve()
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        self._settings: Settings | None = None
+        self._mtime_ns: int | None = None
+
+    def _mtime(self) -> int | None:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def get(self) -> Settings:
+        with self._lock:
+            if self._settings is None:
+                self._mtime_ns = self._mtime()
+                self._settings = load_config(self.path)
+            return self._settings
+
+    def reload_if_changed(self) -> bool:
+        """Re-lee el YAML si cambió en disco. True si hay Settings nuevos."""
+        with self._lock:
+            if self._settings is None:
+                return False
+            mtime = self._mtime()
+            if mtime is None or mtime == self._mtime_ns:
+                return False
+            self._mtime_ns = mtime
+            try:
+                settings = load_config(self.path)
+            except Exception:
+                log.exception("No se pudo recargar %s; se conserva la configuración", self.path)
+                return False
+            self._settings = settings
+        if self.on_change is not None:
+            self.on_change(settings)
+        return True
+
+
+_provider: SettingsProvider | None = None
+_provider_lock = threading.Lock()
+
+
+def settings_provider() -> SettingsProvider:
+    """El proveedor del proceso (config/config.yaml relativo al cwd del arranque)."""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = SettingsProvider()
+        return _provider
@@ -1,10 +1,164 @@
 from __future__ import annotations
 
+import logging
+import os
 import sqlite3
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
 from pathlib import Path
 
+from consultorio.db.connection import connect_readonly
 
-def backup_sqlite(conn: sqlite3.Connection, backup_path: Path) -> None:
+log = logging.getLogger(__name__)
+
+# Páginas copiadas por paso: pequeño para soltar el lock de lectura seguido
+DEFAULT_PAGES_PER_STEP = 256
+DEFAULT_STEP_SLEEP = 0.005
+
+
+class BackupCancelled(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class BackupProgress:
+    remaining: int
+    total: int
+
+    @property
+    def fraction(self) -> float:
+        if self.total <= 0:
+            return 0.0
+        return max(0.0, min(1.0, (self.total - self.remaining) / self.total))
+
+
+ProgressFn = Callable[[BackupProgress], None]
+
+
+def backup_sqlite(
+    conn: sqlite3.Connection,
+    backup_path: Path,
+    *,
+    pages: int = -1,
+    progress: Callable[[int, int, int], object] | None = None,
+    sleep: float = 0.250,
+) -> None:
     backup_path.parent.mkdir(parents=True, exist_ok=True)
-    with sqlite3.connect(backup_path) as dst:
-        conn.backup(dst)
+    dst = sqlite3.connect(backup_path)
+    try:
+        conn.backup(dst, pages=pages, progress=progress, sleep=sleep)
+    finally:
+        dst.close()
+
+
+def backup_filename(now: datetime | None = None) -> str:
+    # Con microsegundos: "Respaldar ahora" en el mismo segundo que el programado
+    # no pisa el archivo del otro
+    return f"consultorio-{(now or datetime.now()).strftime('%Y%m%d-%H%M%S-%f')}.db"
+
+
+class BackupJob:
+    """
+    Respaldo en línea incremental en un hilo aparte:
+    - copia `pages_per_step` páginas por paso (Connection.backup pages/progress/sleep)
+    - usa su propia conexión de solo lectura (no toca la conexión de la UI)
+    - escribe a un .tmp y lo renombra al terminar (nunca queda un respaldo a medias)
+    - cancelable: el callback de progreso aborta el paso siguiente
+
+    `on_progress`/`on_done` se llaman desde el hilo del respaldo: la UI debe
+    pasarlos a su hilo (ver BackupStatusBar).
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        dest_dir: Path,
+        *,
+        filename: str | None = None,
+        pages_per_step: int = DEFAULT_PAGES_PER_STEP,
+        sleep: float = DEFAULT_STEP_SLEEP,
+        on_progress: ProgressFn | None = None,
+        on_done: Callable[[BackupJob], None] | None = None,
+    ) -> None:
+        self.db_path = db_path
+        self.dest_dir = dest_dir
+        self.dest_path = dest_dir / (filename or backup_filename())
+        self.pages_per_step = max(1, int(pages_per_step))
+        self.sleep = sleep
+        self.on_progress = on_progress
+        self.on_done = on_done
+
+        self.error: BaseException | None = None
+        self.cancelled = False
+        self._finished = False
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    # ---------------- Control ----------------
+
+    def start(self) -> BackupJob:
+        self._thread = threading.Thread(target=self.run, name="consultorio-backup", daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self._done.wait(timeout)
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def ok(self) -> bool:
+        return self._finished and self.error is None and not self.cancelled
+
+    # ---------------- Trabajo ----------------
+
+    def _progress(self, _status: int, remaining: int, total: int) -> None:
+        if self._cancel.is_set():
+            raise BackupCancelled()
+        if self.on_progress:
+            self.on_progress(BackupProgress(remaining=remaining, total=total))
+
+    def run(self) -> None:
+        tmp = self.dest_path.with_name(f".{self.dest_path.name}.tmp")
+        try:
+            self.dest_dir.mkdir(parents=True, exist_ok=True)
+            src = connect_readonly(self.db_path)
+            try:
+                backup_sqlite(
+                    src,
+                    tmp,
+                    pages=self.pages_per_step,
+                    progress=self._progress,
+                    sleep=self.sleep,
+                )
+            finally:
+                src.close()
+            os.replace(tmp, self.dest_path)
+            log.info("Respaldo creado: %s", self.dest_path)
+        except BackupCancelled:
+            self.cancelled = True
+            log.info("Respaldo cancelado: %s", self.dest_path)
+        except BaseException as e:  # reportado vía on_done / .error
+            self.error = e
+            log.exception("Falló el respaldo %s", self.dest_path)
+        finally:
+            if tmp.exists():
+                try:
+                    tmp.unlink()
+                except OSError:
+                    pass
+            self._finished = True
+            try:
+                if self.on_done:
+                    self.on_done(self)
+            finally:
+                # wait() incluye el post-proceso de on_done (p.ej. ingreso al almacén)
+                self._done.set()
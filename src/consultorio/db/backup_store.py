@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import zlib
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+# Bloque de deduplicación: múltiplo del tamaño de página de SQLite.
+# 64 KiB = 16 páginas de 4 KiB: buen balance entre dedup y cantidad de archivos.
+DEFAULT_CHUNK_SIZE = 64 * 1024
+_TS_FORMAT = "%Y%m%d-%H%M%S"
+
+
+class BackupStoreError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    snapshot_id: str
+    created_at: datetime
+    size: int
+    chunk_size: int
+    chunks: list[str]
+    sha256: str
+
+    def to_json(self) -> dict[str, object]:
+        return {
+            "id": self.snapshot_id,
+            "created_at": self.created_at.isoformat(timespec="seconds"),
+            "size": self.size,
+            "chunk_size": self.chunk_size,
+            "chunks": self.chunks,
+            "sha256": self.sha256,
+        }
+
+    @classmethod
+    def from_json(cls, raw: dict[str, object]) -> Snapshot:
+        return cls(
+            snapshot_id=str(raw["id"]),
+            created_at=datetime.fromisoformat(str(raw["created_at"])),
+            size=int(raw["size"]),  # type: ignore[call-overload]
+            chunk_size=int(raw["chunk_size"]),  # type: ignore[call-overload]
+            chunks=[str(h) for h in raw["chunks"]],  # type: ignore[attr-defined]
+            sha256=str(raw["sha256"]),
+        )
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """Abuelo-padre-hijo: el más reciente de cada día / semana ISO / mes."""
+
+    daily: int = 7
+    weekly: int = 4
+    monthly: int = 12
+
+    def keep(self, snapshots: list[Snapshot]) -> set[str]:
+        ordered = sorted(snapshots, key=lambda s: s.created_at, reverse=True)
+        keep: set[str] = set()
+        for limit, bucket in (
+            (self.daily, lambda d: d.date()),
+            (self.weekly, lambda d: d.isocalendar()[:2]),
+            (self.monthly, lambda d: (d.year, d.month)),
+        ):
+            seen: list[object] = []
+            for s in ordered:
+                b = bucket(s.created_at)
+                if b in seen:
+                    continue
+                if len(seen) >= limit:
+                    break
+                seen.append(b)
+                keep.add(s.snapshot_id)
+        return keep
+
+
+class BackupStore:
+    """
+    Almacén de respaldos con deduplicación por bloques:
+    - chunks/ab/<sha256>: bloque fijo comprimido con zlib (se guarda una sola vez)
+    - snapshots/<id>.json: manifiesto con la lista ordenada de hashes
+    Un respaldo nuevo solo escribe los bloques que cambiaron desde los anteriores.
+    """
+
+    def __init__(self, root: Path, *, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        self.root = root
+        self.chunk_size = int(chunk_size)
+        self.chunks_dir = root / "chunks"
+        self.snapshots_dir = root / "snapshots"
+
+    # ---------------- Rutas ----------------
+
+    def _chunk_path(self, digest: str) -> Path:
+        return self.chunks_dir / digest[:2] / digest
+
+    def _manifest_path(self, snapshot_id: str) -> Path:
+        return self.snapshots_dir / f"{snapshot_id}.json"
+
+    # ---------------- Escritura ----------------
+
+    def add_snapshot(self, db_file: Path, *, created_at: datetime | None = None) -> Snapshot:
+        """Ingresa una copia consistente de la DB (p.ej. la salida de BackupJob)."""
+        created_at = (created_at or datetime.now()).replace(microsecond=0)
+        snapshot_id = created_at.strftime(_TS_FORMAT)
+        n = 1
+        while self._manifest_path(snapshot_id).exists():
+            n += 1
+            snapshot_id = f"{created_at.strftime(_TS_FORMAT)}-{n}"
+
+        whole = hashlib.sha256()
+        chunks: list[str] = []
+        size = 0
+        written = 0
+        with open(db_file, "rb") as f:
+            while block := f.read(self.chunk_size):
+                whole.update(block)
+                size += len(block)
+                digest = hashlib.sha256(block).hexdigest()
+                chunks.append(digest)
+                if self._write_chunk(digest, block):
+                    written += 1
+
+        snap = Snapshot(
+            snapshot_id=snapshot_id,
+            created_at=created_at,
+            size=size,
+            chunk_size=self.chunk_size,
+            chunks=chunks,
+            sha256=whole.hexdigest(),
+        )
+        self.snapshots_dir.mkdir(parents=True, exist_ok=True)
+        _atomic_write(self._manifest_path(snapshot_id), json.dumps(snap.to_json()).encode())
+        log.info(
+            "Snapshot %s: %d bloques, %d nuevos (%.1f MiB)",
+            snapshot_id,
+            len(chunks),
+            written,
+            size / (1024 * 1024),
+        )
+        return snap
+
+    def _write_chunk(self, digest: str, block: bytes) -> bool:
+        path = self._chunk_path(digest)
+        if path.exists():
+            return False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _atomic_write(path, zlib.compress(block, 6))
+        return True
+
+    # ---------------- Lectura ----------------
+
+    def list_snapshots(self) -> list[Snapshot]:
+        if not self.snapshots_dir.exists():
+            return []
+        snaps = [self.get(p.stem) for p in self.snapshots_dir.glob("*.json")]
+        return sorted(snaps, key=lambda s: s.created_at)
+
+    def get(self, snapshot_id: str) -> Snapshot:
+        path = self._manifest_path(snapshot_id)
+        if not path.exists():
+            raise BackupStoreError(f"No existe el snapshot '{snapshot_id}'.")
+        return Snapshot.from_json(json.loads(path.read_text(encoding="utf-8")))
+
+    def iter_blocks(self, snap: Snapshot) -> Iterator[bytes]:
+        for digest in snap.chunks:
+            path = self._chunk_path(digest)
+            if not path.exists():
+                raise BackupStoreError(
+                    f"Falta el bloque {digest} del snapshot {snap.snapshot_id}."
+                )
+            yield zlib.decompress(path.read_bytes())
+
+    def restore(self, snapshot_id: str, dest: Path) -> Path:
+        """Reconstruye el snapshot en `dest` (vía .tmp + rename) y valida su sha256."""
+        snap = self.get(snapshot_id)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(f".{dest.name}.tmp")
+        whole = hashlib.sha256()
+        try:
+            with open(tmp, "wb") as out:
+                for block in self.iter_blocks(snap):
+                    whole.update(block)
+                    out.write(block)
+                out.flush()
+                os.fsync(out.fileno())
+            if whole.hexdigest() != snap.sha256:
+                raise BackupStoreError(f"Checksum inválido al restaurar {snapshot_id}.")
+            os.replace(tmp, dest)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        return dest
+
+    def verify(self, snapshot_id: str) -> str:
+        """Restaura a un temporal y corre PRAGMA integrity_check. Retorna 'ok' si está sano."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = self.restore(snapshot_id, Path(tmp_dir) / "verify.db")
+            conn = sqlite3.connect(path)
+            try:
+                rows = conn.execute("PRAGMA integrity_check").fetchall()
+            finally:
+                conn.close()
+        return "\n".join(str(r[0]) for r in rows)
+
+    # ---------------- Retención ----------------
+
+    def apply_retention(self, policy: RetentionPolicy) -> list[str]:
+        """Borra los snapshots fuera de la política y luego los bloques huérfanos."""
+        snaps = self.list_snapshots()
+        keep = policy.keep(snaps)
+        removed = [s.snapshot_id for s in snaps if s.snapshot_id not in keep]
+        for snapshot_id in removed:
+            self._manifest_path(snapshot_id).unlink()
+        if removed:
+            self.gc()
+        return removed
+
+    def gc(self) -> int:
+        live: set[str] = set()
+        for s in self.list_snapshots():
+            live.update(s.chunks)
+        n = 0
+        if not self.chunks_dir.exists():
+            return 0
+        for path in self.chunks_dir.glob("*/*"):
+            if path.name not in live and not path.name.endswith(".tmp"):
+                path.unlink()
+                n += 1
+        return n
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    tmp = path.with_name(f"{path.name}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+# ---------------- CLI: python -m consultorio.db.backup_store ----------------
+
+
+def main(argv: list[str] | None = None) -> int:
+    from consultorio.config import load_config
+    from consultorio.db.backup import BackupJob
+
+    parser = argparse.ArgumentParser(prog="python -m consultorio.db.backup_store")
+    parser.add_argument("--config", default="config/config.yaml")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("snapshot", help="respaldar la DB actual al almacén")
+    sub.add_parser("list", help="listar snapshots")
+    sub.add_parser("prune", help="aplicar la política de retención")
+    p_restore = sub.add_parser("restore", help="reconstruir un snapshot")
+    p_restore.add_argument("snapshot_id")
+    p_restore.add_argument("dest", type=Path)
+    p_restore.add_argument("--no-verify", action="store_true")
+    p_verify = sub.add_parser("verify", help="restaurar a temporal + integrity_check")
+    p_verify.add_argument("snapshot_id")
+    args = parser.parse_args(argv)
+
+    cfg = load_config(args.config)
+    store = BackupStore(cfg.storage.backups_dir / "store")
+    policy = RetentionPolicy(
+        daily=cfg.storage.keep_daily,
+        weekly=cfg.storage.keep_weekly,
+        monthly=cfg.storage.keep_monthly,
+    )
+
+    if args.cmd == "snapshot":
+        job = BackupJob(cfg.storage.db_path, cfg.storage.backups_dir)
+        job.run()
+        if not job.ok:
+            print(f"Error: {job.error}")
+            return 1
+        snap = store.add_snapshot(job.dest_path)
+        job.dest_path.unlink()
+        print(snap.snapshot_id)
+        for snapshot_id in store.apply_retention(policy):
+            print(f"eliminado {snapshot_id}")
+    elif args.cmd == "list":
+        for s in store.list_snapshots():
+            print(f"{s.snapshot_id}\t{s.created_at:%Y-%m-%d %H:%M:%S}\t{s.size} bytes")
+    elif args.cmd == "prune":
+        for snapshot_id in store.apply_retention(policy):
+            print(f"eliminado {snapshot_id}")
+    elif args.cmd == "restore":
+        dest = store.restore(args.snapshot_id, args.dest)
+        if not args.no_verify:
+            conn = sqlite3.connect(dest)
+            try:
+                result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+            finally:
+                conn.close()
+            print(f"integrity_check: {result}")
+            if result != "ok":
+                return 1
+        print(dest)
+    elif args.cmd == "verify":
+        result = store.verify(args.snapshot_id)
+        print(f"integrity_check: {result}")
+        return 0 if result == "ok" else 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,15 +1,248 @@
 from __future__ import annotations
 
+import queue
 import sqlite3
+import threading
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Any, cast
 
+from consultorio.db.tracing import SqlTracer, TracedConnection
 
-def connect(db_path: Path, *, wal_mode: bool = True) -> sqlite3.Connection:
+
+def _open(target: str | Path, tracer: SqlTracer | None, **kwargs: Any) -> sqlite3.Connection:
+    # Sin tracer: sqlite3.Connection tal cual, sin ningún costo por consulta
+    if tracer is None:
+        return cast(sqlite3.Connection, sqlite3.connect(target, **kwargs))
+    conn = cast(TracedConnection, sqlite3.connect(target, factory=TracedConnection, **kwargs))
+    conn.tracer = tracer
+    return conn
+
+
+def connect(
+    db_path: Path,
+    *,
+    wal_mode: bool = True,
+    check_same_thread: bool = True,
+    tracer: SqlTracer | None = None,
+) -> sqlite3.Connection:
     db_path.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(db_path)
+    conn = _open(db_path, tracer, check_same_thread=check_same_thread)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys=ON;")
     if wal_mode:
         conn.execute("PRAGMA journal_mode=WAL;")
         conn.execute("PRAGMA synchronous=NORMAL;")
     return conn
+
+
+def connect_readonly(db_path: Path, *, tracer: SqlTracer | None = None) -> sqlite3.Connection:
+    """Conexión de solo lectura (URI mode=ro + query_only) para el pool de lectores."""
+    uri = f"{db_path.resolve().as_uri()}?mode=ro"
+    conn = _open(uri, tracer, uri=True, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA query_only=ON;")
+    return conn
+
+
+class _Rows:
+    """Resultado ya materializado de una lectura hecha en un lector del pool.
+
+    Imita la parte de sqlite3.Cursor que usan los repos (fetchone/fetchall/iter),
+    así el lector vuelve al pool apenas termina la consulta.
+    """
+
+    def __init__(self, rows: list[Any], description: Any) -> None:
+        self._rows = rows
+        self._pos = 0
+        self.description = description
+
+    def fetchone(self) -> Any:
+        if self._pos >= len(self._rows):
+            return None
+        row = self._rows[self._pos]
+        self._pos += 1
+        return row
+
+    def fetchall(self) -> list[Any]:
+        rows = self._rows[self._pos :]
+        self._pos = len(self._rows)
+        return rows
+
+    def fetchmany(self, size: int = 1) -> list[Any]:
+        rows = self._rows[self._pos : self._pos + size]
+        self._pos += len(rows)
+        return rows
+
+    def __iter__(self) -> Iterator[Any]:
+        while self._pos < len(self._rows):
+            yield self.fetchone()
+
+
+# Espera máxima por un lector libre antes de leer en el escritor
+_CHECKOUT_TIMEOUT_S = 2.0
+
+
+def _is_plain_select(sql: str) -> bool:
+    head = sql.lstrip().split(None, 1)
+    return bool(head) and head[0].upper() == "SELECT"
+
+
+class ConnectionManager:
+    """
+    Un escritor serializado + pool pequeño de lectores de solo lectura (WAL).
+
+    Expone la misma API que usan los repos de sqlite3.Connection
+    (execute/executemany/commit/rollback), así que se puede pasar tal cual
+    a PatientRepo/StudyRepo/VisitRepo:
+    - SELECT -> lector del pool, salvo que el mismo hilo tenga una escritura
+      abierta (ahí va al escritor para ver lo propio); los demás hilos siguen
+      leyendo la última versión confirmada sin esperar al lock
+    - todo lo demás -> escritor
+    Sin WAL (o sin archivo) todo va al escritor: los lectores bloquearían igual.
+    Con `tracer` todas sus conexiones (escritor y lectores) quedan instrumentadas.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        *,
+        wal_mode: bool = True,
+        readers: int = 2,
+        tracer: SqlTracer | None = None,
+    ) -> None:
+        self.db_path = db_path
+        self.wal_mode = wal_mode
+        self.tracer = tracer
+        # El escritor se comparte entre hilos; _write_lock lo serializa.
+        self._writer = connect(
+            db_path, wal_mode=wal_mode, check_same_thread=False, tracer=tracer
+        )
+        self._write_lock = threading.RLock()
+        # Hilo que usó el escritor por última vez: dueño de su transacción abierta
+        self._owner: int | None = None
+        self._held = False  # el dueño retiene el lock hasta cerrar su transacción
+        self._max_readers = max(0, int(readers)) if wal_mode else 0
+        self._pool: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._opened: list[sqlite3.Connection] = []
+        self._pool_lock = threading.Lock()
+        self._closed = False
+
+    # ---------------- Handles ----------------
+
+    @property
+    def writer(self) -> sqlite3.Connection:
+        return self._writer
+
+    @property
+    def write_lock(self) -> threading.RLock:
+        return self._write_lock
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._writer.in_transaction
+
+    @property
+    def owns_write(self) -> bool:
+        """True si la transacción abierta en el escritor es de este hilo."""
+        return self._writer.in_transaction and self._owner == threading.get_ident()
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        """
+        Acceso exclusivo al escritor (para varias sentencias seguidas). Si al salir
+        queda una transacción abierta (DML sin commit), el hilo retiene el lock
+        hasta su commit/rollback: otro hilo no puede escribir ni confirmar en medio.
+        """
+        with self._write_lock:
+            self._owner = threading.get_ident()
+            try:
+                yield self._writer
+            finally:
+                self._hold_while_open()
+
+    def _hold_while_open(self) -> None:
+        # Con el lock tomado: una adquisición extra mientras dure la transacción
+        if self._writer.in_transaction and not self._held:
+            self._write_lock.acquire()
+            self._held = True
+        elif not self._writer.in_transaction and self._held:
+            self._held = False
+            self._write_lock.release()
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Presta un lector del pool; sin pool (o sin lectores libres) cae al escritor."""
+        conn = self._checkout() if self._max_readers else None
+        if conn is None:
+            with self.write() as w:
+                yield w
+            return
+
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._pool.put(conn)
+
+    def _checkout(self) -> sqlite3.Connection | None:
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._pool_lock:
+            if len(self._opened) < self._max_readers:
+                conn = connect_readonly(self.db_path, tracer=self.tracer)
+                self._opened.append(conn)
+                return conn
+        try:
+            return self._pool.get(timeout=_CHECKOUT_TIMEOUT_S)
+        except queue.Empty:
+            return None  # todos prestados (p.ej. lecturas largas): se usa el escritor
+
+    # ---------------- API tipo sqlite3.Connection ----------------
+
+    def execute(self, sql: str, params: Sequence[Any] | dict[str, Any] = ()) -> Any:
+        if self._max_readers and _is_plain_select(sql) and not self.owns_write:
+            with self.reader() as conn:
+                cur = conn.execute(sql, params)
+                return _Rows(cur.fetchall(), cur.description)
+        with self.write() as w:
+            was_open = w.in_transaction
+            try:
+                return w.execute(sql, params)
+            except sqlite3.Error:
+                # Falló la sentencia que abrió la transacción implícita: no queda
+                # nada que confirmar y así no se retiene el escritor
+                if not was_open and w.in_transaction:
+                    w.rollback()
+                raise
+
+    def executemany(self, sql: str, seq: Any) -> sqlite3.Cursor:
+        with self.write() as w:
+            return w.executemany(sql, seq)
+
+    def commit(self) -> None:
+        with self.write() as w:
+            w.commit()
+
+    def rollback(self) -> None:
+        with self.write() as w:
+            w.rollback()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        with self._pool_lock:
+            for conn in self._opened:
+                conn.close()
+            self._opened.clear()
+        with self._write_lock:
+            self._writer.close()
+
+
+# Lo que aceptan los repos: una conexión simple (tests, scripts) o el manager.
+DbHandle = sqlite3.Connection | ConnectionManager
@@ -1,6 +1,15 @@
 from __future__ import annotations
 
+import logging
 import sqlite3
+import time
+from collections.abc import Callable
+from functools import lru_cache
+
+from consultorio.db.timestamps import SQL_NORMALIZE
+from consultorio.domain.text import fold
+
+log = logging.getLogger(__name__)
 
 
 _SCHEMA: list[str] = [
@@ -97,12 +106,28 @@ def _ensure_column(conn: sqlite3.Connection, table: str, col: str, col_def: str)
         conn.execute(f"ALTER TABLE {table} ADD COLUMN {col_def}")
 
 
-def migrate(conn: sqlite3.Connection) -> None:
-    conn.execute("PRAGMA foreign_keys = ON;")
+# ---------------- Registro de migraciones (PRAGMA user_version) ----------------
+
+Migration = Callable[[sqlite3.Connection], None]
+
+_MIGRATIONS: list[tuple[int, str, Migration]] = []
+
+
+def _migration(version: int, name: str) -> Callable[[Migration], Migration]:
+    def register(fn: Migration) -> Migration:
+        if _MIGRATIONS and version <= _MIGRATIONS[-1][0]:
+            raise RuntimeError(f"Migración {version} fuera de orden.")
+        _MIGRATIONS.append((version, name, fn))
+        return fn
 
+    return register
+
+
+@_migration(1, "esquema base")
+def _m001_base(conn: sqlite3.Connection) -> None:
+    # Idempotente: las DB creadas antes del versionado llegan con user_version=0
     for stmt in _SCHEMA:
         conn.execute(stmt)
-    conn.commit()
 
     # Backward-compatible adds (por si DB ya existía)
     _ensure_column(conn, "estudios", "resultado_editado_en", "resultado_editado_en TEXT")
@@ -120,4 +145,284 @@ def migrate(conn: sqlite3.Connection) -> None:
     # Opcional: índice para performance en listados
     conn.execute("CREATE INDEX IF NOT EXISTS idx_estudios_ordenado_en ON estudios(ordenado_en)")
 
-    conn.commit()
+
+# Columnas que se filtran/ordenan por rango: siempre en TS_FORMAT (hora local)
+_TS_COLUMNS: list[tuple[str, str]] = [
+    ("citas", "fecha_consulta"),
+    ("estudios", "ordenado_en"),
+    ("estudios", "enviado_en"),
+    ("estudios", "pagado_en"),
+    ("estudios", "recibido_en"),
+    ("estudios", "entregado_en"),
+]
+
+
+@_migration(2, "timestamps canónicos + índices por rango")
+def _m002_timestamps(conn: sqlite3.Connection) -> None:
+    # Normaliza valores viejos ('T', fracciones, solo fecha) al texto canónico;
+    # lo que no se pueda parsear se deja tal cual.
+    for table, col in _TS_COLUMNS:
+        norm = SQL_NORMALIZE.format(col=col)
+        conn.execute(
+            f"UPDATE {table} SET {col} = {norm} "
+            f"WHERE {col} IS NOT NULL AND {norm} IS NOT NULL AND {col} <> {norm}"
+        )
+
+    # Historial del paciente: WHERE paciente_id=? ORDER BY fecha_consulta DESC
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_citas_paciente_fecha ON citas(paciente_id, fecha_consulta)"
+    )
+
+
+@lru_cache(maxsize=1)
+def fts5_trigram_available() -> bool:
+    """¿Este build de SQLite trae FTS5 con tokenizer trigram? (probado en memoria)"""
+    probe = sqlite3.connect(":memory:")
+    try:
+        probe.execute("CREATE VIRTUAL TABLE t USING fts5(x, tokenize='trigram')")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        probe.close()
+
+
+def _create_pacientes_fts(conn: sqlite3.Connection, cols: str) -> None:
+    """Tabla FTS5 external-content sobre `pacientes` + triggers que la mantienen."""
+    new_vals = ", ".join(f"new.{c.strip()}" for c in cols.split(","))
+    old_vals = ", ".join(f"old.{c.strip()}" for c in cols.split(","))
+    conn.execute(
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS pacientes_fts USING fts5(
+            {cols},
+            content='pacientes', content_rowid='paciente_id', tokenize='trigram'
+        )"""
+    )
+    conn.execute(
+        f"""CREATE TRIGGER IF NOT EXISTS pacientes_fts_ai AFTER INSERT ON pacientes BEGIN
+            INSERT INTO pacientes_fts(rowid, {cols}) VALUES (new.paciente_id, {new_vals});
+        END"""
+    )
+    conn.execute(
+        f"""CREATE TRIGGER IF NOT EXISTS pacientes_fts_ad AFTER DELETE ON pacientes BEGIN
+            INSERT INTO pacientes_fts(pacientes_fts, rowid, {cols})
+            VALUES ('delete', old.paciente_id, {old_vals});
+        END"""
+    )
+    conn.execute(
+        f"""CREATE TRIGGER IF NOT EXISTS pacientes_fts_au AFTER UPDATE ON pacientes BEGIN
+            INSERT INTO pacientes_fts(pacientes_fts, rowid, {cols})
+            VALUES ('delete', old.paciente_id, {old_vals});
+            INSERT INTO pacientes_fts(rowid, {cols}) VALUES (new.paciente_id, {new_vals});
+        END"""
+    )
+    conn.execute("INSERT INTO pacientes_fts(pacientes_fts) VALUES ('rebuild')")
+
+
+_PACIENTES_FTS_TRIGGERS = ("pacientes_fts_ai", "pacientes_fts_ad", "pacientes_fts_au")
+
+
+def _drop_pacientes_fts(conn: sqlite3.Connection) -> None:
+    for trigger in _PACIENTES_FTS_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute("DROP TABLE IF EXISTS pacientes_fts")
+
+
+@_migration(3, "índice FTS5 de pacientes")
+def _m003_pacientes_fts(conn: sqlite3.Connection) -> None:
+    # Sin FTS5 no se crea nada: PatientRepo.search sigue por LIKE.
+    if not fts5_trigram_available():
+        log.warning("SQLite sin FTS5/trigram: la búsqueda de pacientes usará LIKE.")
+        return
+    _create_pacientes_fts(conn, "cedula, apellidos, nombres, telefono, comentario")
+
+
+# Columnas indexadas por pacientes_fts desde la migración 4
+_PACIENTES_FTS_COLS = "cedula, apellidos_norm, nombres_norm, telefono, comentario"
+
+
+@_migration(4, "nombres normalizados (sin acentos) para búsqueda")
+def _m004_nombres_norm(conn: sqlite3.Connection) -> None:
+    # Claves de búsqueda: las mantiene PatientRepo.create/update con domain.text.fold
+    _ensure_column(conn, "pacientes", "apellidos_norm", "apellidos_norm TEXT")
+    _ensure_column(conn, "pacientes", "nombres_norm", "nombres_norm TEXT")
+    _ensure_column(conn, "pacientes", "nombre_completo_norm", "nombre_completo_norm TEXT")
+
+    # Relleno con la misma fold() que usa el repo (no hay equivalente en SQL)
+    rows = conn.execute("SELECT paciente_id, apellidos, nombres FROM pacientes").fetchall()
+    conn.executemany(
+        """UPDATE pacientes SET apellidos_norm=?, nombres_norm=?, nombre_completo_norm=?
+           WHERE paciente_id=?""",
+        [(fold(ap), fold(no), fold(f"{ap} {no}"), pid) for pid, ap, no in rows],
+    )
+
+    # Búsqueda por prefijo (rango sobre el texto normalizado)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_pacientes_apellidos_norm "
+        "ON pacientes(apellidos_norm, nombres_norm)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_pacientes_nombres_norm "
+        "ON pacientes(nombres_norm, apellidos_norm)"
+    )
+
+    # FTS sobre los nombres normalizados (el trigram de este SQLite no quita acentos)
+    if fts5_trigram_available():
+        _drop_pacientes_fts(conn)
+        _create_pacientes_fts(conn, _PACIENTES_FTS_COLS)
+
+
+def sync_pacientes_fts(conn: sqlite3.Connection, version: int | None = None) -> None:
+    """
+    Ajusta la FTS al SQLite que abre la DB (puede no ser el que la migró):
+    - sin FTS5: quita los triggers, que harían fallar cada escritura en pacientes;
+      la tabla queda (no se puede borrar sin el módulo) y la búsqueda usa LIKE
+    - con FTS5: si faltan la tabla o sus triggers, los crea y reconstruye el índice
+    """
+    if (schema_version(conn) if version is None else version) < 4:
+        return  # todavía sin columnas *_norm: la migración 4 crea la FTS
+    names = {
+        str(r[0])
+        for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE name IN (?, ?, ?, ?)",
+            ("pacientes_fts", *_PACIENTES_FTS_TRIGGERS),
+        )
+    }
+    triggers = [t for t in _PACIENTES_FTS_TRIGGERS if t in names]
+    if fts5_trigram_available():
+        if len(names) == 1 + len(_PACIENTES_FTS_TRIGGERS):
+            return
+        log.info("Reconstruyendo pacientes_fts (faltaba la tabla o sus triggers).")
+        _in_transaction(conn, lambda: _create_pacientes_fts(conn, _PACIENTES_FTS_COLS))
+    elif triggers:
+        log.warning("SQLite sin FTS5/trigram: se quitan los triggers de pacientes_fts.")
+
+        def drop() -> None:
+            for trigger in triggers:
+                conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+
+        _in_transaction(conn, drop)
+
+
+def _in_transaction(conn: sqlite3.Connection, step: Callable[[], None]) -> None:
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN")
+    try:
+        step()
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+# Conteo exacto desde estudios (migración 5 y services.reporting.rebuild_study_counters)
+ESTUDIOS_COUNTERS_FILL = """
+    INSERT INTO estudios_counters (estado_actual, tipo, n)
+    SELECT estado_actual, tipo, COUNT(*) FROM estudios GROUP BY estado_actual, tipo
+"""
+
+
+@_migration(5, "contadores de estudios por estado/tipo")
+def _m005_estudios_counters(conn: sqlite3.Connection) -> None:
+    # Una fila por (estado, tipo): leer los totales no depende del histórico
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS estudios_counters (
+            estado_actual TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            n INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (estado_actual, tipo)
+        ) WITHOUT ROWID"""
+    )
+    conn.execute(
+        """CREATE TRIGGER IF NOT EXISTS estudios_counters_ai AFTER INSERT ON estudios BEGIN
+            INSERT INTO estudios_counters (estado_actual, tipo, n)
+            VALUES (new.estado_actual, new.tipo, 1)
+            ON CONFLICT (estado_actual, tipo) DO UPDATE SET n = n + 1;
+        END"""
+    )
+    conn.execute(
+        """CREATE TRIGGER IF NOT EXISTS estudios_counters_ad AFTER DELETE ON estudios BEGIN
+            UPDATE estudios_counters SET n = n - 1
+            WHERE estado_actual = old.estado_actual AND tipo = old.tipo;
+        END"""
+    )
+    conn.execute(
+        """CREATE TRIGGER IF NOT EXISTS estudios_counters_au
+        AFTER UPDATE OF estado_actual, tipo ON estudios
+        WHEN old.estado_actual IS NOT new.estado_actual OR old.tipo IS NOT new.tipo
+        BEGIN
+            UPDATE estudios_counters SET n = n - 1
+            WHERE estado_actual = old.estado_actual AND tipo = old.tipo;
+            INSERT INTO estudios_counters (estado_actual, tipo, n)
+            VALUES (new.estado_actual, new.tipo, 1)
+            ON CONFLICT (estado_actual, tipo) DO UPDATE SET n = n + 1;
+        END"""
+    )
+    conn.execute("DELETE FROM estudios_counters")
+    conn.execute(ESTUDIOS_COUNTERS_FILL)
+
+
+@_migration(6, "índices compuestos para paginar estudios")
+def _m006_estudios_page_indexes(conn: sqlite3.Connection) -> None:
+    # Filtro por estado/tipo + ORDER BY ordenado_en DESC sin ordenar en memoria;
+    # reemplazan a los índices de una sola columna (son prefijo de estos).
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_estudios_estado_ordenado "
+        "ON estudios(estado_actual, ordenado_en)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_estudios_tipo_ordenado ON estudios(tipo, ordenado_en)"
+    )
+    conn.execute("DROP INDEX IF EXISTS idx_estudios_estado_actual")
+    conn.execute("DROP INDEX IF EXISTS idx_estudios_tipo")
+
+
+def latest_version() -> int:
+    return _MIGRATIONS[-1][0] if _MIGRATIONS else 0
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return int(conn.execute("PRAGMA user_version").fetchone()[0])
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Aplica las migraciones pendientes según PRAGMA user_version.
+    - DB al día: solo lee user_version y revisa la FTS (DDL solo si no cuadra)
+    - Pendientes: todas en UNA transacción; si algo falla, no queda nada a medias
+    Retorna la versión final del esquema.
+    """
+    conn.execute("PRAGMA foreign_keys = ON;")
+
+    current = schema_version(conn)
+    target = latest_version()
+    if current >= target:
+        if current > target:
+            log.warning("La DB (v%s) es más nueva que la app (v%s).", current, target)
+        sync_pacientes_fts(conn, current)
+        return current
+
+    if conn.in_transaction:
+        conn.commit()
+
+    conn.execute("BEGIN")
+    try:
+        for version, name, step in _MIGRATIONS:
+            if version <= current:
+                continue
+            t0 = time.perf_counter()
+            step(conn)
+            log.info(
+                "Migración %03d (%s) aplicada en %.1f ms",
+                version,
+                name,
+                (time.perf_counter() - t0) * 1000,
+            )
+        conn.execute(f"PRAGMA user_version = {int(target)}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+    sync_pacientes_fts(conn, target)
+    return target
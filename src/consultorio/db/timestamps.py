@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+# Formato canónico de TODAS las columnas de fecha/hora: hora local, ordenable como texto.
+# Así los filtros por rango y los ORDER BY comparan texto plano y usan los índices
+# (nada de date()/datetime() sobre la columna).
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Expresión SQL que normaliza un valor existente al formato canónico
+SQL_NORMALIZE = "strftime('%Y-%m-%d %H:%M:%S', {col})"
+
+
+def now_ts() -> str:
+    return datetime.now().strftime(TS_FORMAT)
+
+
+def day_range(start: str, end: str | None = None) -> tuple[str, str]:
+    """
+    'YYYY-MM-DD' (ambos incluidos) -> (lo, hi) para `col >= lo AND col < hi`.
+    hi es el día siguiente a `end`, así cubre hasta las 23:59:59.
+    Lanza ValueError si no es una fecha (los repos lo pasan a DomainError).
+    """
+    d1 = date.fromisoformat(start.strip())
+    d2 = date.fromisoformat((end or start).strip())
+    if d1 > d2:
+        d1, d2 = d2, d1
+    return d1.isoformat(), (d2 + timedelta(days=1)).isoformat()
+
+
+def days_ago_ts(days: int, *, now: datetime | None = None) -> str:
+    return ((now or datetime.now()) - timedelta(days=int(days))).strftime(TS_FORMAT)
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any
+
+# Consultas lentas: un logger propio para poder mandarlo a su archivo rotado
+slow_log = logging.getLogger("consultorio.sql.lentas")
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE_RE = re.compile(r"\s+")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql: str) -> str:
+    """
+    Huella de una sentencia para agrupar estadísticas: literales -> ?, listas
+    IN (?, ?, ...) de cualquier largo -> una sola, espacios simples.
+    """
+    s = _STRING_RE.sub("?", sql)
+    s = _NUMBER_RE.sub("?", s)
+    s = _SPACE_RE.sub(" ", s).strip()
+    return _IN_LIST_RE.sub("(?, ...)", s)
+
+
+@dataclass
+class QueryStat:
+    sql: str  # normalizada
+    calls: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    rows: int = 0
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.calls if self.calls else 0.0
+
+
+@dataclass
+class QueryRecord:
+    """Una ejecución: el tiempo y las filas crecen a medida que se leen resultados."""
+
+    sql: str  # normalizada
+    at: float  # time.time() del execute
+    thread: str
+    seq: int = 0  # creciente por tracer: identifica la ejecución (iid en la UI)
+    ms: float = 0.0
+    rows: int = 0
+    logged: bool = False
+
+
+@dataclass
+class SqlTracer:
+    """
+    Estadísticas por sentencia (llamadas, total/medio/máximo, filas) y las
+    últimas `recent` ejecuciones. Las que pasan de `slow_ms` van a `slow_log`
+    (sin parámetros: pueden tener datos de pacientes). Seguro entre hilos.
+    Solo existe si se activa: connect(tracer=None) no agrega nada por consulta.
+    """
+
+    slow_ms: float = 100.0
+    recent: int = 200
+    _stats: dict[str, QueryStat] = field(default_factory=dict)
+    _recent: deque[QueryRecord] = field(init=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+    _seq: int = 0
+
+    def __post_init__(self) -> None:
+        self._recent = deque(maxlen=max(1, int(self.recent)))
+
+    def begin(self, sql: str) -> QueryRecord:
+        rec = QueryRecord(normalize_sql(sql), time.time(), threading.current_thread().name)
+        with self._lock:
+            self._seq += 1
+            rec.seq = self._seq
+            stat = self._stats.get(rec.sql)
+            if stat is None:
+                stat = self._stats[rec.sql] = QueryStat(rec.sql)
+            stat.calls += 1
+            self._recent.append(rec)
+        return rec
+
+    def add(self, rec: QueryRecord, seconds: float, rows: int) -> None:
+        """Suma tiempo/filas a una ejecución (el execute y cada fetch)."""
+        ms = seconds * 1000.0
+        with self._lock:
+            stat = self._stats[rec.sql]
+            rec.ms += ms
+            rec.rows += rows
+            stat.total_ms += ms
+            stat.rows += rows
+            stat.max_ms = max(stat.max_ms, rec.ms)
+            slow = rec.ms >= self.slow_ms and not rec.logged
+            if slow:
+                rec.logged = True
+        if slow:
+            slow_log.warning("%.1f ms [%s] %s", rec.ms, rec.thread, rec.sql)
+
+    def stats(self) -> list[QueryStat]:
+        """Copia de las estadísticas, de mayor a menor tiempo total."""
+        with self._lock:
+            out = [
+                QueryStat(s.sql, s.calls, s.total_ms, s.max_ms, s.rows)
+                for s in self._stats.values()
+            ]
+        return sorted(out, key=lambda s: s.total_ms, reverse=True)
+
+    def recent_queries(self) -> list[QueryRecord]:
+        """Las últimas ejecuciones, la más nueva primero."""
+        with self._lock:
+            return list(reversed(self._recent))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self._recent.clear()
+
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor que mide execute y cada fetch de su ejecución actual."""
+
+    tracer: SqlTracer
+    _rec: QueryRecord | None = None
+
+    def _run(self, method: Any, sql: str, *args: Any) -> TracedCursor:
+        rec = self._rec = self.tracer.begin(sql)
+        t0 = time.perf_counter()
+        try:
+            method(self, sql, *args)
+        finally:
+            dt = time.perf_counter() - t0
+            # DML: filas afectadas; SELECT: se cuentan al leerlas
+            rows = max(self.rowcount, 0) if self.description is None else 0
+            self.tracer.add(rec, dt, rows)
+        return self
+
+    def execute(self, sql: str, parameters: Any = (), /) -> TracedCursor:
+        return self._run(sqlite3.Cursor.execute, sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters: Any, /) -> TracedCursor:
+        return self._run(sqlite3.Cursor.executemany, sql, seq_of_parameters)
+
+    def _fetched(self, t0: float, rows: int) -> None:
+        if self._rec is not None:
+            self.tracer.add(self._rec, time.perf_counter() - t0, rows)
+
+    def fetchone(self) -> Any:
+        t0 = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(t0, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size: int | None = None) -> list[Any]:
+        t0 = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(t0, len(rows))
+        return rows
+
+    def fetchall(self) -> list[Any]:
+        t0 = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(t0, len(rows))
+        return rows
+
+    def __next__(self) -> Any:
+        t0 = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(t0, 0)
+            raise
+        self._fetched(t0, 1)
+        return row
+
+
+class TracedConnection(sqlite3.Connection):
+    """sqlite3.Connection cuyos cursores (también los de execute()) pasan por `tracer`."""
+
+    tracer: SqlTracer
+
+    def cursor(self, factory: Any = None) -> Any:
+        cur = super().cursor(factory or TracedCursor)
+        if isinstance(cur, TracedCursor):
+            cur.tracer = self.tracer
+        return cur
+
+    def execute(self, sql: str, parameters: Any = (), /) -> Any:
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters: Any, /) -> Any:
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def install_slow_log(path: Path, *, max_bytes: int = 1_000_000, backups: int = 3) -> None:
+    """Manda slow_log a `path`, rotando a los `max_bytes` (se guardan `backups` archivos)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    for h in list(slow_log.handlers):
+        slow_log.removeHandler(h)
+        h.close()
+    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    slow_log.addHandler(handler)
+    slow_log.setLevel(logging.WARNING)
+    slow_log.propagate = False
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager, nullcontext
+
+from consultorio.db.connection import ConnectionManager, DbHandle
+
+# Profundidad de unit_of_work por conexión escritora, por hilo
+# (sqlite3.Connection no admite weakref: se indexa por id()).
+_state = threading.local()
+
+
+def _depths() -> dict[int, int]:
+    depths: dict[int, int] | None = getattr(_state, "depths", None)
+    if depths is None:
+        depths = _state.depths = {}
+    return depths
+
+
+def _writer(conn: DbHandle) -> sqlite3.Connection:
+    return conn.writer if isinstance(conn, ConnectionManager) else conn
+
+
+def in_unit_of_work(conn: DbHandle) -> bool:
+    return _depths().get(id(_writer(conn)), 0) > 0
+
+
+def commit(conn: DbHandle) -> None:
+    """Lo que usan los repos: commit normal, salvo dentro de unit_of_work (confirma el bloque)."""
+    if not in_unit_of_work(conn):
+        conn.commit()
+
+
+@contextmanager
+def unit_of_work(conn: DbHandle) -> Iterator[None]:
+    """
+    Agrupa varias operaciones de repos en una sola transacción:
+    - nivel externo: BEGIN ... COMMIT (un solo fsync) o ROLLBACK si hay excepción
+    - anidado: SAVEPOINT, así un bloque interno puede fallar sin tumbar el externo
+    Con ConnectionManager se retiene el lock del escritor durante todo el bloque.
+    """
+    writer = _writer(conn)
+    key = id(writer)
+    lock = conn.write() if isinstance(conn, ConnectionManager) else nullcontext()
+
+    with lock:
+        depths = _depths()
+        depth = depths.get(key, 0)
+        savepoint = f"uow_{depth}"
+        if depth == 0:
+            if writer.in_transaction:
+                # Lo pendiente de antes no se mezcla con este bloque. Es de este
+                # hilo: con ConnectionManager el dueño retiene el escritor hasta su
+                # commit, así que otro hilo espera en el lock en vez de llegar aquí
+                writer.commit()
+            writer.execute("BEGIN")
+        else:
+            writer.execute(f"SAVEPOINT {savepoint}")
+        depths[key] = depth + 1
+
+        try:
+            yield
+        except BaseException:
+            if depth == 0:
+                writer.rollback()
+            else:
+                writer.execute(f"ROLLBACK TO {savepoint}")
+                writer.execute(f"RELEASE {savepoint}")
+            raise
+        else:
+            if depth == 0:
+                writer.commit()
+            else:
+                writer.execute(f"RELEASE {savepoint}")
+        finally:
+            if depth == 0:
+                depths.pop(key, None)
+            else:
+                depths[key] = depth
+
+
+@contextmanager
+def read_transaction(conn: DbHandle) -> Iterator[sqlite3.Connection]:
+    """
+    Varias lecturas sobre una misma foto de la DB (BEGIN ... fin), en una sola conexión:
+    - ConnectionManager: un lector del pool (o el escritor si este hilo tiene una
+      escritura abierta, para ver lo propio, o si no hay pool)
+    - conexión simple: ella misma (si ya está en una transacción, se lee dentro de esa)
+    """
+    if isinstance(conn, ConnectionManager) and not conn.owns_write:
+        with conn.reader() as c:
+            with _snapshot(c):
+                yield c
+        return
+
+    writer = _writer(conn)
+    lock = conn.write() if isinstance(conn, ConnectionManager) else nullcontext()
+    with lock, _snapshot(writer):
+        yield writer
+
+
+@contextmanager
+def _snapshot(c: sqlite3.Connection) -> Iterator[None]:
+    if c.in_transaction:
+        yield
+        return
+    c.execute("BEGIN")
+    try:
+        yield
+    finally:
+        # Solo se leyó: cerrar la transacción suelta el snapshot
+        c.rollback()
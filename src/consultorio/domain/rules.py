@@ -19,10 +19,18 @@ def validate_cedula(cedula: str) -> None:
 
 
 def validate_forma_pago(cfg: Settings, forma: str) -> None:
-    if forma not in cfg.clinic.payment_methods:
+    if forma not in cfg.clinic.payment_method_set:
         raise DomainError("Forma de pago inválida.")
 
 
+def validate_study_limits(cfg: Settings, *, citologias: int, biopsias: int) -> None:
+    limits = cfg.clinic.limits
+    if citologias > limits.max_cytologies_per_visit:
+        raise DomainError(f"Máximo {limits.max_cytologies_per_visit} citologías por cita.")
+    if biopsias > limits.max_biopsies_per_visit:
+        raise DomainError(f"Máximo {limits.max_biopsies_per_visit} biopsias por cita.")
+
+
 def validate_resultado_editable(cfg: Settings, estado: str, resultado: str) -> None:
     if resultado.strip() and estado not in {"recibido", "entregado"}:
         raise DomainError("Solo puedes registrar resultado si el estudio está RECIBIDO o ENTREGADO.")
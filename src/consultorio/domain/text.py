@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+import unicodedata
+
+# Límite superior para rangos de prefijo: `col >= p AND col < p || _PREFIX_END`
+_PREFIX_END = "\U0010ffff"
+
+
+def fold(s: str | None) -> str:
+    """Clave de búsqueda: sin acentos, casefold y espacios simples ('Núñez  PÉREZ' -> 'nunez perez')."""
+    decomposed = unicodedata.normalize("NFKD", s or "")
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.casefold().split())
+
+
+def prefix_range(prefix: str) -> tuple[str, str]:
+    """(lo, hi) para buscar por prefijo con un índice: `col >= lo AND col < hi`."""
+    return prefix, prefix + _PREFIX_END
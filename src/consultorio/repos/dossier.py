@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import sqlite3
+from dataclasses import dataclass
+
+from consultorio.db.connection import DbHandle
+from consultorio.db.uow import read_transaction
+
+# Lo que muestra el formulario de PatientsView (nada de SELECT *)
+_PATIENT_SQL = """
+    SELECT paciente_id, cedula, nombres, apellidos, comentario, telefono,
+           fecha_nacimiento, domicilio, antecedentes_personales, antecedentes_familiares
+    FROM pacientes
+    WHERE paciente_id = ?
+"""
+
+# idx_citas_paciente_fecha (paciente_id, fecha_consulta, rowid): ya viene en orden
+_VISITS_SQL = """
+    SELECT cita_id, fecha_consulta, motivo_consulta, forma_pago
+    FROM citas
+    WHERE paciente_id = ?
+    ORDER BY fecha_consulta DESC, cita_id DESC
+    LIMIT 200
+"""
+
+# Citas del paciente en orden por el índice anterior (cubre la parte de citas) y
+# sus estudios por idx_estudios_cita (cita_id, rowid). El desempate por cita_id
+# hace que el orden completo salga de los índices: sin TEMP B-TREE.
+_STUDIES_SQL = """
+    SELECT e.estudio_id, c.fecha_consulta AS fecha, e.tipo, e.subtipo, e.resultado
+    FROM citas c
+    JOIN estudios e ON e.cita_id = c.cita_id
+    WHERE c.paciente_id = ?
+    ORDER BY c.fecha_consulta DESC, c.cita_id DESC, e.estudio_id DESC
+    LIMIT 200
+"""
+
+
+@dataclass(frozen=True)
+class PatientDossier:
+    patient: sqlite3.Row
+    visits: list[sqlite3.Row]
+    studies: list[sqlite3.Row]
+
+    @property
+    def paciente_id(self) -> int:
+        return int(self.patient["paciente_id"])
+
+
+class PatientDossierRepo:
+    """Ficha completa de un paciente (datos + historial + estudios) en una sola lectura."""
+
+    def __init__(self, conn: DbHandle):
+        self.conn = conn
+
+    def load(self, paciente_id: int) -> PatientDossier | None:
+        with read_transaction(self.conn) as c:
+            return _load(c, paciente_id)
+
+    def load_many(self, ids: list[int]) -> dict[int, PatientDossier]:
+        """Varias fichas (p.ej. vecinas en la lista) en la misma transacción de lectura."""
+        out: dict[int, PatientDossier] = {}
+        with read_transaction(self.conn) as c:
+            for pid in ids:
+                d = _load(c, pid)
+                if d is not None:
+                    out[pid] = d
+        return out
+
+
+def _load(c: sqlite3.Connection, paciente_id: int) -> PatientDossier | None:
+    patient = c.execute(_PATIENT_SQL, (paciente_id,)).fetchone()
+    if patient is None:
+        return None
+    return PatientDossier(
+        patient=patient,
+        visits=c.execute(_VISITS_SQL, (paciente_id,)).fetchall(),
+        studies=c.execute(_STUDIES_SQL, (paciente_id,)).fetchall(),
+    )
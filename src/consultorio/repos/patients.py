@@ -2,13 +2,48 @@ from __future__ import annotations
 
 import sqlite3
 from dataclasses import dataclass
-from datetime import datetime
 
+from consultorio.db.connection import DbHandle
+from consultorio.db.schema import fts5_trigram_available
+from consultorio.db.timestamps import now_ts
+from consultorio.db.uow import commit
 from consultorio.domain.rules import DomainError, validate_cedula
+from consultorio.domain.text import fold, prefix_range
 
+_SEARCH_LIMIT = 200
 
-def _now_iso() -> str:
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+_EDAD_SQL = """
+        CASE
+        WHEN p.fecha_nacimiento IS NULL OR trim(p.fecha_nacimiento) = '' THEN NULL
+        WHEN length(trim(p.fecha_nacimiento)) != 10 THEN NULL
+        WHEN substr(p.fecha_nacimiento, 3, 1) != '-' OR substr(p.fecha_nacimiento, 6, 1) != '-' THEN NULL
+        ELSE
+            (
+            CAST(strftime('%Y','now') AS INT) - CAST(substr(p.fecha_nacimiento, 7, 4) AS INT)
+            - (
+                strftime('%m-%d','now')
+                < (substr(p.fecha_nacimiento, 4, 2) || '-' || substr(p.fecha_nacimiento, 1, 2))
+                )
+            )
+        END AS edad
+"""
+
+
+# Orden de relevancia; parámetros: (q, *prefix_range(fold(q)))
+_GRUPO_SQL = """CASE WHEN p.cedula = ? THEN 0
+                     WHEN p.apellidos_norm >= ? AND p.apellidos_norm < ? THEN 1
+                     ELSE 2 END"""
+
+
+def _norm_columns(p: PatientUpsert) -> tuple[str, str, str]:
+    apellidos, nombres = p.apellidos.strip(), p.nombres.strip()
+    return fold(apellidos), fold(nombres), fold(f"{apellidos} {nombres}")
+
+
+def _fts_match(q: str) -> str:
+    """Términos de 3+ caracteres (mínimo del trigram), cada uno como frase, unidos con AND."""
+    terms = [t for t in q.split() if len(t) >= 3]
+    return " AND ".join('"' + t.replace('"', '""') + '"' for t in terms)
 
 
 @dataclass
@@ -26,66 +61,91 @@ class PatientUpsert:
 
 
 class PatientRepo:
-    def __init__(self, conn: sqlite3.Connection):
+    def __init__(self, conn: DbHandle):
         self.conn = conn
+        self._fts: bool | None = None
 
     def search(self, q: str) -> list[sqlite3.Row]:
-        q = (q or "").strip()
-
-        edad_sql = """
-        CASE
-        WHEN fecha_nacimiento IS NULL OR trim(fecha_nacimiento) = '' THEN NULL
-        WHEN length(trim(fecha_nacimiento)) != 10 THEN NULL
-        WHEN substr(fecha_nacimiento, 3, 1) != '-' OR substr(fecha_nacimiento, 6, 1) != '-' THEN NULL
-        ELSE
-            (
-            CAST(strftime('%Y','now') AS INT) - CAST(substr(fecha_nacimiento, 7, 4) AS INT)
-            - (
-                strftime('%m-%d','now')
-                < (substr(fecha_nacimiento, 4, 2) || '-' || substr(fecha_nacimiento, 1, 2))
-                )
-            )
-        END AS edad
         """
+        Búsqueda rankeada (máx. 200), sin distinguir acentos ni mayúsculas:
+        0) cédula exacta  1) apellido que empieza por q  2) el resto
+        Con FTS5 (pacientes_fts, trigram) no se recorre la tabla; si el término es
+        muy corto para trigramas se busca por prefijo con los índices *_norm;
+        sin FTS5, LIKE sobre las columnas normalizadas.
+        La edad se calcula solo sobre las filas ya elegidas.
+        """
+        q = (q or "").strip()
+        fq = fold(q)
+        lo, hi = prefix_range(fq)
 
         if not q:
-            return self.conn.execute(
-                f"""
-                SELECT
-                paciente_id,
-                nombres,
-                apellidos,
-                comentario,
-                {edad_sql},
-                cedula,                
-                telefono,
-                creado_en
+            hits_sql = """
+                SELECT paciente_id, 0 AS grupo, 0 AS score
                 FROM pacientes
                 ORDER BY apellidos, nombres
-                LIMIT 200
-                """
-            ).fetchall()
+                LIMIT ?
+            """
+            params: tuple[object, ...] = (_SEARCH_LIMIT,)
+        elif self._has_fts() and (match := _fts_match(fq)):
+            hits_sql = f"""
+                SELECT p.paciente_id, {_GRUPO_SQL} AS grupo, bm25(pacientes_fts) AS score
+                FROM pacientes_fts
+                JOIN pacientes p ON p.paciente_id = pacientes_fts.rowid
+                WHERE pacientes_fts MATCH ?
+                ORDER BY grupo, score, p.apellidos, p.nombres
+                LIMIT ?
+            """
+            params = (q, lo, hi, match, _SEARCH_LIMIT)
+        elif self._has_fts():
+            # Prefijo: cada rama del OR usa su índice (cedula UNIQUE, *_norm)
+            hits_sql = f"""
+                SELECT p.paciente_id, {_GRUPO_SQL} AS grupo, 0 AS score
+                FROM pacientes p
+                WHERE (p.cedula >= ? AND p.cedula < ?)
+                   OR (p.apellidos_norm >= ? AND p.apellidos_norm < ?)
+                   OR (p.nombres_norm >= ? AND p.nombres_norm < ?)
+                ORDER BY grupo, p.apellidos, p.nombres
+                LIMIT ?
+            """
+            params = (q, lo, hi, *prefix_range(q), lo, hi, lo, hi, _SEARCH_LIMIT)
+        else:
+            like = f"%{fq}%"
+            hits_sql = f"""
+                SELECT p.paciente_id, {_GRUPO_SQL} AS grupo, 0 AS score
+                FROM pacientes p
+                WHERE p.cedula LIKE ? OR p.nombre_completo_norm LIKE ?
+                ORDER BY grupo, p.apellidos, p.nombres
+                LIMIT ?
+            """
+            params = (q, lo, hi, f"%{q}%", like, _SEARCH_LIMIT)
 
-        like = f"%{q}%"
         return self.conn.execute(
             f"""
             SELECT
-            paciente_id,
-            nombres,
-            apellidos,
-            comentario,
-            {edad_sql},
-            cedula,                
-            telefono,
-            creado_en
-            FROM pacientes
-            WHERE cedula LIKE ? OR apellidos LIKE ? OR nombres LIKE ?
-            ORDER BY apellidos, nombres
-            LIMIT 200
+            p.paciente_id,
+            p.nombres,
+            p.apellidos,
+            p.comentario,
+            {_EDAD_SQL},
+            p.cedula,
+            p.telefono,
+            p.creado_en
+            FROM ({hits_sql}) AS hits
+            JOIN pacientes p ON p.paciente_id = hits.paciente_id
+            ORDER BY hits.grupo, hits.score, p.apellidos, p.nombres
             """,
-            (like, like, like),
+            params,
         ).fetchall()
 
+    def _has_fts(self) -> bool:
+        # La tabla puede venir de un SQLite con FTS5 y abrirse en uno sin él
+        if self._fts is None:
+            row = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='pacientes_fts'"
+            ).fetchone()
+            self._fts = row is not None and fts5_trigram_available()
+        return self._fts
+
     def get(self, paciente_id: int) -> sqlite3.Row | None:
         return self.conn.execute(
             "SELECT * FROM pacientes WHERE paciente_id=?",
@@ -101,8 +161,9 @@ class PatientRepo:
             """
             INSERT INTO pacientes
             (cedula, nombres, apellidos, comentario, telefono, fecha_nacimiento, domicilio,
-             antecedentes_personales, antecedentes_familiares, actualizado_en)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+             antecedentes_personales, antecedentes_familiares, actualizado_en,
+             apellidos_norm, nombres_norm, nombre_completo_norm)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             (
                 p.cedula.strip(),
@@ -114,10 +175,11 @@ class PatientRepo:
                 (p.domicilio or "").strip(),
                 (p.antecedentes_personales or "").strip(),
                 (p.antecedentes_familiares or "").strip(),
-                _now_iso(),
+                now_ts(),
+                *_norm_columns(p),
             ),
         )
-        self.conn.commit()
+        commit(self.conn)
         return int(cur.lastrowid)
 
     def update(self, p: PatientUpsert) -> None:
@@ -131,7 +193,8 @@ class PatientRepo:
             """
             UPDATE pacientes SET
               cedula=?, nombres=?, apellidos=?, comentario=?, telefono=?, fecha_nacimiento=?, domicilio=?,
-              antecedentes_personales=?, antecedentes_familiares=?, actualizado_en=?
+              antecedentes_personales=?, antecedentes_familiares=?, actualizado_en=?,
+              apellidos_norm=?, nombres_norm=?, nombre_completo_norm=?
             WHERE paciente_id=?
             """,
             (
@@ -144,11 +207,12 @@ class PatientRepo:
                 (p.domicilio or "").strip(),
                 (p.antecedentes_personales or "").strip(),
                 (p.antecedentes_familiares or "").strip(),
-                _now_iso(),
+                now_ts(),
+                *_norm_columns(p),
                 p.paciente_id,
             ),
         )
-        self.conn.commit()
+        commit(self.conn)
 
     def delete(self, paciente_id: int) -> None:
         # No permitir borrar si tiene citas
@@ -160,4 +224,4 @@ class PatientRepo:
             raise DomainError("No se puede eliminar: el paciente tiene citas registradas.")
 
         self.conn.execute("DELETE FROM pacientes WHERE paciente_id=?", (paciente_id,))
-        self.conn.commit()
+        commit(self.conn)
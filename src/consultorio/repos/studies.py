@@ -1,17 +1,20 @@
 from __future__ import annotations
 
 import sqlite3
-from dataclasses import dataclass
-from datetime import datetime
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass, field
+from typing import Any
 
+from consultorio.db.connection import DbHandle
+from consultorio.db.timestamps import day_range, now_ts
+from consultorio.db.uow import commit, unit_of_work
 from consultorio.domain.rules import DomainError
-
-
-def _now_iso() -> str:
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
+from consultorio.domain.text import fold
 
 STATES_ORDER = ["ordenado", "enviado", "pagado", "recibido", "entregado"]
+# Pertenencia y posición en O(1) (los chequeos corren por cada estudio en lote)
+STATES = frozenset(STATES_ORDER)
+STATE_INDEX = {st: i for i, st in enumerate(STATES_ORDER)}
 STATE_TO_COL = {
     "ordenado": "ordenado_en",
     "enviado": "enviado_en",
@@ -31,89 +34,266 @@ class StudyCreate:
     estado_actual: str = "ordenado"
 
 
+_INSERT_SQL = """
+    INSERT INTO estudios
+        (cita_id, paciente_id, centro_id, tipo, subtipo,
+         estado_actual,
+         ordenado_en,
+         actualizado_en)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _insert_params(s: StudyCreate, now: str) -> tuple[object, ...]:
+    # Siempre nace 'ordenado', con ordenado_en = ahora
+    return (s.cita_id, s.paciente_id, s.centro_id, s.tipo, s.subtipo, "ordenado", now, now)
+
+
+# Ids por consulta IN (...): muy por debajo de SQLITE_MAX_VARIABLE_NUMBER (999 en builds viejos)
+_IDS_PER_QUERY = 500
+
+
+def _chunks(ids: list[int], size: int = _IDS_PER_QUERY) -> Iterator[list[int]]:
+    for i in range(0, len(ids), size):
+        yield ids[i : i + size]
+
+
+@dataclass(frozen=True)
+class TogglePlan:
+    new_estado: str
+    affected: list[str]
+    marks: bool  # True = marca (✅); False = desmarca con cascada
+    clears_result: bool  # la cascada borra resultado (desmarcar recibido o antes)
+    set_sql: str  # cláusula SET del UPDATE
+    params: tuple[object, ...]
+
+
+@dataclass
+class ToggleResult:
+    outcomes: dict[int, tuple[str, list[str]]] = field(default_factory=dict)
+    errors: dict[int, str] = field(default_factory=dict)
+    needs_result: list[int] = field(default_factory=list)
+    cleared_result: list[int] = field(default_factory=list)  # tenían resultado y se borró
+
+
+def _check_toggle_state(state: str) -> None:
+    if state not in STATES:
+        raise DomainError("Estado inválido.")
+    if state == "ordenado":
+        # No permitimos quitar/poner ordenado: es el origen del estudio.
+        raise DomainError("El estado 'ordenado' no se modifica manualmente.")
+
+
+def plan_toggle(row: sqlite3.Row | Mapping[str, Any], state: str, *, now: str) -> TogglePlan:
+    """
+    Reglas de toggle_state sin tocar la DB (row: columnas *_en, centro_id).
+    Lanza DomainError si el cambio no está permitido.
+    """
+    _check_toggle_state(state)
+
+    def has_ts(st: str) -> bool:
+        return bool(row[STATE_TO_COL[st]])
+
+    idx = STATE_INDEX[state]
+    prev_state = STATES_ORDER[idx - 1]
+
+    # Si está marcado ✅ -> desmarcar con cascada (este y posteriores)
+    if has_ts(state):
+        affected = STATES_ORDER[idx:]
+        set_clause = ", ".join(f"{STATE_TO_COL[st]}=NULL" for st in affected)
+        # si quitas recibido o antes, también limpiamos resultado
+        clears_result = idx <= STATE_INDEX["recibido"]
+        if clears_result:
+            set_clause += ", resultado=NULL, resultado_editado_en=NULL"
+
+        # nuevo estado_actual = último estado anterior que siga marcado
+        # (ordenado siempre está marcado por diseño)
+        new_estado = "ordenado"
+        for st in reversed(STATES_ORDER[1:idx]):
+            if has_ts(st):
+                new_estado = st
+                break
+
+        return TogglePlan(
+            new_estado=new_estado,
+            affected=list(affected),
+            marks=False,
+            clears_result=clears_result,
+            set_sql=f"{set_clause}, estado_actual=?, actualizado_en=?",
+            params=(new_estado, now),
+        )
+
+    # Si está desmarcado ❌ -> marcar hacia adelante (secuencial estricto)
+    # (A) Detectar inconsistencia: hay un estado posterior marcado pero este no
+    for later in STATES_ORDER[idx + 1 :]:
+        if has_ts(later):
+            raise DomainError(
+                f"Datos inconsistentes: '{later}' está marcado pero '{state}' no. "
+                "Corrige desde el último estado válido."
+            )
+
+    # (B) Verificar que el estado previo esté marcado
+    if not has_ts(prev_state):
+        raise DomainError(f"Primero debes marcar '{prev_state}' antes de '{state}'.")
+
+    # Centro requerido desde enviado en adelante
+    if row["centro_id"] is None:
+        raise DomainError(f"Asigna el centro histológico antes de marcar '{state}'.")
+
+    return TogglePlan(
+        new_estado=state,
+        affected=[state],
+        marks=True,
+        clears_result=False,
+        set_sql=f"{STATE_TO_COL[state]}=?, estado_actual=?, actualizado_en=?",
+        params=(now, state, now),
+    )
+
+
+@dataclass(frozen=True)
+class StudyFilter:
+    q: str = ""
+    estado: str = "Todos"
+    tipo: str = "Todos"
+    centro_id: int | None = None
+    enviado_from: str | None = None  # "YYYY-MM-DD"
+    enviado_to: str | None = None  # "YYYY-MM-DD"
+    include_not_sent: bool = True
+
+
+# (ordenado_en, estudio_id) de la última fila mostrada
+StudyCursor = tuple[str, int]
+
+
+def page_cursor(row: sqlite3.Row) -> StudyCursor:
+    return str(row["ordenado_en"]), int(row["estudio_id"])
+
+
+def _filter_where(f: StudyFilter) -> tuple[list[str], list[object]]:
+    where: list[str] = []
+    params: list[object] = []
+
+    # --- filtro por rango de enviado_en (texto canónico: usa idx_estudios_enviado_en) ---
+    if f.enviado_from or f.enviado_to:
+        rango: list[str] = []
+        try:
+            if f.enviado_from:
+                rango.append("e.enviado_en >= ?")
+                params.append(day_range(f.enviado_from)[0])
+            if f.enviado_to:
+                rango.append("e.enviado_en < ?")
+                params.append(day_range(f.enviado_to)[1])
+        except ValueError:
+            raise DomainError("Fecha inválida: usa el formato AAAA-MM-DD.") from None
+
+        if f.include_not_sent:
+            where.append("(e.enviado_en IS NULL OR (" + " AND ".join(rango) + "))")
+        else:
+            where.append("e.enviado_en IS NOT NULL")
+            where.extend(rango)
+
+    # --- otros filtros ---
+    if f.estado and f.estado != "Todos":
+        where.append("e.estado_actual = ?")
+        params.append(f.estado)
+
+    if f.tipo and f.tipo != "Todos":
+        where.append("e.tipo = ?")
+        params.append(f.tipo)
+
+    if f.centro_id is not None:
+        where.append("e.centro_id = ?")
+        params.append(int(f.centro_id))
+
+    q = (f.q or "").strip()
+    if q:
+        like = f"%{q}%"
+        # Nombre sin acentos/mayúsculas: 'perez' encuentra 'Pérez'
+        where.append("(p.cedula LIKE ? OR p.nombre_completo_norm LIKE ? OR e.subtipo LIKE ?)")
+        params.extend([like, f"%{fold(q)}%", like])
+
+    return where, params
+
+
+# Columnas de la grilla administrativa (list_admin*, get_admin*)
+_ADMIN_SELECT = """
+    SELECT e.estudio_id, e.tipo, e.subtipo,
+           e.centro_id, ch.nombre AS centro_nombre,
+           e.estado_actual,
+           e.ordenado_en, e.enviado_en, e.pagado_en, e.recibido_en, e.entregado_en,
+           e.resultado, e.resultado_editado_en,
+           p.cedula,
+           p.apellidos || ', ' || p.nombres AS paciente
+    FROM estudios e
+    JOIN pacientes p ON p.paciente_id = e.paciente_id
+    LEFT JOIN centros_histologicos ch ON ch.centro_id = e.centro_id
+"""
+
+
 class StudyRepo:
-    def __init__(self, conn: sqlite3.Connection):
+    def __init__(self, conn: DbHandle):
         self.conn = conn
 
     # ---------------- Queries para UI ----------------
 
     def list_admin(self, *, limit: int = 1000) -> list[sqlite3.Row]:
         return self.conn.execute(
-            """
-            SELECT e.estudio_id, e.tipo, e.subtipo,
-                   e.centro_id, ch.nombre AS centro_nombre,
-                   e.estado_actual,
-                   e.ordenado_en, e.enviado_en, e.pagado_en, e.recibido_en, e.entregado_en,
-                   e.resultado, e.resultado_editado_en,
-                   p.cedula,
-                   p.apellidos || ', ' || p.nombres AS paciente
-            FROM estudios e
-            JOIN pacientes p ON p.paciente_id = e.paciente_id
-            LEFT JOIN centros_histologicos ch ON ch.centro_id = e.centro_id
-            ORDER BY datetime(e.ordenado_en) DESC, e.estudio_id DESC
-            LIMIT ?
-            """,
+            f"{_ADMIN_SELECT} ORDER BY e.ordenado_en DESC, e.estudio_id DESC LIMIT ?",
             (limit,),
         ).fetchall()
 
     def get_admin(self, estudio_id: int) -> sqlite3.Row | None:
         return self.conn.execute(
-            """
-            SELECT e.estudio_id, e.tipo, e.subtipo,
-                   e.centro_id, ch.nombre AS centro_nombre,
-                   e.estado_actual,
-                   e.ordenado_en, e.enviado_en, e.pagado_en, e.recibido_en, e.entregado_en,
-                   e.resultado, e.resultado_editado_en,
-                   p.cedula,
-                   p.apellidos || ', ' || p.nombres AS paciente
-            FROM estudios e
-            JOIN pacientes p ON p.paciente_id = e.paciente_id
-            LEFT JOIN centros_histologicos ch ON ch.centro_id = e.centro_id
-            WHERE e.estudio_id=?
-            """,
+            f"{_ADMIN_SELECT} WHERE e.estudio_id=?",
             (estudio_id,),
         ).fetchone()
 
+    def get_admin_many(self, estudio_ids: list[int]) -> dict[int, sqlite3.Row]:
+        """get_admin para varios ids: {estudio_id: fila}, en lotes de IN (...)."""
+        ids = list(dict.fromkeys(int(i) for i in estudio_ids))
+        out: dict[int, sqlite3.Row] = {}
+        for chunk in _chunks(ids):
+            qmarks = ",".join("?" * len(chunk))
+            for r in self.conn.execute(
+                f"{_ADMIN_SELECT} WHERE e.estudio_id IN ({qmarks})", tuple(chunk)
+            ).fetchall():
+                out[int(r["estudio_id"])] = r
+        return out
+
     # ---------------- Create / Update ----------------
 
     def create(self, s: StudyCreate) -> int:
-        if s.estado_actual not in STATES_ORDER:
+        if s.estado_actual not in STATES:
             raise DomainError("Estado inválido.")
 
-        now = _now_iso()
-        ordenado_en = now  # siempre al crear
-
-        cur = self.conn.execute(
-            """
-            INSERT INTO estudios
-                (cita_id, paciente_id, centro_id, tipo, subtipo,
-                 estado_actual,
-                 ordenado_en,
-                 actualizado_en)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                s.cita_id,
-                s.paciente_id,
-                s.centro_id,
-                s.tipo,
-                s.subtipo,
-                "ordenado",
-                ordenado_en,
-                now,
-            ),
-        )
-        self.conn.commit()
+        now = now_ts()
+        cur = self.conn.execute(_INSERT_SQL, _insert_params(s, now))
+        commit(self.conn)
         last = cur.lastrowid
         if last is None:
             raise RuntimeError("No se pudo obtener lastrowid.")
         return int(last)
 
+    def create_many(self, items: list[StudyCreate]) -> int:
+        n = self.insert_many(items)
+        commit(self.conn)
+        return n
+
+    def insert_many(self, items: list[StudyCreate]) -> int:
+        """Todos los estudios en un solo executemany, sin commit (lo hace quien llama)."""
+        if any(s.estado_actual not in STATES for s in items):
+            raise DomainError("Estado inválido.")
+        if not items:
+            return 0
+        now = now_ts()
+        self.conn.executemany(_INSERT_SQL, [_insert_params(s, now) for s in items])
+        return len(items)
+
     def set_center_many(self, estudio_ids: list[int], centro_id: int) -> None:
         if not estudio_ids:
             return
         qmarks = ",".join(["?"] * len(estudio_ids))
-        now = _now_iso()
+        now = now_ts()
         self.conn.execute(
             f"""
             UPDATE estudios
@@ -122,7 +302,7 @@ class StudyRepo:
             """,
             (centro_id, now, *estudio_ids),
         )
-        self.conn.commit()
+        commit(self.conn)
 
     def set_result(self, estudio_id: int, text: str) -> None:
         txt = (text or "").strip()
@@ -137,7 +317,7 @@ class StudyRepo:
         if not (row["recibido_en"] or row["entregado_en"]):
             raise DomainError("Solo puedes cargar resultado si está en 'recibido' o 'entregado'.")
 
-        now = _now_iso()
+        now = now_ts()
         self.conn.execute(
             """
             UPDATE estudios
@@ -146,7 +326,7 @@ class StudyRepo:
             """,
             (txt or None, now, now, estudio_id),
         )
-        self.conn.commit()
+        commit(self.conn)
 
     # ---------------- Estado: secuencial estricto + corrección con cascada ----------------
 
@@ -158,103 +338,80 @@ class StudyRepo:
         - Centro requerido desde 'enviado' en adelante
         Retorna: (estado_actual_final, estados_afectados_lista)
         """
-        if state not in STATES_ORDER:
-            raise DomainError("Estado inválido.")
+        _check_toggle_state(state)
 
         row = self.get_admin(estudio_id)
         if not row:
             raise DomainError("Estudio no encontrado.")
 
-        if state == "ordenado":
-            # No permitimos quitar/poner ordenado: es el origen del estudio.
-            raise DomainError("El estado 'ordenado' no se modifica manualmente.")
-
-        def has_ts(st: str) -> bool:
-            return bool(row[STATE_TO_COL[st]])
-
-        idx = STATES_ORDER.index(state)
-        prev_state = STATES_ORDER[idx - 1]
-
-        now = _now_iso()
-        affected: list[str] = []
-
-        # Si está marcado ✅ -> desmarcar con cascada
-        if has_ts(state):
-            # limpiar este y posteriores
-            cols_to_clear: list[str] = []
-            for st in STATES_ORDER[idx:]:
-                cols_to_clear.append(STATE_TO_COL[st])
-                affected.append(st)
-
-            # si quitas recibido o antes, también limpiamos resultado
-            clear_result = idx <= STATES_ORDER.index("recibido")
-
-            set_clause = ", ".join([f"{c}=NULL" for c in cols_to_clear])
-            if clear_result:
-                set_clause += ", resultado=NULL, resultado_editado_en=NULL"
-
-            # nuevo estado_actual = último estado que quede con timestamp
-            # (como vamos a limpiar desde idx, el nuevo será el anterior que esté marcado)
-            # ordenado siempre está marcado por diseño.
-            new_estado = prev_state
-            # Pero si prev_state también era NULL por algún error de datos, caeremos a 'ordenado'
-
-            new_estado = "ordenado"
-            for st in reversed(STATES_ORDER[:idx]):  # estados anteriores al que estás limpiando
-                if st == "ordenado":
-                    new_estado = "ordenado"
-                    break
-                if row[STATE_TO_COL[st]]:
-                    new_estado = st
-                    break
-
-            self.conn.execute(
-                f"""
-                UPDATE estudios
-                SET {set_clause},
-                    estado_actual=?,
-                    actualizado_en=?
-                WHERE estudio_id=?
-                """,
-                (new_estado, now, estudio_id),
-            )
-            self.conn.commit()
-            return new_estado, affected
-
-        # Si está desmarcado ❌ -> marcar hacia adelante (secuencial estricto)
-        # Debe estar marcado el estado previo
-
-        # (A) Detectar inconsistencia: hay un estado posterior marcado pero este no
-        for later in STATES_ORDER[idx + 1 :]:
-            if row[STATE_TO_COL[later]]:
-                raise DomainError(
-                    f"Datos inconsistentes: '{later}' está marcado pero '{state}' no. "
-                    "Corrige desde el último estado válido."
-                )
-
-        # (B) Verificar que el estado previo esté marcado
-        if not has_ts(prev_state):
-            raise DomainError(f"Primero debes marcar '{prev_state}' antes de '{state}'.")
-
-        # Centro requerido desde enviado en adelante
-        if state in ("enviado", "pagado", "recibido", "entregado"):
-            if row["centro_id"] is None:
-                raise DomainError(f"Asigna el centro histológico antes de marcar '{state}'.")
-
-        col = STATE_TO_COL[state]
+        plan = plan_toggle(row, state, now=now_ts())
         self.conn.execute(
-            f"""
-            UPDATE estudios
-            SET {col}=?,
-                estado_actual=?,
-                actualizado_en=?
-            WHERE estudio_id=?
-            """,
-            (now, state, now, estudio_id),
+            f"UPDATE estudios SET {plan.set_sql} WHERE estudio_id=?",
+            (*plan.params, estudio_id),
         )
-        self.conn.commit()
-        affected.append(state)
-        return state, affected
+        commit(self.conn)
+        return plan.new_estado, plan.affected
+
+    def toggle_state_many(self, estudio_ids: list[int], state: str) -> ToggleResult:
+        """
+        toggle_state para una selección completa: una lectura por lote de ids,
+        reglas evaluadas en memoria y un UPDATE por grupo de cambios idénticos,
+        todo en una transacción. Los estudios que no cumplen las reglas quedan
+        en `errors` sin afectar a los demás.
+        """
+        _check_toggle_state(state)
+        ids = list(dict.fromkeys(int(i) for i in estudio_ids))
+        result = ToggleResult()
+
+        # Lectura, reglas y UPDATEs en la misma transacción del escritor: nadie
+        # cambia los estados entre que se leen y se aplican
+        with unit_of_work(self.conn):
+            rows = self._state_rows(ids)
+            now = now_ts()
+            groups: dict[tuple[str, tuple[object, ...]], list[int]] = {}
+            for estudio_id in ids:
+                row = rows.get(estudio_id)
+                if row is None:
+                    result.errors[estudio_id] = "Estudio no encontrado."
+                    continue
+                try:
+                    plan = plan_toggle(row, state, now=now)
+                except DomainError as e:
+                    result.errors[estudio_id] = str(e)
+                    continue
+                groups.setdefault((plan.set_sql, plan.params), []).append(estudio_id)
+                result.outcomes[estudio_id] = (plan.new_estado, plan.affected)
+                if plan.clears_result and row["resultado"] is not None:
+                    result.cleared_result.append(estudio_id)
+                # Recién marcado como entregado y sin resultado: la UI pide cargarlo
+                if plan.marks and state == "entregado" and not (row["resultado"] or "").strip():
+                    result.needs_result.append(estudio_id)
+
+            for (set_sql, params), group_ids in groups.items():
+                for chunk in _chunks(group_ids):
+                    qmarks = ",".join("?" * len(chunk))
+                    self.conn.execute(
+                        f"UPDATE estudios SET {set_sql} WHERE estudio_id IN ({qmarks})",
+                        (*params, *chunk),
+                    )
+        return result
+
+    def _state_rows(self, estudio_ids: list[int]) -> dict[int, sqlite3.Row]:
+        out: dict[int, sqlite3.Row] = {}
+        for chunk in _chunks(estudio_ids):
+            qmarks = ",".join("?" * len(chunk))
+            for r in self.conn.execute(
+                f"""
+                SELECT estudio_id, centro_id, estado_actual,
+                       ordenado_en, enviado_en, pagado_en, recibido_en, entregado_en,
+                       resultado
+                FROM estudios
+                WHERE estudio_id IN ({qmarks})
+                """,
+                tuple(chunk),
+            ).fetchall():
+                out[int(r["estudio_id"])] = r
+        return out
 
     def list_admin_filtered(
         self,
@@ -268,71 +425,61 @@ class StudyRepo:
         include_not_sent: bool = True,
         limit: int = 1500,
     ) -> list[sqlite3.Row]:
-        where: list[str] = []
-        params: list[object] = []
-
-        # --- filtro por rango de enviado_en ---
-        if enviado_from or enviado_to:
-            if include_not_sent:
-                parts: list[str] = []
-                if enviado_from:
-                    parts.append("date(e.enviado_en) >= date(?)")
-                    params.append(enviado_from)
-                if enviado_to:
-                    parts.append("date(e.enviado_en) <= date(?)")
-                    params.append(enviado_to)
-
-                if parts:
-                    where.append("(e.enviado_en IS NULL OR (" + " AND ".join(parts) + "))")
-                else:
-                    where.append("e.enviado_en IS NULL")
-            else:
-                where.append("e.enviado_en IS NOT NULL")
-                if enviado_from:
-                    where.append("date(e.enviado_en) >= date(?)")
-                    params.append(enviado_from)
-                if enviado_to:
-                    where.append("date(e.enviado_en) <= date(?)")
-                    params.append(enviado_to)
-
-        # --- otros filtros ---
-        if estado and estado != "Todos":
-            where.append("e.estado_actual = ?")
-            params.append(estado)
-
-        if tipo and tipo != "Todos":
-            where.append("e.tipo = ?")
-            params.append(tipo)
-
-        if centro_id is not None:
-            where.append("e.centro_id = ?")
-            params.append(int(centro_id))
-
-        q = (q or "").strip()
-        if q:
-            like = f"%{q}%"
-            where.append(
-                "(p.cedula LIKE ? OR (p.apellidos || ' ' || p.nombres) LIKE ? OR e.subtipo LIKE ?)"
-            )
-            params.extend([like, like, like])
-
-        sql = """
-            SELECT e.estudio_id, e.tipo, e.subtipo,
-                e.centro_id, ch.nombre AS centro_nombre,
-                e.estado_actual,
-                e.ordenado_en, e.enviado_en, e.pagado_en, e.recibido_en, e.entregado_en,
-                e.resultado, e.resultado_editado_en,
-                p.cedula,
-                p.apellidos || ', ' || p.nombres AS paciente
-            FROM estudios e
-            JOIN pacientes p ON p.paciente_id = e.paciente_id
-            LEFT JOIN centros_histologicos ch ON ch.centro_id = e.centro_id
+        f = StudyFilter(
+            q=q,
+            estado=estado,
+            tipo=tipo,
+            centro_id=centro_id,
+            enviado_from=enviado_from,
+            enviado_to=enviado_to,
+            include_not_sent=include_not_sent,
+        )
+        return self.list_admin_page(f, limit=limit)
+
+    def list_admin_page(
+        self,
+        f: StudyFilter,
+        *,
+        after: StudyCursor | None = None,
+        limit: int = 200,
+    ) -> list[sqlite3.Row]:
         """
+        Página del listado (ordenado_en DESC, estudio_id DESC) que sigue a `after`
+        (cursor de la última fila ya mostrada, ver page_cursor). Keyset: cada
+        página cuesta lo mismo sin importar cuántas se hayan leído antes.
+        """
+        where, params = _filter_where(f)
+        if after is not None:
+            where.append("(e.ordenado_en, e.estudio_id) < (?, ?)")
+            params.extend([after[0], int(after[1])])
 
+        sql = _ADMIN_SELECT
         if where:
             sql += " WHERE " + " AND ".join(where)
-
-        sql += " ORDER BY datetime(e.ordenado_en) DESC, e.estudio_id DESC LIMIT ?"
+        sql += " ORDER BY e.ordenado_en DESC, e.estudio_id DESC LIMIT ?"
         params.append(int(limit))
 
         return self.conn.execute(sql, tuple(params)).fetchall()
+
+    def count_admin(self, f: StudyFilter) -> int:
+        # Solo estado/tipo: sale de estudios_counters sin recorrer estudios
+        if not (f.q.strip() or f.centro_id is not None or f.enviado_from or f.enviado_to):
+            where: list[str] = []
+            params: list[object] = []
+            if f.estado and f.estado != "Todos":
+                where.append("estado_actual = ?")
+                params.append(f.estado)
+            if f.tipo and f.tipo != "Todos":
+                where.append("tipo = ?")
+                params.append(f.tipo)
+            sql = "SELECT COALESCE(SUM(n), 0) FROM estudios_counters"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            return int(self.conn.execute(sql, tuple(params)).fetchone()[0])
+
+        where, params = _filter_where(f)
+        sql = "SELECT COUNT(*) FROM estudios e"
+        if f.q.strip():
+            sql += " JOIN pacientes p ON p.paciente_id = e.paciente_id"
+        sql += " WHERE " + " AND ".join(where)
+        return int(self.conn.execute(sql, tuple(params)).fetchone()[0])
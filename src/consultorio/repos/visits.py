@@ -2,25 +2,36 @@ from __future__ import annotations
 
 import sqlite3
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import date
 
+from consultorio.db.connection import DbHandle
+from consultorio.db.timestamps import day_range, now_ts
+from consultorio.db.uow import commit
 from consultorio.domain.rules import DomainError
 
 
 class VisitRepo:
-    def __init__(self, conn: sqlite3.Connection):
+    def __init__(self, conn: DbHandle):
         self.conn = conn
 
     def list_today(self) -> list[sqlite3.Row]:
-        return self.conn.execute(
-            """SELECT c.cita_id, c.fecha_consulta, p.cedula,
+        today = date.today().isoformat()
+        return self._list_between(*day_range(today), limit=None)
+
+    def _list_between(self, lo: str, hi: str, *, limit: int | None) -> list[sqlite3.Row]:
+        # fecha_consulta en texto canónico local: rango directo sobre idx_citas_fecha
+        sql = """SELECT c.cita_id, c.paciente_id, c.fecha_consulta, p.cedula,
                       p.apellidos || ', ' || p.nombres AS paciente,
                       c.motivo_consulta, c.forma_pago
                FROM citas c
                JOIN pacientes p ON p.paciente_id = c.paciente_id
-               WHERE date(c.fecha_consulta, 'localtime') = date('now','localtime')
+               WHERE c.fecha_consulta >= ? AND c.fecha_consulta < ?
                ORDER BY c.fecha_consulta DESC"""
-        ).fetchall()
+        params: tuple[object, ...] = (lo, hi)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params += (int(limit),)
+        return self.conn.execute(sql, params).fetchall()
 
     def list_by_date_range(self, start_date: str, end_date: str) -> list[sqlite3.Row]:
         """
@@ -33,33 +44,23 @@ class VisitRepo:
             # fallback: hoy
             return self.list_today()
 
-        return self.conn.execute(
-            """SELECT c.cita_id, c.fecha_consulta, p.cedula,
-                    p.apellidos || ', ' || p.nombres AS paciente,
-                    c.motivo_consulta, c.forma_pago
-            FROM citas c
-            JOIN pacientes p ON p.paciente_id = c.paciente_id
-            WHERE date(c.fecha_consulta, 'localtime') BETWEEN date(?) AND date(?)
-            ORDER BY datetime(c.fecha_consulta) DESC
-            LIMIT 1000""",
-            (s, e),
-        ).fetchall()
+        try:
+            lo, hi = day_range(s, e)
+        except ValueError:
+            raise DomainError("Fecha inválida: usa el formato AAAA-MM-DD.") from None
+        return self._list_between(lo, hi, limit=1000)
 
     def list_for_patient(self, paciente_id: int) -> list[sqlite3.Row]:
         return self.conn.execute(
             """SELECT cita_id, fecha_consulta, motivo_consulta, diagnostico, plan, forma_pago
                FROM citas
                WHERE paciente_id=?
-               ORDER BY datetime(fecha_consulta) DESC
+               ORDER BY fecha_consulta DESC
                LIMIT 200""",
             (paciente_id,),
         ).fetchall()
 
 
-def _now_iso() -> str:
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-
 @dataclass
 class VisitCreate:
     paciente_id: int
@@ -83,16 +84,22 @@ class VisitCreate:
 
 
 class VisitCrud:
-    def __init__(self, conn: sqlite3.Connection):
+    def __init__(self, conn: DbHandle):
         self.conn = conn
 
     def create(self, v: VisitCreate) -> int:
+        cita_id = self.insert(v)
+        commit(self.conn)
+        return cita_id
+
+    def insert(self, v: VisitCreate) -> int:
+        """Como create() pero sin commit: para usar dentro de una transacción mayor."""
         if not v.paciente_id:
             raise DomainError("paciente_id requerido.")
         if not v.forma_pago.strip():
             raise DomainError("Forma de pago requerida.")
 
-        fecha = v.fecha_consulta or _now_iso()
+        fecha = v.fecha_consulta or now_ts()
         cur = self.conn.execute(
             """INSERT INTO citas
                (paciente_id, fecha_consulta, fum, g_p, g_c, g_a, g_ee, g_otros,
@@ -119,10 +126,9 @@ class VisitCrud:
                 v.diagnostico.strip() or None,
                 v.plan.strip() or None,
                 v.forma_pago.strip(),
-                _now_iso(),
+                now_ts(),
             ),
         )
-        self.conn.commit()
         last_id = cur.lastrowid
         if last_id is None:
             raise RuntimeError("No se pudo obtener lastrowid del INSERT (unexpected).")
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import logging
+import threading
+from collections.abc import Callable
+from pathlib import Path
+
+from consultorio.db.backup import BackupJob, ProgressFn
+from consultorio.db.backup_store import BackupStore, RetentionPolicy
+
+log = logging.getLogger(__name__)
+
+
+class BackupScheduler:
+    """
+    Respaldos programados:
+    - cada `interval_minutes` (0 = desactivado) en un hilo temporizador
+    - `run_now()` para el botón manual
+    - `shutdown(final_backup=True)` al cerrar la app (sin bloquear: se vuelve a llamar
+      desde un after() hasta que devuelva None)
+    Nunca corre más de un respaldo a la vez. Con `store`, cada copia se ingresa
+    al almacén deduplicado (y se borra la copia suelta) antes de avisar on_done.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        backups_dir: Path,
+        *,
+        interval_minutes: int = 0,
+        on_progress: ProgressFn | None = None,
+        on_done: Callable[[BackupJob], None] | None = None,
+        store: BackupStore | None = None,
+        retention: RetentionPolicy | None = None,
+    ) -> None:
+        self.db_path = db_path
+        self.backups_dir = backups_dir
+        self.interval_s = max(0, int(interval_minutes)) * 60
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.store = store
+        self.retention = retention
+
+        self._lock = threading.Lock()
+        self._current: BackupJob | None = None
+        self._final: BackupJob | None = None
+        self._stop = threading.Event()
+        self._timer: threading.Thread | None = None
+
+    @property
+    def current(self) -> BackupJob | None:
+        with self._lock:
+            job = self._current
+        return job if job and not job.done else None
+
+    def start(self) -> None:
+        if self.interval_s <= 0 or self._timer is not None:
+            return
+        self._timer = threading.Thread(
+            target=self._loop, name="consultorio-backup-timer", daemon=True
+        )
+        self._timer.start()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self.run_now()
+
+    def run_now(self) -> BackupJob:
+        """Lanza un respaldo en segundo plano (o devuelve el que ya está en curso)."""
+        with self._lock:
+            if self._current and not self._current.done:
+                return self._current
+            self._current = BackupJob(
+                self.db_path,
+                self.backups_dir,
+                on_progress=self.on_progress,
+                on_done=self._finish,
+            )
+            return self._current.start()
+
+    def _finish(self, job: BackupJob) -> None:
+        # Corre en el hilo del respaldo: la compresión/dedup tampoco bloquea la UI
+        if self.store is not None and job.ok:
+            try:
+                self.store.add_snapshot(job.dest_path)
+                job.dest_path.unlink()
+                if self.retention is not None:
+                    self.store.apply_retention(self.retention)
+            except Exception as e:
+                job.error = e
+                log.exception("No se pudo ingresar el respaldo al almacén")
+        if self.on_done:
+            self.on_done(job)
+
+    def cancel(self) -> None:
+        job = self.current
+        if job:
+            job.cancel()
+
+    def shutdown(self, *, final_backup: bool = True) -> BackupJob | None:
+        """Detiene el temporizador sin bloquear y devuelve el respaldo que falta esperar:
+        primero el que está en curso, luego el final. None cuando ya no queda ninguno."""
+        self._stop.set()
+        job = self.current
+        if not final_backup:
+            if job:
+                job.cancel()
+            return None
+        if job:
+            return job
+        if self._final is None:
+            self._final = self.run_now()
+            return self._final
+        return None
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+log = logging.getLogger(__name__)
+
+# Cada cuánto el hilo de Tk revisa si hay resultados (solo mientras hay trabajo)
+_POLL_MS = 15
+
+# Programa `fn` dentro de `ms` milisegundos en el hilo de Tk (root.after)
+Later = Callable[[int, Callable[[], None]], object]
+
+
+@dataclass(eq=False)
+class QueryTicket:
+    """Una llamada enviada al executor. cancel() descarta su resultado."""
+
+    key: str | None
+    fn: Callable[[], Any]
+    on_done: Callable[[Any], None]
+    on_error: Callable[[BaseException], None] | None = None
+    cancelled: bool = False
+    result: Any = None
+    error: BaseException | None = None
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+@dataclass
+class ExecutorStats:
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0
+    superseded: int = 0  # cancelados antes de correr o con el resultado descartado
+
+
+@dataclass
+class QueryExecutor:
+    """
+    Corre llamadas a repos en hilos de trabajo para que el hilo de Tk no espere a SQLite:
+    - submit(key, fn, on_done): `fn` corre en un hilo; on_done/on_error se llaman en
+      el hilo de Tk cuando drain() recoge el resultado (con `later`=root.after se
+      drena solo, mientras haya trabajo pendiente)
+    - una sola llamada vigente por `key`: enviar otra con la misma clave cancela la
+      anterior (si no empezó no corre; si ya corría, su resultado se descarta)
+    - key=None: nunca se cancela (escrituras)
+
+    `fn` usa la conexión del repo: debe ser un ConnectionManager (lectores propios
+    por hilo del pool, escritor serializado) o una conexión con check_same_thread=False.
+    """
+
+    later: Later | None = None
+    workers: int = 2
+    poll_ms: int = _POLL_MS
+    stats: ExecutorStats = field(default_factory=ExecutorStats)
+    _tasks: queue.SimpleQueue[QueryTicket | None] = field(default_factory=queue.SimpleQueue)
+    _done: queue.SimpleQueue[QueryTicket] = field(default_factory=queue.SimpleQueue)
+    _latest: dict[str, QueryTicket] = field(default_factory=dict)
+    _threads: list[threading.Thread] = field(default_factory=list)
+    _inflight: int = 0
+    _polling: bool = False
+
+    # ---------------- Hilo de Tk ----------------
+
+    def submit(
+        self,
+        key: str | None,
+        fn: Callable[[], Any],
+        on_done: Callable[[Any], None],
+        on_error: Callable[[BaseException], None] | None = None,
+    ) -> QueryTicket:
+        ticket = QueryTicket(key, fn, on_done, on_error)
+        if key is not None:
+            prev = self._latest.get(key)
+            if prev is not None:
+                prev.cancel()
+            self._latest[key] = ticket
+
+        self.stats.submitted += 1
+        self._inflight += 1
+        self._ensure_workers()
+        self._tasks.put(ticket)
+
+        if self.later is not None and not self._polling:
+            self._polling = True
+            self.later(self.poll_ms, self._poll)
+        return ticket
+
+    def cancel(self, key: str) -> None:
+        """Descarta la llamada vigente con esta clave (si la hay)."""
+        ticket = self._latest.get(key)
+        if ticket is not None:
+            ticket.cancel()
+
+    def busy(self, key: str) -> bool:
+        """¿Hay una llamada vigente (no entregada) con esta clave?"""
+        return key in self._latest
+
+    @property
+    def pending(self) -> int:
+        return self._inflight
+
+    def drain(self) -> int:
+        """Entrega los resultados listos en el hilo que llama. Devuelve cuántos entregó."""
+        delivered = 0
+        while True:
+            try:
+                ticket = self._done.get_nowait()
+            except queue.Empty:
+                return delivered
+            self._inflight -= 1
+            if ticket.key is not None and self._latest.get(ticket.key) is ticket:
+                del self._latest[ticket.key]
+            if ticket.cancelled:
+                self.stats.superseded += 1
+                continue
+
+            delivered += 1
+            try:
+                if ticket.error is None:
+                    self.stats.completed += 1
+                    ticket.on_done(ticket.result)
+                else:
+                    self.stats.failed += 1
+                    if ticket.on_error is not None:
+                        ticket.on_error(ticket.error)
+                    else:
+                        log.error(
+                            "Falló la consulta %s", ticket.key, exc_info=ticket.error
+                        )
+            except Exception:
+                # Un callback fallido no detiene la entrega de los demás
+                log.exception("Falló el callback de la consulta %s", ticket.key)
+
+    def wait(self, timeout: float = 5.0) -> bool:
+        """Drena hasta que no quede trabajo (tests, scripts). False si venció el plazo."""
+        deadline = time.monotonic() + timeout
+        while self._inflight:
+            if time.monotonic() >= deadline:
+                return False
+            self.drain()
+            time.sleep(0.001)
+        return True
+
+    def shutdown(self) -> None:
+        for ticket in self._latest.values():
+            ticket.cancel()
+        for _t in self._threads:
+            self._tasks.put(None)
+        self._threads.clear()
+
+    def _poll(self) -> None:
+        self.drain()
+        if self._inflight and self.later is not None:
+            self.later(self.poll_ms, self._poll)
+        else:
+            self._polling = False
+
+    def _ensure_workers(self) -> None:
+        while len(self._threads) < max(1, int(self.workers)):
+            t = threading.Thread(
+                target=self._work, name=f"consultorio-query-{len(self._threads)}", daemon=True
+            )
+            self._threads.append(t)
+            t.start()
+
+    # ---------------- Hilos de trabajo ----------------
+
+    def _work(self) -> None:
+        while True:
+            ticket = self._tasks.get()
+            if ticket is None:
+                return
+            if not ticket.cancelled:
+                try:
+                    ticket.result = ticket.fn()
+                except BaseException as e:  # se entrega vía on_error
+                    ticket.error = e
+            self._done.put(ticket)
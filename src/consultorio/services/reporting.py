@@ -1,22 +1,60 @@
 from __future__ import annotations
 
+import argparse
 import sqlite3
 
+from consultorio.db.connection import DbHandle
+from consultorio.db.schema import ESTUDIOS_COUNTERS_FILL
+from consultorio.db.timestamps import days_ago_ts
+from consultorio.db.uow import unit_of_work
 
-def counts_pending_by_status(conn: sqlite3.Connection) -> dict[str, int]:
+
+def counts_pending_by_status(conn: DbHandle) -> dict[str, int]:
+    # Lee estudios_counters (mantenida por triggers): O(#estados), no O(#estudios)
     rows = conn.execute(
         """
-        SELECT estado_actual, COUNT(*) AS n
-        FROM estudios
+        SELECT estado_actual, SUM(n) AS n
+        FROM estudios_counters
         WHERE estado_actual <> 'entregado'
         GROUP BY estado_actual
+        HAVING SUM(n) > 0
         ORDER BY estado_actual
         """
     ).fetchall()
     return {str(r["estado_actual"]): int(r["n"]) for r in rows}
 
 
-def overdue_studies(conn: sqlite3.Connection, *, days: int) -> list[sqlite3.Row]:
+def counts_by_status_and_type(conn: DbHandle) -> dict[tuple[str, str], int]:
+    rows = conn.execute(
+        "SELECT estado_actual, tipo, n FROM estudios_counters WHERE n > 0"
+    ).fetchall()
+    return {(str(r["estado_actual"]), str(r["tipo"])): int(r["n"]) for r in rows}
+
+
+def check_study_counters(conn: DbHandle) -> dict[tuple[str, str], tuple[int, int]]:
+    """Diferencias (guardado, real) entre estudios_counters y un conteo completo."""
+    stored = counts_by_status_and_type(conn)
+    actual = {
+        (str(r["estado_actual"]), str(r["tipo"])): int(r["n"])
+        for r in conn.execute(
+            "SELECT estado_actual, tipo, COUNT(*) AS n FROM estudios GROUP BY estado_actual, tipo"
+        ).fetchall()
+    }
+    return {
+        k: (stored.get(k, 0), actual.get(k, 0))
+        for k in stored.keys() | actual.keys()
+        if stored.get(k, 0) != actual.get(k, 0)
+    }
+
+
+def rebuild_study_counters(conn: DbHandle) -> None:
+    """Recalcula estudios_counters desde cero (si alguien tocó estudios sin triggers)."""
+    with unit_of_work(conn):
+        conn.execute("DELETE FROM estudios_counters")
+        conn.execute(ESTUDIOS_COUNTERS_FILL)
+
+
+def overdue_studies(conn: DbHandle, *, days: int) -> list[sqlite3.Row]:
     # Atrasados: enviados hace más de N días y aún no recibidos
     return conn.execute(
         """
@@ -32,8 +70,44 @@ def overdue_studies(conn: sqlite3.Connection, *, days: int) -> list[sqlite3.Row]
         WHERE e.enviado_en IS NOT NULL
           AND e.recibido_en IS NULL
           AND e.estado_actual IN ('enviado','pagado')
-          AND (julianday('now','localtime') - julianday(e.enviado_en)) > ?
+          AND e.enviado_en < ?
         ORDER BY e.enviado_en ASC
         """,
-        (int(days),),
+        (days_ago_ts(days),),
     ).fetchall()
+
+
+# ---------------- CLI: python -m consultorio.services.reporting ----------------
+
+
+def main(argv: list[str] | None = None) -> int:
+    from consultorio.config import load_config
+    from consultorio.db.connection import connect
+    from consultorio.db.schema import migrate
+
+    parser = argparse.ArgumentParser(prog="python -m consultorio.services.reporting")
+    parser.add_argument("--config", default="config/config.yaml")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("check-counters", help="comparar estudios_counters con un conteo completo")
+    sub.add_parser("rebuild-counters", help="recalcular estudios_counters")
+    args = parser.parse_args(argv)
+
+    cfg = load_config(args.config)
+    conn = connect(cfg.storage.db_path, wal_mode=cfg.storage.wal_mode)
+    try:
+        migrate(conn)
+        diffs = check_study_counters(conn)
+        for (estado, tipo), (stored, actual) in sorted(diffs.items()):
+            print(f"{estado}\t{tipo}\tguardado={stored}\treal={actual}")
+        if args.cmd == "check-counters":
+            print("ok" if not diffs else f"{len(diffs)} diferencias")
+            return 0 if not diffs else 1
+        rebuild_study_counters(conn)
+        print("contadores recalculados")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+
+# Presupuesto de tiempo hasta el primer pintado (objetivo con una DB de ~1M filas)
+FIRST_PAINT_BUDGET_MS = 800.0
+
+
+@dataclass
+class StartupTimeline:
+    """
+    Marcas de tiempo del arranque (config, migrate, primer pintado, primeros datos).
+    Cada marca se registra una sola vez; los tiempos son ms desde `t0`.
+    """
+
+    t0: float = field(default_factory=time.perf_counter)
+    marks: dict[str, float] = field(default_factory=dict)
+
+    def mark(self, name: str) -> None:
+        if name not in self.marks:
+            self.marks[name] = (time.perf_counter() - self.t0) * 1000.0
+
+    def over_budget(self, budget_ms: float = FIRST_PAINT_BUDGET_MS) -> bool:
+        return self.marks.get("first_paint", 0.0) > budget_ms
+
+    def report(self, budget_ms: float = FIRST_PAINT_BUDGET_MS) -> str:
+        lines = ["Arranque (ms desde el inicio):"]
+        prev = 0.0
+        for name, ms in sorted(self.marks.items(), key=lambda kv: kv[1]):
+            lines.append(f"  {ms:8.1f}  (+{ms - prev:7.1f})  {name}")
+            prev = ms
+        if "first_paint" in self.marks:
+            state = "EXCEDIDO" if self.over_budget(budget_ms) else "ok"
+            lines.append(f"  primer pintado: presupuesto {budget_ms:.0f} ms -> {state}")
+        return "\n".join(lines)
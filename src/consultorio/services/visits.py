@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+from consultorio.config import Settings
+from consultorio.db.connection import DbHandle
+from consultorio.db.uow import unit_of_work
+from consultorio.domain.rules import validate_forma_pago, validate_study_limits
+from consultorio.repos.studies import StudyCreate, StudyRepo
+from consultorio.repos.visits import VisitCreate, VisitCrud
+
+
+class VisitService:
+    def __init__(self, conn: DbHandle, cfg: Settings):
+        self.conn = conn
+        self.cfg = cfg
+        self.visits = VisitCrud(conn)
+        self.studies = StudyRepo(conn)
+
+    def create_with_studies(
+        self,
+        v: VisitCreate,
+        *,
+        citologias: Sequence[str] = (),
+        biopsias: Sequence[str] = (),
+    ) -> int:
+        """
+        Cita + estudios (estado 'ordenado', sin centro) en UNA transacción:
+        un solo commit, y si algo falla no queda una cita con estudios a medias.
+        """
+        validate_forma_pago(self.cfg, v.forma_pago.strip())
+        validate_study_limits(self.cfg, citologias=len(citologias), biopsias=len(biopsias))
+
+        with unit_of_work(self.conn):
+            cita_id = self.visits.insert(v)
+            self.studies.insert_many(
+                [
+                    StudyCreate(
+                        cita_id=cita_id,
+                        paciente_id=v.paciente_id,
+                        tipo=tipo,
+                        subtipo=sub,
+                        centro_id=None,
+                    )
+                    for tipo, subs in (("citologia", citologias), ("biopsia", biopsias))
+                    for sub in subs
+                ]
+            )
+        return cita_id
@@ -0,0 +1,337 @@
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import platform
+import random
+import sqlite3
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import asdict, dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any
+
+from consultorio.db.connection import DbHandle
+from consultorio.db.uow import unit_of_work
+from consultorio.domain.text import fold
+from consultorio.repos.dossier import PatientDossierRepo
+from consultorio.repos.patients import PatientRepo
+from consultorio.repos.studies import StudyFilter, StudyRepo, page_cursor
+from consultorio.repos.visits import VisitRepo
+from consultorio.services.reporting import overdue_studies
+
+# Versión del formato del JSON de referencia
+BASELINE_FORMAT = 1
+
+
+class _Rollback(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class BenchCase:
+    name: str
+    fn: Callable[[], object]  # devuelve las filas leídas (len) o cuántas filas tocó (int)
+
+
+@dataclass(frozen=True)
+class BenchResult:
+    name: str
+    runs: int
+    p50_ms: float
+    p95_ms: float
+    rows: int  # filas por llamada (la última medida)
+    rows_per_s: float  # filas de todas las llamadas / tiempo total
+
+
+@dataclass(frozen=True)
+class Regression:
+    name: str
+    baseline_ms: float
+    current_ms: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current_ms / self.baseline_ms if self.baseline_ms else math.inf
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    """Percentil `pct` (0-100) con interpolación lineal entre las muestras ordenadas."""
+    if not samples:
+        raise ValueError("percentile() sin muestras")
+    xs = sorted(samples)
+    pos = (len(xs) - 1) * pct / 100.0
+    lo = math.floor(pos)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (pos - lo)
+
+
+def _row_count(out: object) -> int:
+    if isinstance(out, int):
+        return out
+    if out is None:
+        return 0
+    try:
+        return len(out)  # type: ignore[arg-type]
+    except TypeError:
+        return 1
+
+
+def run_case(case: BenchCase, *, repeat: int = 20, warmup: int = 2) -> BenchResult:
+    for _ in range(warmup):
+        case.fn()
+    times: list[float] = []
+    total_rows = 0
+    rows = 0
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        out = case.fn()
+        times.append(time.perf_counter() - t0)
+        rows = _row_count(out)
+        total_rows += rows
+    elapsed = sum(times)
+    return BenchResult(
+        name=case.name,
+        runs=len(times),
+        p50_ms=percentile(times, 50) * 1000.0,
+        p95_ms=percentile(times, 95) * 1000.0,
+        rows=rows,
+        rows_per_s=total_rows / elapsed if elapsed > 0 else 0.0,
+    )
+
+
+def run_suite(
+    cases: Sequence[BenchCase],
+    *,
+    repeat: int = 20,
+    warmup: int = 2,
+    on_result: Callable[[BenchResult], None] | None = None,
+) -> list[BenchResult]:
+    results = []
+    for case in cases:
+        r = run_case(case, repeat=repeat, warmup=warmup)
+        results.append(r)
+        if on_result is not None:
+            on_result(r)
+    return results
+
+
+# ---------------- Casos: métodos de repos sobre la DB dada ----------------
+
+
+def repo_cases(conn: DbHandle, *, seed: int = 1) -> list[BenchCase]:
+    """
+    Un caso por método (y variante) que importa para la UI. Los parámetros
+    (cédula, apellido, paciente, estudio) se eligen de la propia DB con `seed`,
+    así dos corridas sobre la misma DB miden exactamente lo mismo.
+    """
+    rng = random.Random(seed)
+    patients = PatientRepo(conn)
+    studies = StudyRepo(conn)
+    visits = VisitRepo(conn)
+    dossier = PatientDossierRepo(conn)
+
+    max_pid = conn.execute("SELECT COALESCE(MAX(paciente_id), 0) FROM pacientes").fetchone()[0]
+    if not max_pid:
+        raise ValueError("La DB no tiene pacientes: genérala con consultorio.tools.synth")
+    patient = conn.execute(
+        "SELECT paciente_id, cedula, apellidos, nombres FROM pacientes "
+        "WHERE paciente_id >= ? ORDER BY paciente_id LIMIT 1",
+        (rng.randint(1, int(max_pid)),),
+    ).fetchone()
+    pid = int(patient["paciente_id"])
+    cedula = str(patient["cedula"])
+    apellido = fold(str(patient["apellidos"])).split()[0]
+    nombre = fold(str(patient["nombres"])).split()[0]
+
+    # Fechas relativas a los datos (no a hoy): la DB puede ser de otro día
+    last = conn.execute("SELECT MAX(fecha_consulta) FROM citas").fetchone()[0]
+    last_day = date.fromisoformat(str(last)[:10]) if last else date.today()
+    month_ago = (last_day - timedelta(days=30)).isoformat()
+
+    everything = StudyFilter()
+    deep = studies.list_admin_page(everything, limit=2000)
+    deep_cursor = page_cursor(deep[-1]) if deep else None
+
+    toggle_row = conn.execute(
+        "SELECT estudio_id FROM estudios "
+        "WHERE estado_actual = 'enviado' AND centro_id IS NOT NULL LIMIT 1"
+    ).fetchone()
+
+    def load_dossier() -> int:
+        d = dossier.load(pid)
+        return 0 if d is None else 1 + len(d.visits) + len(d.studies)
+
+    def toggle_pair() -> int:
+        # Marca y desmarca 'pagado' en una transacción que se deshace: la DB no
+        # cambia aunque se apunte a la de la clínica (mide sin el fsync del commit)
+        if toggle_row is None:
+            return 0
+        estudio_id = int(toggle_row[0])
+        try:
+            with unit_of_work(conn):
+                studies.toggle_state(estudio_id, "pagado")
+                studies.toggle_state(estudio_id, "pagado")
+                raise _Rollback
+        except _Rollback:
+            pass
+        return 2
+
+    return [
+        BenchCase("PatientRepo.search[vacio]", lambda: patients.search("")),
+        BenchCase("PatientRepo.search[cedula]", lambda: patients.search(cedula)),
+        BenchCase("PatientRepo.search[apellido]", lambda: patients.search(apellido)),
+        BenchCase("PatientRepo.search[prefijo2]", lambda: patients.search(apellido[:2])),
+        BenchCase(
+            "PatientRepo.search[nombre+apellido]",
+            lambda: patients.search(f"{nombre} {apellido[:4]}"),
+        ),
+        BenchCase("PatientDossierRepo.load", load_dossier),
+        BenchCase("StudyRepo.list_admin_filtered[todos]", lambda: studies.list_admin_filtered()),
+        BenchCase(
+            "StudyRepo.list_admin_filtered[enviado]",
+            lambda: studies.list_admin_filtered(estado="enviado"),
+        ),
+        BenchCase(
+            "StudyRepo.list_admin_filtered[q]",
+            lambda: studies.list_admin_filtered(q=apellido[:5]),
+        ),
+        BenchCase(
+            "StudyRepo.list_admin_filtered[enviado_30d]",
+            lambda: studies.list_admin_filtered(
+                enviado_from=month_ago, enviado_to=last_day.isoformat(), include_not_sent=False
+            ),
+        ),
+        BenchCase(
+            "StudyRepo.list_admin_page[pagina_11]",
+            lambda: studies.list_admin_page(everything, after=deep_cursor),
+        ),
+        # Devuelve un total, no filas: cuenta como una fila leída
+        BenchCase("StudyRepo.count_admin[todos]", lambda: [studies.count_admin(everything)]),
+        BenchCase(
+            "VisitRepo.list_by_date_range[30d]",
+            lambda: visits.list_by_date_range(month_ago, last_day.isoformat()),
+        ),
+        BenchCase("VisitRepo.list_for_patient", lambda: visits.list_for_patient(pid)),
+        BenchCase("overdue_studies[30d]", lambda: overdue_studies(conn, days=30)),
+        BenchCase("StudyRepo.toggle_state[marcar+desmarcar]", toggle_pair),
+    ]
+
+
+# ---------------- JSON de referencia ----------------
+
+
+def db_meta(conn: DbHandle) -> dict[str, Any]:
+    counts = {
+        table: int(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0])
+        for table in ("pacientes", "citas", "estudios")
+    }
+    return {
+        **counts,
+        "sqlite": sqlite3.sqlite_version,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+    }
+
+
+def to_baseline(results: Sequence[BenchResult], meta: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "format": BASELINE_FORMAT,
+        "meta": meta,
+        "results": {r.name: asdict(r) for r in results},
+    }
+
+
+def compare(
+    results: Sequence[BenchResult],
+    baseline: dict[str, Any],
+    *,
+    tolerance: float = 0.25,
+    min_delta_ms: float = 0.5,
+) -> list[Regression]:
+    """
+    Casos cuyo p50 empeoró más de `tolerance` (0.25 = 25 %) respecto de `baseline`.
+    Diferencias menores a `min_delta_ms` se ignoran (ruido en consultas de microsegundos).
+    Los casos que no están en la referencia no se comparan.
+    """
+    if baseline.get("format") != BASELINE_FORMAT:
+        raise ValueError("Formato de referencia desconocido.")
+    before = baseline.get("results", {})
+    out = []
+    for r in results:
+        prev = before.get(r.name)
+        if prev is None:
+            continue
+        base = float(prev["p50_ms"])
+        if r.p50_ms > base * (1 + tolerance) and r.p50_ms - base >= min_delta_ms:
+            out.append(Regression(r.name, base, r.p50_ms))
+    return out
+
+
+# ---------------- CLI: python -m consultorio.tools.bench ----------------
+
+
+def _print_result(r: BenchResult) -> None:
+    print(
+        f"{r.name:<45} p50 {r.p50_ms:9.2f} ms  p95 {r.p95_ms:9.2f} ms  "
+        f"{r.rows:6d} filas  {r.rows_per_s:12.0f} filas/s"
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    from consultorio.db.connection import ConnectionManager
+    from consultorio.db.schema import migrate
+    from consultorio.tools.synth import SynthSpec, generate
+
+    parser = argparse.ArgumentParser(
+        prog="python -m consultorio.tools.bench",
+        description="Mide p50/p95 y filas/s de los métodos de repos sobre una DB sintética.",
+    )
+    parser.add_argument("db", type=Path, help="DB a medir; si no existe se genera")
+    parser.add_argument("--patients", type=int, default=SynthSpec.patients)
+    parser.add_argument("--seed", type=int, default=SynthSpec.seed)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--only", default="", help="solo los casos que contienen este texto")
+    parser.add_argument("--out", type=Path, help="escribe los resultados como referencia JSON")
+    parser.add_argument("--compare", type=Path, help="compara contra una referencia JSON")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    fresh = not args.db.exists()
+    db = ConnectionManager(args.db)
+    try:
+        migrate(db.writer)
+        if fresh:
+            print(f"Generando {args.patients} pacientes en {args.db} ...")
+            generate(db, SynthSpec(patients=args.patients, seed=args.seed))
+
+        cases = [c for c in repo_cases(db, seed=args.seed) if args.only in c.name]
+        results = run_suite(cases, repeat=args.repeat, warmup=args.warmup, on_result=_print_result)
+        meta = db_meta(db)
+    finally:
+        db.close()
+
+    if args.out:
+        args.out.write_text(
+            json.dumps(to_baseline(results, meta), indent=2, ensure_ascii=False), encoding="utf-8"
+        )
+        print(f"Referencia escrita en {args.out}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, tolerance=args.tolerance)
+        for reg in regressions:
+            print(
+                f"REGRESIÓN {reg.name}: {reg.baseline_ms:.2f} -> {reg.current_ms:.2f} ms "
+                f"(x{reg.ratio:.2f})"
+            )
+        print("sin regresiones" if not regressions else f"{len(regressions)} regresiones")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
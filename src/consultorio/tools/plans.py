@@ -0,0 +1,478 @@
+from __future__ import annotations
+
+import argparse
+import itertools
+import re
+import sqlite3
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from consultorio.db.uow import unit_of_work
+from consultorio.repos.dossier import PatientDossierRepo
+from consultorio.repos.patients import PatientRepo, PatientUpsert
+from consultorio.repos.studies import StudyFilter, StudyRepo
+from consultorio.repos.visits import VisitRepo
+from consultorio.services import reporting
+
+# Tablas que crecen con el uso: recorrerlas enteras es un problema
+LARGE_TABLES = frozenset({"pacientes", "citas", "estudios"})
+
+# Sentencias que tiene sentido planear (INSERT ... VALUES, BEGIN, etc. no)
+_PLANNED = ("SELECT", "WITH", "UPDATE", "DELETE")
+
+_SQL_KEYWORDS = frozenset(
+    {"on", "where", "join", "left", "inner", "cross", "order", "group", "limit", "using", "set"}
+)
+_FROM_RE = re.compile(r"\b(?:FROM|JOIN|UPDATE)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+_SCAN_RE = re.compile(r"^SCAN (\w+)(.*)$")
+_ORDER_BY_RE = re.compile(r"\bORDER BY\s+(.+?)(?:\bLIMIT\b|$)", re.IGNORECASE | re.DOTALL)
+
+# Hallazgos
+SCAN = "scan"  # recorre una tabla grande completa
+TEMP_ORDER = "temp_order"  # ordena en memoria (USE TEMP B-TREE FOR ORDER BY)
+
+
+@dataclass(frozen=True)
+class Sample:
+    """Ids reales de la DB para los métodos que necesitan una fila existente."""
+
+    paciente_id: int
+    estudio_enviado: int  # con enviado_en: toggle lo desmarca
+    estudio_recibido: int  # con recibido_en: admite resultado
+
+
+# Ejecuta una forma de consulta sobre la conexión con los ids de la muestra
+ShapeCall = Callable[[sqlite3.Connection, Sample], object]
+
+
+@dataclass(frozen=True)
+class QueryShape:
+    """Una forma de consulta de los repos: `call` la ejecuta sobre la conexión."""
+
+    name: str
+    call: ShapeCall
+    # Hallazgos conocidos: cada (SCAN|TEMP_ORDER, motivo) acepta UNO de ese tipo;
+    # si aparece otro más (p.ej. en una subconsulta) falla igual
+    accept: tuple[tuple[str, str], ...] = ()
+
+
+@dataclass(frozen=True)
+class Finding:
+    kind: str
+    detail: str  # la línea del plan
+    table: str | None = None
+    suggestion: str | None = None
+
+
+@dataclass
+class PlanReport:
+    shape: str
+    sql: str
+    plan: list[str]
+    findings: list[Finding] = field(default_factory=list)  # sin aceptar: fallan
+    accepted: list[tuple[Finding, str]] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.findings
+
+
+# ---------------- Análisis de un plan ----------------
+
+
+def table_aliases(sql: str) -> dict[str, str]:
+    """alias (o nombre) -> tabla, de los FROM/JOIN/UPDATE de la sentencia."""
+    out: dict[str, str] = {}
+    for table, alias in _FROM_RE.findall(sql):
+        out[table] = table
+        if alias and alias.lower() not in _SQL_KEYWORDS:
+            out[alias] = table
+    return out
+
+
+def _where_columns(sql: str, alias: str, table: str) -> list[str]:
+    """Columnas de `alias` comparadas en el WHERE (=, IN, IS primero; luego rangos)."""
+    where = re.split(r"\bWHERE\b", sql, maxsplit=1, flags=re.IGNORECASE)
+    if len(where) < 2:
+        return []
+    body = re.split(r"\b(?:ORDER BY|GROUP BY|LIMIT)\b", where[1], flags=re.IGNORECASE)[0]
+    prefix = rf"(?:\b{re.escape(alias)}\.)" + ("?" if alias == table else "")
+    col = rf"{prefix}(\w+)\s*"
+    eq = re.findall(col + r"(?:=|\bIN\b|\bIS\b)", body, re.IGNORECASE)
+    rng = re.findall(col + r"(?:>=|<=|<|>)", body, re.IGNORECASE)
+    return list(dict.fromkeys(c for c in eq + rng if c.lower() not in _SQL_KEYWORDS))
+
+
+def _order_columns(sql: str, alias: str) -> list[str]:
+    m = _ORDER_BY_RE.search(sql)
+    if not m:
+        return []
+    cols = []
+    for part in m.group(1).split(","):
+        term = part.strip().split()[0] if part.strip() else ""
+        owner, _, col = term.rpartition(".")
+        if col and owner in ("", alias):
+            cols.append(col)
+    return cols
+
+
+# tabla -> [(nombre, columnas)] de sus índices
+Indexes = dict[str, list[tuple[str, tuple[str, ...]]]]
+
+
+def existing_indexes(conn: sqlite3.Connection) -> Indexes:
+    out: Indexes = {}
+    for table in sorted(LARGE_TABLES):
+        for idx in conn.execute(f"PRAGMA index_list({table})").fetchall():
+            cols = tuple(str(r[2]) for r in conn.execute(f"PRAGMA index_info({idx[1]})"))
+            out.setdefault(table, []).append((str(idx[1]), cols))
+    return out
+
+
+def suggest_index(table: str, columns: list[str], indexes: Indexes | None = None) -> str | None:
+    """CREATE INDEX para `columns`, o aviso si ya hay un índice que empieza por ellas."""
+    if not columns:
+        return None
+    for name, cols in (indexes or {}).get(table, []):
+        if tuple(cols[: len(columns)]) == tuple(columns):
+            return f"ya existe {name}{cols}: revisar por qué el planner no lo usa"
+    name = f"idx_{table}_{'_'.join(columns)}"
+    return f"CREATE INDEX {name} ON {table}({', '.join(columns)})"
+
+
+def analyze(sql: str, plan: list[str], indexes: Indexes | None = None) -> list[Finding]:
+    """Busca recorridos completos de tablas grandes y ORDER BY resueltos en memoria."""
+    aliases = table_aliases(sql)
+    out: list[Finding] = []
+    for line in plan:
+        m = _SCAN_RE.match(line)
+        if m:
+            alias, rest = m.groups()
+            table = aliases.get(alias, alias)
+            # "SCAN e USING INDEX ..." recorre en el orden del índice (ORDER BY + LIMIT)
+            if table in LARGE_TABLES and "INDEX" not in rest:
+                cols = _where_columns(sql, alias, table)
+                out.append(Finding(SCAN, line, table, suggest_index(table, cols, indexes)))
+        elif "TEMP B-TREE FOR" in line and "ORDER BY" in line:
+            # Índice sugerido: igualdades del WHERE + columnas del ORDER BY, de la tabla
+            # que manda en el orden (la primera del ORDER BY con alias)
+            sort_table: str | None = None
+            suggestion: str | None = None
+            for alias, name in aliases.items():
+                order = _order_columns(sql, alias)
+                if name in LARGE_TABLES and order:
+                    sort_table = name
+                    eq = [c for c in _where_columns(sql, alias, name) if c not in order]
+                    suggestion = suggest_index(name, eq + order, indexes)
+                    break
+            out.append(Finding(TEMP_ORDER, line, sort_table, suggestion))
+    return out
+
+
+# ---------------- Captura y plan ----------------
+
+
+class _Rollback(Exception):
+    pass
+
+
+def capture_sql(
+    conn: sqlite3.Connection, call: Callable[[sqlite3.Connection], object]
+) -> list[str]:
+    """
+    Ejecuta `call` dentro de una transacción que se deshace y devuelve las sentencias
+    que planear, ya con sus parámetros (set_trace_callback), sin repetidas.
+    """
+    seen: list[str] = []
+    try:
+        with unit_of_work(conn):
+            conn.set_trace_callback(seen.append)
+            try:
+                call(conn)
+            finally:
+                conn.set_trace_callback(None)
+            raise _Rollback
+    except _Rollback:
+        pass
+    planned = [s for s in seen if s.lstrip().split(None, 1)[0].upper() in _PLANNED]
+    return list(dict.fromkeys(planned))
+
+
+def explain(conn: sqlite3.Connection, sql: str) -> list[str]:
+    return [str(r[3]) for r in conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()]
+
+
+def check_shape(
+    conn: sqlite3.Connection,
+    shape: QueryShape,
+    sample: Sample,
+    indexes: Indexes | None = None,
+) -> list[PlanReport]:
+    reports = []
+    allowance = list(shape.accept)
+    for sql in capture_sql(conn, lambda c: shape.call(c, sample)):
+        plan = explain(conn, sql)
+        report = PlanReport(shape.name, " ".join(sql.split()), plan)
+        for finding in analyze(sql, plan, indexes):
+            reason = next((r for kind, r in allowance if kind == finding.kind), None)
+            if reason is None:
+                report.findings.append(finding)
+            else:
+                allowance.remove((finding.kind, reason))
+                report.accepted.append((finding, reason))
+        reports.append(report)
+    return reports
+
+
+def check_all(conn: sqlite3.Connection, shapes: list[QueryShape] | None = None) -> list[PlanReport]:
+    """Planes de todo el catálogo (o de `shapes`) sobre una DB con datos."""
+    sample = sample_ids(conn)
+    indexes = existing_indexes(conn)
+    return [
+        r for shape in shapes or catalogue() for r in check_shape(conn, shape, sample, indexes)
+    ]
+
+
+# ---------------- Catálogo de formas de consulta ----------------
+
+
+def _first_id(conn: sqlite3.Connection, sql: str) -> int:
+    row = conn.execute(sql).fetchone()
+    if row is None:
+        raise LookupError(f"La DB no tiene datos para: {sql}")
+    return int(row[0])
+
+
+def sample_ids(conn: sqlite3.Connection) -> Sample:
+    return Sample(
+        paciente_id=_first_id(conn, "SELECT paciente_id FROM citas LIMIT 1"),
+        estudio_enviado=_first_id(
+            conn, "SELECT estudio_id FROM estudios WHERE enviado_en IS NOT NULL LIMIT 1"
+        ),
+        estudio_recibido=_first_id(
+            conn, "SELECT estudio_id FROM estudios WHERE recibido_en IS NOT NULL LIMIT 1"
+        ),
+    )
+
+
+def _update_patient(conn: sqlite3.Connection, s: Sample) -> None:
+    repo = PatientRepo(conn)
+    p = repo.get(s.paciente_id)
+    if p is None:
+        raise LookupError(f"Paciente {s.paciente_id} no encontrado")
+    repo.update(PatientUpsert(p["paciente_id"], p["cedula"], p["nombres"], p["apellidos"], ""))
+
+
+def _study_filters() -> list[tuple[str, StudyFilter]]:
+    """Todas las combinaciones de filtros del listado administrativo."""
+    out = []
+    for q, estado, tipo, centro, rango in itertools.product(
+        ("", "perez"),
+        ("Todos", "enviado"),
+        ("Todos", "biopsia"),
+        (None, 1),
+        ("", "con_no_enviados", "solo_enviados"),
+    ):
+        f = StudyFilter(
+            q=q,
+            estado=estado,
+            tipo=tipo,
+            centro_id=centro,
+            enviado_from="2026-01-01" if rango else None,
+            enviado_to="2026-01-31" if rango else None,
+            include_not_sent=rango != "solo_enviados",
+        )
+        parts = [
+            f"q={q}" if q else "",
+            estado if estado != "Todos" else "",
+            tipo if tipo != "Todos" else "",
+            "centro" if centro else "",
+            rango,
+        ]
+        out.append(("+".join(p for p in parts if p) or "todos", f))
+    return out
+
+
+# Motivos de los hallazgos aceptados
+_LIKE = "LIKE '%q%' no puede usar índices; el LIMIT corta el recorrido"
+_LIKE_COUNT = "LIKE '%q%' no puede usar índices; el conteo recorre los estudios"
+_NAME_ORDER = "ORDER BY sobre los (máx. 200) aciertos ya materializados en la subconsulta"
+_RANKING = "ranking (grupo, bm25): se ordenan solo los aciertos de la FTS (máx. 200)"
+_SUBSET = "filtro selectivo (centro / rango de enviado_en) por su índice; se ordena solo eso"
+_OVERDUE = "índice por estado: se ordenan solo los estudios pendientes"
+
+
+def _study_accepts(f: StudyFilter, *, count: bool) -> tuple[tuple[str, str], ...]:
+    out: list[tuple[str, str]] = []
+    if f.q:
+        out.append((SCAN, _LIKE_COUNT if count else _LIKE))
+    if not count and (f.centro_id is not None or f.enviado_from):
+        out.append((TEMP_ORDER, _SUBSET))
+    return tuple(out)
+
+
+def _list_page_call(f: StudyFilter) -> ShapeCall:
+    def call(c: sqlite3.Connection, _s: Sample) -> object:
+        return StudyRepo(c).list_admin_page(f, after=("2026-01-15", 10))
+
+    return call
+
+
+def _count_call(f: StudyFilter) -> ShapeCall:
+    def call(c: sqlite3.Connection, _s: Sample) -> object:
+        return StudyRepo(c).count_admin(f)
+
+    return call
+
+
+def catalogue() -> list[QueryShape]:
+    shapes = [
+        # --- PatientRepo ---
+        QueryShape(
+            "PatientRepo.search[vacio]",
+            lambda c, s: PatientRepo(c).search(""),
+            accept=((TEMP_ORDER, _NAME_ORDER),),
+        ),
+        QueryShape(
+            "PatientRepo.search[cedula]",
+            lambda c, s: PatientRepo(c).search("12345678"),
+            accept=((TEMP_ORDER, _RANKING),) * 2,
+        ),
+        QueryShape(
+            "PatientRepo.search[texto]",
+            lambda c, s: PatientRepo(c).search("perez"),
+            accept=((TEMP_ORDER, _RANKING),) * 2,
+        ),
+        QueryShape(
+            "PatientRepo.search[prefijo]",
+            lambda c, s: PatientRepo(c).search("pe"),
+            accept=((TEMP_ORDER, _RANKING),) * 2,
+        ),
+        QueryShape("PatientRepo.get", lambda c, s: PatientRepo(c).get(s.paciente_id)),
+        QueryShape("PatientRepo.update", _update_patient),
+        QueryShape(
+            "PatientDossierRepo.load", lambda c, s: PatientDossierRepo(c).load(s.paciente_id)
+        ),
+        # --- VisitRepo ---
+        QueryShape("VisitRepo.list_today", lambda c, s: VisitRepo(c).list_today()),
+        QueryShape(
+            "VisitRepo.list_by_date_range",
+            lambda c, s: VisitRepo(c).list_by_date_range("2026-01-01", "2026-01-31"),
+        ),
+        QueryShape(
+            "VisitRepo.list_for_patient", lambda c, s: VisitRepo(c).list_for_patient(s.paciente_id)
+        ),
+        # --- StudyRepo ---
+        QueryShape("StudyRepo.list_admin", lambda c, s: StudyRepo(c).list_admin()),
+        QueryShape(
+            "StudyRepo.get_admin", lambda c, s: StudyRepo(c).get_admin(s.estudio_enviado)
+        ),
+        QueryShape(
+            "StudyRepo.get_admin_many",
+            lambda c, s: StudyRepo(c).get_admin_many([s.estudio_enviado, s.estudio_recibido]),
+        ),
+        QueryShape(
+            "StudyRepo.set_center_many",
+            lambda c, s: StudyRepo(c).set_center_many([s.estudio_enviado, s.estudio_recibido], 1),
+        ),
+        QueryShape(
+            "StudyRepo.set_result",
+            lambda c, s: StudyRepo(c).set_result(s.estudio_recibido, "Negativo"),
+        ),
+        QueryShape(
+            "StudyRepo.toggle_state",
+            lambda c, s: StudyRepo(c).toggle_state(s.estudio_enviado, "enviado"),
+        ),
+        QueryShape(
+            "StudyRepo.toggle_state_many",
+            lambda c, s: StudyRepo(c).toggle_state_many([s.estudio_enviado], "enviado"),
+        ),
+        # --- services.reporting ---
+        QueryShape(
+            "reporting.counts_pending_by_status",
+            lambda c, s: reporting.counts_pending_by_status(c),
+        ),
+        QueryShape(
+            "reporting.counts_by_status_and_type",
+            lambda c, s: reporting.counts_by_status_and_type(c),
+        ),
+        QueryShape(
+            "reporting.overdue_studies",
+            lambda c, s: reporting.overdue_studies(c, days=30),
+            accept=((TEMP_ORDER, _OVERDUE),),
+        ),
+    ]
+
+    for label, f in _study_filters():
+        shapes.append(
+            QueryShape(
+                f"StudyRepo.list_admin_page[{label}]",
+                _list_page_call(f),
+                accept=_study_accepts(f, count=False),
+            )
+        )
+        shapes.append(
+            QueryShape(
+                f"StudyRepo.count_admin[{label}]",
+                _count_call(f),
+                accept=_study_accepts(f, count=True),
+            )
+        )
+    return shapes
+
+
+# ---------------- Informe / CLI: python -m consultorio.tools.plans ----------------
+
+
+def format_report(reports: list[PlanReport], *, verbose: bool = False) -> str:
+    lines = []
+    for r in reports:
+        if r.ok and not verbose:
+            continue
+        lines.append(f"{'OK ' if r.ok else 'MAL'} {r.shape}")
+        if verbose or not r.ok:
+            lines.append(f"    {r.sql[:200]}")
+            lines += [f"    | {p}" for p in r.plan]
+        for f in r.findings:
+            lines.append(f"    ! {f.kind}: {f.detail}")
+            if f.suggestion:
+                lines.append(f"      sugerencia: {f.suggestion}")
+        if verbose:
+            for f, reason in r.accepted:
+                lines.append(f"    ~ {f.kind} aceptado: {reason}")
+    bad = sum(1 for r in reports if not r.ok)
+    lines.append(f"{len(reports)} sentencias, {bad} con problemas")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    from consultorio.db.connection import connect
+    from consultorio.db.schema import migrate
+    from consultorio.tools.synth import SynthSpec, generate
+
+    parser = argparse.ArgumentParser(
+        prog="python -m consultorio.tools.plans",
+        description="EXPLAIN QUERY PLAN de cada forma de consulta de los repos.",
+    )
+    parser.add_argument("db", type=Path, help="DB a revisar; si no existe se genera")
+    parser.add_argument("--patients", type=int, default=2_000)
+    parser.add_argument("-v", "--verbose", action="store_true", help="muestra todos los planes")
+    args = parser.parse_args(argv)
+
+    fresh = not args.db.exists()
+    conn = connect(args.db)
+    try:
+        migrate(conn)
+        if fresh:
+            generate(conn, SynthSpec(patients=args.patients))
+        reports = check_all(conn)
+    finally:
+        conn.close()
+
+    print(format_report(reports, verbose=args.verbose))
+    return 0 if all(r.ok for r in reports) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,352 @@
+from __future__ import annotations
+
+import argparse
+import random
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+
+from consultorio.db.connection import DbHandle
+from consultorio.db.timestamps import TS_FORMAT
+from consultorio.db.uow import unit_of_work
+from consultorio.domain.rules import DomainError
+from consultorio.domain.text import fold
+from consultorio.repos.studies import STATE_TO_COL, STATES_ORDER
+
+# ---------------- Datos de muestra (consultorio ginecológico en Venezuela) ----------------
+
+_NOMBRES = [
+    "María", "Ana", "Carmen", "Rosa", "Luisa", "Daniela", "Gabriela", "Andreína",
+    "Mariela", "Carolina", "Yusmary", "Yelitza", "Yolimar", "Marbelis", "Génesis",
+    "Oriana", "Valentina", "Dayana", "Yoselin", "Milagros", "Beatriz", "Nathaly",
+    "Francys", "Isabel", "Elena", "Lucía", "Fabiola", "Maryuri", "Karina", "Josefina",
+    "Yraida", "Zuleima", "Desirée", "Mónica", "Patricia", "Alejandra", "Verónica",
+]
+_APELLIDOS = [
+    "García", "Rodríguez", "González", "Hernández", "Pérez", "Martínez", "López",
+    "Díaz", "Sánchez", "Romero", "Suárez", "Ramírez", "Torres", "Rojas", "Mendoza",
+    "Álvarez", "Gómez", "Fernández", "Moreno", "Gutiérrez", "Castillo", "Blanco",
+    "Marcano", "Salazar", "Rivas", "Medina", "Contreras", "Briceño", "Guzmán",
+    "Chacón", "Villalobos", "Urdaneta", "Colmenares", "Peña", "Zambrano", "Quintero",
+    "Núñez", "Carrillo", "Parra", "Ochoa", "D'Agostino", "Da Silva",
+]
+_CIUDADES = [
+    "Caracas", "Maracaibo", "Valencia", "Barquisimeto", "Maracay", "Mérida",
+    "Barcelona", "Puerto Ordaz", "San Cristóbal", "Cumaná", "Los Teques", "Guarenas",
+]
+_SECTORES = [
+    "Urb. El Paraíso", "Av. Bolívar", "Sector La Pastora", "Calle Sucre", "Los Palos Grandes",
+]
+_OPERADORAS = ["0412", "0414", "0416", "0424", "0426", "0212"]
+_COMENTARIOS = ["Alergia a penicilina", "Embarazo en curso", "Referida por medicina interna"]
+_ANTICONCEPCION = ["Ninguna", "ACO", "DIU", "Preservativo", "Implante subdérmico"]
+_MOTIVOS = [
+    "Control ginecológico", "Citología anual", "Dolor pélvico", "Flujo vaginal",
+    "Control prenatal", "Irregularidad menstrual", "Lectura de resultados", "Mastalgia",
+]
+_DIAGNOSTICOS = ["Sana", "Vaginosis bacteriana", "Cervicitis", "Mioma uterino", "Quiste ovárico"]
+_PLANES = ["Control en 1 año", "Tratamiento tópico", "Eco control en 3 meses", "Colposcopia"]
+_RESULTADOS = [
+    "Negativo para lesión intraepitelial o malignidad",
+    "Cambios reactivos asociados a inflamación",
+    "ASC-US",
+    "LSIL (NIC I)",
+    "HSIL (NIC II-III)",
+    "Cervicitis crónica",
+]
+# Los de config/config.yaml; los centros extra dan variedad al filtro por centro
+_FORMAS_PAGO = ["efectivo", "transferencia", "pago movil", "otro"]
+_CITOLOGIAS = ["PAP", "MD", "MI"]
+_BIOPSIAS = ["Cuello uterino", "Asa LEEP", "Endometrio", "Pólipo cervical", "Vaginal", "Cono"]
+_CENTROS = [
+    "Centro Histológico Principal",
+    "Centro Histológico Alterno",
+    "Anatomía Patológica Los Andes",
+    "Laboratorio Histopatológico del Zulia",
+]
+
+# Días entre un estado y el siguiente (mín, máx) y probabilidad de que se quede ahí
+_STEPS: dict[str, tuple[int, int, float]] = {
+    "enviado": (0, 4, 0.03),
+    "pagado": (0, 3, 0.04),
+    "recibido": (7, 30, 0.06),
+    "entregado": (0, 15, 0.05),
+}
+
+
+@dataclass(frozen=True)
+class SynthSpec:
+    patients: int = 10_000
+    visits_per_patient: float = 3.0  # promedio; cada paciente tiene de 1 a 2*promedio-1
+    years: int = 5  # antigüedad máxima de las citas
+    seed: int = 1
+    until: date | None = None  # última fecha de los datos; None = hoy
+    batch: int = 5_000  # pacientes por transacción
+
+
+@dataclass
+class SynthCounts:
+    patients: int = 0
+    visits: int = 0
+    studies: int = 0
+
+
+def _ts(dt: datetime) -> str:
+    return dt.strftime(TS_FORMAT)
+
+
+class _Generator:
+    """Arma las filas de un lote de pacientes; ids explícitos para usar executemany."""
+
+    def __init__(self, spec: SynthSpec, centros: list[int]) -> None:
+        self.spec = spec
+        self.rng = random.Random(spec.seed)
+        self.centros = centros
+        until = spec.until or date.today()
+        self.end = datetime.combine(until, time(23, 59, 59))
+        self.first_day = until - timedelta(days=365 * max(1, spec.years))
+        self.span_days = (until - self.first_day).days
+        # Cédulas únicas sin consultar la DB
+        self.cedulas = self.rng.sample(range(1_000_000, 33_000_000), spec.patients)
+        self.next_cita = 1
+        self.next_estudio = 1
+
+    def batch(self, first: int, n: int) -> tuple[list[tuple], list[tuple], list[tuple]]:
+        pacientes: list[tuple] = []
+        citas: list[tuple] = []
+        estudios: list[tuple] = []
+        max_visits = max(1, round(2 * self.spec.visits_per_patient - 1))
+        for pid in range(first, first + n):
+            fechas = sorted(self._visit_time() for _ in range(self.rng.randint(1, max_visits)))
+            pacientes.append(self._patient(pid, fechas[0]))
+            for fecha in fechas:
+                cita_id = self.next_cita
+                self.next_cita += 1
+                citas.append(self._visit(cita_id, pid, fecha))
+                estudios.extend(self._studies(cita_id, pid, fecha))
+        return pacientes, citas, estudios
+
+    def _visit_time(self) -> datetime:
+        day = self.first_day + timedelta(days=self.rng.randint(0, self.span_days))
+        return datetime.combine(day, time(self.rng.randint(7, 17), self.rng.randrange(0, 60, 5)))
+
+    def _patient(self, pid: int, first_visit: datetime) -> tuple:
+        rng = self.rng
+        nombres = rng.choice(_NOMBRES)
+        if rng.random() < 0.6:
+            nombres += " " + rng.choice(_NOMBRES)
+        apellidos = f"{rng.choice(_APELLIDOS)} {rng.choice(_APELLIDOS)}"
+        born = first_visit.date() - timedelta(days=rng.randint(16 * 365, 75 * 365))
+        ts = _ts(first_visit)
+        return (
+            pid,
+            str(self.cedulas[pid - 1]),
+            nombres,
+            apellidos,
+            f"{rng.choice(_OPERADORAS)}-{rng.randrange(10**7):07d}",
+            born.strftime("%d-%m-%Y"),  # formato que espera la edad en PatientRepo.search
+            f"{rng.choice(_SECTORES)}, {rng.choice(_CIUDADES)}",
+            rng.choice(_COMENTARIOS) if rng.random() < 0.1 else "",
+            ts,
+            ts,
+            fold(apellidos),
+            fold(nombres),
+            fold(f"{apellidos} {nombres}"),
+        )
+
+    def _visit(self, cita_id: int, pid: int, fecha: datetime) -> tuple:
+        rng = self.rng
+        ts = _ts(fecha)
+        return (
+            cita_id,
+            pid,
+            ts,
+            (fecha.date() - timedelta(days=rng.randint(5, 40))).isoformat(),
+            rng.randint(0, 4),
+            rng.randint(0, 2),
+            rng.randint(0, 1),
+            rng.choice(_ANTICONCEPCION),
+            rng.choice(_MOTIVOS),
+            rng.choice(_DIAGNOSTICOS),
+            rng.choice(_PLANES),
+            rng.choice(_FORMAS_PAGO),
+            ts,
+            ts,
+        )
+
+    def _studies(self, cita_id: int, pid: int, fecha: datetime) -> list[tuple]:
+        rng = self.rng
+        ordered: list[tuple[str, str]] = []
+        if rng.random() < 0.6:
+            n = 1 if rng.random() < 0.7 else rng.randint(2, len(_CITOLOGIAS))
+            ordered += [("citologia", s) for s in _CITOLOGIAS[:n]]
+        if rng.random() < 0.08:
+            ordered.append(("biopsia", rng.choice(_BIOPSIAS)))
+        out = []
+        for tipo, subtipo in ordered:
+            estudio_id = self.next_estudio
+            self.next_estudio += 1
+            out.append(self._study(estudio_id, cita_id, pid, tipo, subtipo, fecha))
+        return out
+
+    def _study(
+        self, estudio_id: int, cita_id: int, pid: int, tipo: str, subtipo: str, fecha: datetime
+    ) -> tuple:
+        """Avanza el estudio por los estados mientras no pase de `end` (o se quede trabado)."""
+        rng = self.rng
+        stamps: dict[str, str | None] = dict.fromkeys(STATE_TO_COL, None)
+        stamps["ordenado"] = _ts(fecha)
+        estado = "ordenado"
+        t = fecha
+        for state in STATES_ORDER[1:]:
+            lo, hi, stall = _STEPS[state]
+            if rng.random() < stall:
+                break
+            t += timedelta(days=rng.randint(lo, hi), minutes=rng.randint(30, 600))
+            if t > self.end:
+                break
+            stamps[state] = _ts(t)
+            estado = state
+
+        centro_id = None
+        if estado != "ordenado" or rng.random() < 0.3:
+            centro_id = rng.choice(self.centros)
+        resultado = editado = None
+        if stamps["recibido"] is not None:
+            resultado = rng.choice(_RESULTADOS)
+            editado = stamps["recibido"]
+        return (
+            estudio_id,
+            cita_id,
+            pid,
+            centro_id,
+            tipo,
+            subtipo,
+            estado,
+            *(stamps[st] for st in STATES_ORDER),
+            resultado,
+            editado,
+            stamps["ordenado"],
+            stamps[estado],
+        )
+
+
+_PACIENTES_SQL = """
+    INSERT INTO pacientes
+        (paciente_id, cedula, nombres, apellidos, telefono, fecha_nacimiento, domicilio,
+         comentario, creado_en, actualizado_en,
+         apellidos_norm, nombres_norm, nombre_completo_norm)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+_CITAS_SQL = """
+    INSERT INTO citas
+        (cita_id, paciente_id, fecha_consulta, fum, g_p, g_c, g_a, anticoncepcion,
+         motivo_consulta, diagnostico, plan, forma_pago, creado_en, actualizado_en)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+_ESTUDIOS_SQL = """
+    INSERT INTO estudios
+        (estudio_id, cita_id, paciente_id, centro_id, tipo, subtipo, estado_actual,
+         ordenado_en, enviado_en, pagado_en, recibido_en, entregado_en,
+         resultado, resultado_editado_en, creado_en, actualizado_en)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _ensure_centros(conn: DbHandle) -> list[int]:
+    with unit_of_work(conn):
+        conn.executemany(
+            "INSERT OR IGNORE INTO centros_histologicos (nombre) VALUES (?)",
+            [(n,) for n in _CENTROS],
+        )
+    placeholders = ",".join("?" * len(_CENTROS))
+    rows = conn.execute(
+        f"SELECT centro_id FROM centros_histologicos WHERE nombre IN ({placeholders}) "
+        "ORDER BY centro_id",
+        tuple(_CENTROS),
+    ).fetchall()
+    return [int(r[0]) for r in rows]
+
+
+def generate(
+    conn: DbHandle,
+    spec: SynthSpec,
+    *,
+    progress: Callable[[SynthCounts], None] | None = None,
+) -> SynthCounts:
+    """
+    Llena una DB migrada y SIN pacientes, citas ni estudios con datos sintéticos. Misma `spec`
+    (seed y until) -> mismas filas. Los índices, la FTS y estudios_counters se
+    mantienen con sus triggers, igual que con los repos.
+    """
+    if spec.patients < 1:
+        raise DomainError("Se necesita al menos un paciente.")
+    # Los ids de pacientes, citas y estudios se asignan desde 1: las tres vacías
+    for table in ("pacientes", "citas", "estudios"):
+        if conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is not None:
+            raise DomainError(f"La DB ya tiene {table}: el generador necesita una DB vacía.")
+
+    gen = _Generator(spec, _ensure_centros(conn))
+    counts = SynthCounts()
+    step = max(1, spec.batch)
+    for first in range(1, spec.patients + 1, step):
+        n = min(step, spec.patients + 1 - first)
+        pacientes, citas, estudios = gen.batch(first, n)
+        with unit_of_work(conn):
+            conn.executemany(_PACIENTES_SQL, pacientes)
+            conn.executemany(_CITAS_SQL, citas)
+            conn.executemany(_ESTUDIOS_SQL, estudios)
+        counts.patients += len(pacientes)
+        counts.visits += len(citas)
+        counts.studies += len(estudios)
+        if progress is not None:
+            progress(counts)
+    return counts
+
+
+# ---------------- CLI: python -m consultorio.tools.synth ----------------
+
+
+def main(argv: list[str] | None = None) -> int:
+    from consultorio.db.connection import connect
+    from consultorio.db.schema import migrate
+
+    parser = argparse.ArgumentParser(
+        prog="python -m consultorio.tools.synth",
+        description="Genera una DB con datos sintéticos (para benchmarks, nunca la real).",
+    )
+    parser.add_argument("db", type=Path, help="archivo de la DB a crear (debe estar vacía)")
+    parser.add_argument("--patients", type=int, default=SynthSpec.patients)
+    parser.add_argument("--visits", type=float, default=SynthSpec.visits_per_patient)
+    parser.add_argument("--years", type=int, default=SynthSpec.years)
+    parser.add_argument("--seed", type=int, default=SynthSpec.seed)
+    parser.add_argument("--until", type=date.fromisoformat, help="YYYY-MM-DD (por defecto hoy)")
+    args = parser.parse_args(argv)
+
+    spec = SynthSpec(
+        patients=args.patients,
+        visits_per_patient=args.visits,
+        years=args.years,
+        seed=args.seed,
+        until=args.until,
+    )
+    conn = connect(args.db)
+    try:
+        migrate(conn)
+        counts = generate(
+            conn,
+            spec,
+            progress=lambda c: print(f"\r{c.patients}/{spec.patients} pacientes", end=""),
+        )
+    except DomainError as e:
+        print(e)
+        return 1
+    finally:
+        conn.close()
+    print(f"\n{counts.patients} pacientes, {counts.visits} citas, {counts.studies} estudios")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,16 +1,179 @@
 from __future__ import annotations
 
-from collections.abc import Callable
+import logging
+from collections.abc import Callable, Sequence
 from dataclasses import dataclass, field
+from typing import ClassVar
+
+from consultorio.config import Settings
+
+log = logging.getLogger(__name__)
+
+
+# ---------------- Eventos de cambio ----------------
+# Llevan lo justo para que cada vista decida si le afecta y qué recargar.
+# Un conjunto vacío significa "no se sabe": la vista debe recargar todo.
+
+
+@dataclass(frozen=True)
+class StudiesChanged:
+    topic: ClassVar[str] = "studies"
+    ids: frozenset[int] = frozenset()
+    # "estado", "centro", "resultado"; vacío = altas o cualquier campo
+    fields: frozenset[str] = frozenset()
+    paciente_id: int | None = None
+
+
+@dataclass(frozen=True)
+class VisitCreated:
+    topic: ClassVar[str] = "visits"
+    cita_id: int
+    paciente_id: int
+    fecha_consulta: str  # canónica "YYYY-MM-DD HH:MM:SS"
+
+
+@dataclass(frozen=True)
+class VisitUpdated:
+    """Edición de una cita existente (no cambia su fecha)."""
+
+    topic: ClassVar[str] = "visits"
+    cita_id: int
+    paciente_id: int | None = None
+
+
+@dataclass(frozen=True)
+class PatientUpdated:
+    """Alta, edición o baja de un paciente."""
+
+    topic: ClassVar[str] = "patients"
+    paciente_id: int | None = None
+
+
+@dataclass(frozen=True, eq=False)
+class SettingsChanged:
+    """config.yaml cambió en disco y se volvió a leer."""
+
+    topic: ClassVar[str] = "settings"
+    settings: Settings
+
+
+ChangeEvent = StudiesChanged | VisitCreated | VisitUpdated | PatientUpdated | SettingsChanged
+Subscriber = Callable[[Sequence[ChangeEvent]], None]
+
+# Programa una llamada para "cuando Tk esté libre" (root.after_idle)
+Scheduler = Callable[[Callable[[], None]], object]
+
+
+@dataclass
+class BusStats:
+    published: int = 0  # llamadas a publish()
+    requested: int = 0  # callbacks que se habrían ejecutado sin coalescer
+    delivered: int = 0  # callbacks ejecutados de verdad
+    flushes: int = 0
+
+    @property
+    def coalesced(self) -> int:
+        """Refrescos evitados por agrupar publicaciones."""
+        return self.requested - self.delivered
 
 
 @dataclass
 class EventBus:
-    _subs: dict[str, list[Callable[[], None]]] = field(default_factory=dict)
+    """
+    Bus de eventos de cambio con despacho agrupado:
+    publish() solo anota el evento; en el siguiente ciclo ocioso de Tk (`schedule`,
+    p.ej. root.after_idle) se llama UNA vez a cada suscriptor afectado con todos
+    los eventos pendientes de sus temas (sin repetidos, en orden de publicación).
+    Sin `schedule` los eventos esperan a flush() (tests, scripts).
+    """
 
-    def subscribe(self, topic: str, fn: Callable[[], None]) -> None:
+    schedule: Scheduler | None = None
+    stats: BusStats = field(default_factory=BusStats)
+    _subs: dict[str, list[Subscriber]] = field(default_factory=dict)
+    _pending: list[ChangeEvent] = field(default_factory=list)
+    _scheduled: bool = False
+
+    def subscribe(self, topic: str, fn: Subscriber) -> None:
         self._subs.setdefault(topic, []).append(fn)
 
-    def publish(self, topic: str) -> None:
-        for fn in self._subs.get(topic, []):
-            fn()
+    def publish(self, event: ChangeEvent) -> None:
+        self.stats.published += 1
+        self.stats.requested += len(self._subs.get(event.topic, []))
+        if event not in self._pending:
+            self._pending.append(event)
+        if self.schedule is not None and not self._scheduled:
+            self._scheduled = True
+            self.schedule(self.flush)
+
+    def flush(self) -> None:
+        """Despacha lo pendiente ya (cada callback una sola vez, con su lote de eventos)."""
+        self._scheduled = False
+        events, self._pending = self._pending, []
+        if not events:
+            return
+        self.stats.flushes += 1
+
+        # callback -> sus eventos; dict conserva el orden de primera aparición
+        batches: dict[Subscriber, list[ChangeEvent]] = {}
+        for event in events:
+            for fn in self._subs.get(event.topic, []):
+                batches.setdefault(fn, []).append(event)
+
+        for fn, batch in batches.items():
+            self.stats.delivered += 1
+            try:
+                fn(batch)
+            except Exception:
+                # Un refresh fallido no impide los demás
+                log.exception("Falló el suscriptor %r con %r", fn, batch)
+
+
+@dataclass
+class LazyRefresh:
+    """
+    Refresco perezoso de una pestaña:
+    - request(): hubo cambios; si la pestaña se ve, refresca ya; si no, queda pendiente
+    - defer(): para actualizaciones puntuales: True (y queda pendiente) si no se ve
+    - shown(): al hacerse visible, refresca solo si quedó algo pendiente
+    Cambiar de pestaña sin cambios de por medio no toca la DB.
+    """
+
+    refresh: Callable[[], None]
+    is_shown: Callable[[], object]  # p.ej. lambda: tab_selected(widget)
+    stale: bool = False
+
+    def request(self) -> bool:
+        if self.defer():
+            return False
+        self.refresh()
+        return True
+
+    def defer(self) -> bool:
+        if self.is_shown():
+            return False
+        self.stale = True
+        return True
+
+    def shown(self) -> bool:
+        if not self.stale:
+            return False
+        self.stale = False
+        self.refresh()
+        return True
+
+
+def merged_study_changes(events: Sequence[ChangeEvent]) -> StudiesChanged | None:
+    """
+    Une los StudiesChanged de un lote en uno solo (ids y campos).
+    None si alguno no dice qué estudios o campos cambió: hay que recargar todo.
+    """
+    ids: set[int] = set()
+    fields: set[str] = set()
+    for e in events:
+        if not isinstance(e, StudiesChanged):
+            continue
+        if not e.ids or not e.fields:
+            return None
+        ids |= e.ids
+        fields |= e.fields
+    return StudiesChanged(ids=frozenset(ids), fields=frozenset(fields))
@@ -1,48 +1,176 @@
 from __future__ import annotations
 
-import sqlite3
+import logging
+import sys
 import tkinter as tk
 from tkinter import ttk
 
-from consultorio.config import Settings
-from consultorio.ui.events import EventBus
-from consultorio.ui.views.today import TodayView
-from consultorio.ui.views.patients import PatientsView
-from consultorio.ui.views.studies_admin import StudiesAdminView
+from consultorio.config import SettingsProvider
+from consultorio.db.backup_store import BackupStore, RetentionPolicy
+from consultorio.db.connection import ConnectionManager
+from consultorio.db.tracing import SqlTracer
+from consultorio.services.backups import BackupScheduler
+from consultorio.services.queries import QueryExecutor
+from consultorio.services.startup import StartupTimeline
+from consultorio.ui.events import EventBus, SettingsChanged
+from consultorio.ui.widgets.backup_status import BackupStatusBar
+from consultorio.ui.widgets.lazy_tab import LazyTab
 
+log = logging.getLogger(__name__)
 
-def run_main_window(cfg: Settings, conn: sqlite3.Connection) -> None:
+# Cada cuánto se mira el mtime de config.yaml (un stat(), sin parsear)
+_SETTINGS_POLL_MS = 3000
+
+
+def run_main_window(
+    settings: SettingsProvider,
+    conn: ConnectionManager,
+    *,
+    timeline: StartupTimeline | None = None,
+    profile_startup: bool = False,
+    tracer: SqlTracer | None = None,
+) -> None:
+    cfg = settings.get()
+    timeline = timeline or StartupTimeline()
     root = tk.Tk()
     root.title(cfg.app.title)
     root.geometry("1100x700")
 
-    bus = EventBus()
+    # Publicaciones agrupadas: un refresh por vista por ciclo ocioso de Tk
+    bus = EventBus(schedule=root.after_idle)
+
+    # config.yaml editado en caliente: se re-lee solo si cambió y se avisa por el bus
+    settings.on_change = lambda s: bus.publish(SettingsChanged(s))
+
+    def watch_settings() -> None:
+        settings.reload_if_changed()
+        root.after(_SETTINGS_POLL_MS, watch_settings)
+
+    root.after(_SETTINGS_POLL_MS, watch_settings)
+
+    # Consultas de las vistas en hilos aparte (lectores del pool); resultados vía after()
+    queries = QueryExecutor(later=root.after)
+
+    # --- Respaldos en segundo plano (barra inferior) ---
+    status = BackupStatusBar(
+        root,
+        on_backup_now=lambda: scheduler.run_now(),
+        on_cancel=lambda: scheduler.cancel(),
+    )
+    status.pack(side=tk.BOTTOM, fill=tk.X)
+    scheduler = BackupScheduler(
+        cfg.storage.db_path,
+        cfg.storage.backups_dir,
+        interval_minutes=cfg.storage.backup_interval_minutes,
+        on_progress=status.on_progress,
+        on_done=status.on_done,
+        store=BackupStore(cfg.storage.backups_dir / "store"),
+        retention=RetentionPolicy(
+            daily=cfg.storage.keep_daily,
+            weekly=cfg.storage.keep_weekly,
+            monthly=cfg.storage.keep_monthly,
+        ),
+    )
+    scheduler.start()
 
     nb = ttk.Notebook(root)
     nb.pack(fill=tk.BOTH, expand=True)
 
-    today = TodayView(nb, cfg, conn, bus=bus)
-    patients = PatientsView(nb, conn, bus=bus)
-    studies = StudiesAdminView(nb, conn, bus=bus)
+    # Pestañas perezosas: cada vista (con su módulo y tkcalendar) se importa y
+    # construye la primera vez que se muestra; nada de consultas antes de pintar.
+    def make_today(parent: tk.Misc) -> tk.Widget:
+        from consultorio.ui.views.today import TodayView
 
+        return TodayView(parent, cfg, conn, bus=bus, queries=queries)
+
+    def make_patients(parent: tk.Misc) -> tk.Widget:
+        from consultorio.ui.views.patients import PatientsView
+
+        return PatientsView(parent, cfg, conn, bus=bus, queries=queries)
+
+    def make_studies(parent: tk.Misc) -> tk.Widget:
+        from consultorio.ui.views.studies_admin import StudiesAdminView
+
+        return StudiesAdminView(parent, cfg, conn, bus=bus, queries=queries)
+
+    today = LazyTab(nb, make_today)
     nb.add(today, text="Citas de hoy")
-    nb.add(patients, text="Pacientes")
-    nb.add(studies, text="Estudios")
+    nb.add(LazyTab(nb, make_patients), text="Pacientes")
+    nb.add(LazyTab(nb, make_studies), text="Estudios")
+
+    painted = False
 
     def on_tab_changed(_evt: object = None) -> None:
+        if not painted:
+            return  # la pestaña inicial se construye después del primer pintado
         tab_id = nb.select()
         try:
             widget = nb.nametowidget(tab_id)
         except Exception:
             return
-        if hasattr(widget, "refresh"):
+        # Solo refresca si la pestaña quedó marcada mientras estaba oculta
+        if hasattr(widget, "on_shown"):
             try:
-                widget.refresh()
+                widget.on_shown()
             except Exception:
                 # no matamos la UI por un refresh fallido
-                pass
+                log.exception("Falló el refresh de la pestaña %s", tab_id)
 
     nb.bind("<<NotebookTabChanged>>", on_tab_changed)
 
+    def on_close() -> None:
+        queries.shutdown()
+        # Respaldo final: seguimos pintando el progreso hasta que termine. shutdown()
+        # no bloquea; devuelve el respaldo pendiente (el que estaba en curso y luego
+        # el final) y se vuelve a consultar hasta que no quede ninguno.
+        root.protocol("WM_DELETE_WINDOW", lambda: None)
+
+        def wait_final() -> None:
+            if scheduler.shutdown(final_backup=cfg.storage.backup_on_exit) is None:
+                root.destroy()
+            else:
+                root.after(100, wait_final)
+
+        wait_final()
+
+    root.protocol("WM_DELETE_WINDOW", on_close)
+
+    # Diagnóstico oculto: estadísticas de SQL (solo si se arrancó con el tracer)
+    diagnostics: tk.Toplevel | None = None
+
+    def open_diagnostics(_evt: object = None) -> None:
+        nonlocal diagnostics
+        if tracer is None:
+            log.info("Diagnóstico SQL apagado: arrancar con --trace-sql")
+            return
+        if diagnostics is not None and diagnostics.winfo_exists():
+            diagnostics.lift()
+            return
+        from consultorio.ui.windows.diagnostics import DiagnosticsWindow
+
+        diagnostics = DiagnosticsWindow(root, tracer)
+
+    root.bind("<Control-Shift-D>", open_diagnostics)
+
+    def on_first_paint() -> None:
+        nonlocal painted
+        painted = True
+        timeline.mark("first_paint")
+        on_tab_changed()
+        wait_first_data()
+
+    def wait_first_data() -> None:
+        # La vista inicial pide sus datos al executor: listo cuando no queda nada pendiente
+        if queries.pending:
+            root.after(10, wait_first_data)
+            return
+        timeline.mark("first_data")
+        log.info("%s", timeline.report())
+        if profile_startup:
+            print(timeline.report(), file=sys.stderr)
+
     nb.select(today)
+    timeline.mark("window")
+    # after_idle corre después de los redibujados pendientes de Tk (= primer pintado)
+    root.after_idle(on_first_paint)
     root.mainloop()
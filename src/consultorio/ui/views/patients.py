@@ -2,30 +2,71 @@ from __future__ import annotations
 
 import sqlite3
 import tkinter as tk
+from collections.abc import Sequence
 from tkinter import messagebox, ttk
 from datetime import date  # arriba del archivo (imports)
 
+from consultorio.config import Settings
+from consultorio.db.connection import DbHandle
 from consultorio.domain.rules import DomainError
+from consultorio.domain.text import fold
+from consultorio.repos.dossier import PatientDossier, PatientDossierRepo
 from consultorio.repos.patients import PatientRepo, PatientUpsert
-from consultorio.repos.visits import VisitRepo
-from consultorio.ui.events import EventBus
-from consultorio.ui.widgets.common import error, info, warn
+from consultorio.services.cache import LruCache
+from consultorio.services.queries import QueryExecutor
+from consultorio.ui.events import (
+    ChangeEvent,
+    EventBus,
+    LazyRefresh,
+    PatientUpdated,
+    SettingsChanged,
+    StudiesChanged,
+    VisitCreated,
+    VisitUpdated,
+)
+from consultorio.ui.widgets.common import error, info, set_loading, warn
+from consultorio.ui.widgets.lazy_tab import tab_selected
+from consultorio.ui.widgets.tree_sync import reconcile
 from consultorio.ui.windows.new_visit import NewVisitWindow
 
 
 class PatientsView(ttk.Frame):
-    def __init__(self, master: tk.Misc, conn: sqlite3.Connection, *, bus: EventBus):
+    def __init__(
+        self,
+        master: tk.Misc,
+        cfg: Settings,
+        conn: DbHandle,
+        *,
+        bus: EventBus,
+        queries: QueryExecutor,
+    ):
         super().__init__(master)
+        self.cfg = cfg
         self.conn = conn
         self.bus = bus
+        self.queries = queries
         self.repo = PatientRepo(conn)
-        self.visits = VisitRepo(conn)
+        self.dossiers = PatientDossierRepo(conn)
         self.selected_id: int | None = None
 
-        # Auto-refresh sin botón:
-        self.bus.subscribe("patients", self.refresh)
-        self.bus.subscribe("visits", self._refresh_selected_patient_panels)
-        self.bus.subscribe("studies", self._refresh_selected_patient_panels)
+        # Búsqueda mientras se escribe: últimos resultados por texto normalizado
+        self._search_cache: LruCache[str, list[sqlite3.Row]] = LruCache(
+            cfg.app.search_cache_size
+        )
+        self._debounce: str | None = None
+
+        # Fichas (datos + historial + estudios) recientes y de los vecinos en la lista
+        self._dossier_cache: LruCache[int, PatientDossier] = LruCache(16)
+        self._fill_form_for: int | None = None
+        self._dossier_gen = 0  # sube al invalidar: lo leído antes no entra al caché
+
+        # Auto-refresh sin botón (solo lo que toca al paciente seleccionado);
+        # oculta, la pestaña solo se marca y refresca al volver a verse
+        self.lazy = LazyRefresh(self.refresh, lambda: tab_selected(self))
+        self.bus.subscribe("patients", self._on_patients_changed)
+        self.bus.subscribe("settings", self._on_settings_changed)
+        self.bus.subscribe("visits", self._on_visits_changed)
+        self.bus.subscribe("studies", self._on_studies_changed)
 
         self._build()
         self.refresh()
@@ -142,7 +183,10 @@ class PatientsView(ttk.Frame):
         ttk.Label(top_pat, text="Buscar (cédula / apellido / nombre):").pack(side=tk.LEFT)
 
         self.q = tk.StringVar()
-        ttk.Entry(top_pat, textvariable=self.q, width=34).pack(side=tk.LEFT, padx=6)
+        ent_q = ttk.Entry(top_pat, textvariable=self.q, width=34)
+        ent_q.pack(side=tk.LEFT, padx=6)
+        ent_q.bind("<Return>", lambda _e: self.refresh())
+        self.q.trace_add("write", self._on_query_typed)
         ttk.Button(top_pat, text="Buscar", command=self.refresh).pack(side=tk.LEFT, padx=6)
 
         # Botones a la IZQUIERDA
@@ -153,6 +197,9 @@ class PatientsView(ttk.Frame):
 
         ttk.Button(top_pat, text="Nuevo", command=self.new_patient).pack(side=tk.LEFT)
 
+        self.loading = tk.StringVar(value="")
+        ttk.Label(top_pat, textvariable=self.loading).pack(side=tk.LEFT, padx=(12, 0))
+
         # ---- Paned vertical: Pacientes arriba / Historial+Estudios abajo ----
         pan = ttk.PanedWindow(right, orient=tk.VERTICAL)
         pan.pack(fill=tk.BOTH, expand=True)
@@ -231,40 +278,135 @@ class PatientsView(ttk.Frame):
 
     # ---------------- Refresh helpers ----------------
 
-    def _refresh_selected_patient_panels(self) -> None:
-        if self.selected_id is not None:
-            self._load_hist(self.selected_id)
-            self._load_studies(self.selected_id)
+    def _on_visits_changed(self, events: Sequence[ChangeEvent]) -> None:
+        pid = self.selected_id
+        reload = False
+        for e in events:
+            if not isinstance(e, (VisitCreated, VisitUpdated)):
+                continue
+            self._forget_dossier(e.paciente_id)
+            if pid is not None and (
+                e.paciente_id in (None, pid) or self.tree_hist.exists(str(e.cita_id))
+            ):
+                reload = True
+        if pid is None or not reload or self.lazy.defer():
+            return
+        self._load_dossier(pid)
+
+    def _on_studies_changed(self, events: Sequence[ChangeEvent]) -> None:
+        pid = self.selected_id
+        reload = False
+        for e in events:
+            if not isinstance(e, StudiesChanged):
+                continue
+            if e.fields and "resultado" not in e.fields:
+                continue  # estado/centro no están en la ficha (ni en la caché)
+            # La ficha en caché guarda el resultado: se descarta aunque no se esté
+            # mostrando (un toggle en lote lo borra al desmarcar recibido o antes)
+            self._forget_dossier(e.paciente_id)
+            if pid is None or e.paciente_id not in (None, pid):
+                continue  # otro paciente
+            if e.ids and not any(self.tree_studies.exists(str(i)) for i in e.ids):
+                continue  # cambios sobre estudios que no se están mostrando
+            reload = True
+        if pid is None or not reload or self.lazy.defer():
+            return
+        self._load_dossier(pid)
+
+    def _forget_dossier(self, paciente_id: int | None) -> None:
+        self._dossier_gen += 1
+        if paciente_id is None:
+            self._dossier_cache.clear()
+        else:
+            self._dossier_cache.pop(paciente_id)
+
+    def on_shown(self) -> None:
+        self.lazy.shown()
+
+    def _on_patients_changed(self, events: Sequence[ChangeEvent]) -> None:
+        self._search_cache.clear()
+        for e in events:
+            if isinstance(e, PatientUpdated):
+                self._forget_dossier(e.paciente_id)
+        self.lazy.request()
+
+    def _on_settings_changed(self, events: Sequence[ChangeEvent]) -> None:
+        for e in events:
+            if isinstance(e, SettingsChanged):
+                self.cfg = e.settings
+                self._search_cache.maxsize = e.settings.app.search_cache_size
+
+    def _on_query_typed(self, *_args: object) -> None:
+        # Lo ya buscado (p.ej. al borrar) sale al instante; lo demás espera una pausa
+        if self._debounce is not None:
+            self.after_cancel(self._debounce)
+            self._debounce = None
+
+        cached = self._search_cache.get(fold(self.q.get()))
+        if cached is not None:
+            self.queries.cancel("patients.search")
+            self._show_patients(cached)
+            return
+        self._debounce = self.after(self.cfg.app.search_debounce_ms, self._search_typed)
+
+    def _search_typed(self) -> None:
+        self._debounce = None
+        self.refresh()
 
     def refresh(self) -> None:
+        # En segundo plano: una búsqueda nueva reemplaza a la que aún no terminó
+        q = self.q.get()
+        key = fold(q)
+        set_loading(self.tree, self.loading, True)
+        self.queries.submit(
+            "patients.search",
+            lambda: self.repo.search(q),
+            lambda rows: self._search_done(key, rows),
+            self._on_search_error,
+        )
+
+    def _search_done(self, key: str, rows: list[sqlite3.Row]) -> None:
+        self._search_cache.put(key, rows)
+        if key != fold(self.q.get()):
+            return  # respuesta de un texto que ya cambió: se descarta
+        self._show_patients(rows)
+
+    def _on_search_error(self, exc: BaseException) -> None:
+        set_loading(self.tree, self.loading, False)
+        error(str(exc))
+
+    def _show_patients(self, rows: list[sqlite3.Row]) -> None:
+        if not self.winfo_exists():
+            return
+        set_loading(self.tree, self.loading, False)
         prev = self.selected_id  # para intentar mantener selección
 
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-
-        rows = self.repo.search(self.q.get())
-        for r in rows:
-            self.tree.insert(
-                "",
-                "end",
-                iid=str(r["paciente_id"]),
-                values=(
-                    r["nombres"] or "",
-                    r["apellidos"] or "",
-                    (r["comentario"] or ""),
-                    str(r["edad"] or ""),
-                    r["cedula"] or "",
-                    r["telefono"] or "",
-                    (r["creado_en"] or ""),  # yyyy-mm-dd hh:mm
-                ),
-            )
+        reconcile(
+            self.tree,
+            (
+                (
+                    str(r["paciente_id"]),
+                    (
+                        r["nombres"] or "",
+                        r["apellidos"] or "",
+                        (r["comentario"] or ""),
+                        str(r["edad"] or ""),
+                        r["cedula"] or "",
+                        r["telefono"] or "",
+                        (r["creado_en"] or ""),  # yyyy-mm-dd hh:mm
+                    ),
+                    (),
+                )
+                for r in rows
+            ),
+        )
 
-        # restaurar selección si todavía existe
+        # la selección se conserva si la fila sigue; si no, limpiar paneles
         if prev is not None and self.tree.exists(str(prev)):
-            self.tree.selection_set(str(prev))
+            if str(prev) not in self.tree.selection():
+                self.tree.selection_set(str(prev))
             self.tree.see(str(prev))
-            self._load_hist(prev)
-            self._load_studies(prev)
+            self._load_dossier(prev)
         else:
             self._clear_hist()
             self._clear_studies()
@@ -274,50 +416,38 @@ class PatientsView(ttk.Frame):
     def _clear_hist(self) -> None:
         if not hasattr(self, "tree_hist") or not self.tree_hist.winfo_exists():
             return
-        for i in self.tree_hist.get_children():
-            self.tree_hist.delete(i)
-
-    def _load_hist(self, paciente_id: int) -> None:
-        self._clear_hist()
-        rows = self.visits.list_for_patient(paciente_id)
-        for idx, r in enumerate(rows):
-            tag = "even" if idx % 2 == 0 else "odd"
-            self.tree_hist.insert(
-                "",
-                "end",
-                iid=str(r["cita_id"]),   # 👈 clave
-                tags=(tag,),
-                values=(r["fecha_consulta"], (r["motivo_consulta"] or "")[:120], r["forma_pago"]),
-            )
+        reconcile(self.tree_hist, [])
+
+    def _show_hist(self, rows: list[sqlite3.Row]) -> None:
+        reconcile(
+            self.tree_hist,
+            (
+                (
+                    str(r["cita_id"]),  # 👈 clave
+                    (r["fecha_consulta"], (r["motivo_consulta"] or "")[:120], r["forma_pago"]),
+                    ("even" if idx % 2 == 0 else "odd",),
+                )
+                for idx, r in enumerate(rows)
+            ),
+        )
 
     # ---------------- Estudios ----------------
 
     def _clear_studies(self) -> None:
-        for i in self.tree_studies.get_children():
-            self.tree_studies.delete(i)
-
-    def _load_studies(self, paciente_id: int) -> None:
-        self._clear_studies()
-        rows = self.conn.execute(
-            """
-            SELECT c.fecha_consulta AS fecha,
-                   e.tipo, e.subtipo, e.resultado
-            FROM estudios e
-            JOIN citas c ON c.cita_id = e.cita_id
-            WHERE e.paciente_id=?
-            ORDER BY datetime(c.fecha_consulta) DESC, e.estudio_id DESC
-            LIMIT 200
-            """,
-            (paciente_id,),
-        ).fetchall()
-
-        for r in rows:
-            res = (r["resultado"] or "").strip()
-            self.tree_studies.insert(
-                "",
-                "end",
-                values=(r["fecha"], r["tipo"], r["subtipo"], res[:250]),
-            )
+        reconcile(self.tree_studies, [])
+
+    def _show_studies(self, rows: list[sqlite3.Row]) -> None:
+        reconcile(
+            self.tree_studies,
+            (
+                (
+                    str(r["estudio_id"]),
+                    (r["fecha"], r["tipo"], r["subtipo"], (r["resultado"] or "").strip()[:250]),
+                    (),
+                )
+                for r in rows
+            ),
+        )
 
     # ---------------- Form helpers ----------------
 
@@ -396,10 +526,68 @@ class PatientsView(ttk.Frame):
             return
 
         self.selected_id = paciente_id
-        row = self.repo.get(paciente_id)
-        if not row:
+        self._fill_form_for = paciente_id
+
+        # Ya leída (visitada o precargada como vecina): al instante, sin ir a la DB
+        cached = self._dossier_cache.get(paciente_id)
+        if cached is not None:
+            self.queries.cancel("patients.dossier")
+            self._show_dossier(cached)
+        else:
+            self._load_dossier(paciente_id)
+
+    # ---------------- Ficha (datos + historial + estudios) ----------------
+
+    def _load_dossier(self, paciente_id: int) -> None:
+        gen = self._dossier_gen
+        self.queries.submit(
+            "patients.dossier",
+            lambda: self.dossiers.load(paciente_id),
+            lambda d: self._dossier_loaded(paciente_id, d, gen),
+        )
+
+    def _dossier_loaded(self, paciente_id: int, d: PatientDossier | None, gen: int) -> None:
+        if d is not None and gen == self._dossier_gen:
+            self._dossier_cache.put(paciente_id, d)
+        if not self.winfo_exists() or self.selected_id != paciente_id or d is None:
+            return  # llegó tarde (ya se eligió otro paciente) o ya no existe
+        self._show_dossier(d)
+
+    def _show_dossier(self, d: PatientDossier) -> None:
+        if self._fill_form_for == d.paciente_id:
+            # Solo al seleccionar: un refresco no pisa lo que se está editando
+            self._fill_form_for = None
+            self._fill_form(d.patient)
+            self.btn_new_visit.config(state=tk.NORMAL)
+        self._show_hist(d.visits)
+        self._show_studies(d.studies)
+        self._prefetch_neighbours(d.paciente_id)
+
+    def _prefetch_neighbours(self, paciente_id: int) -> None:
+        """Lee de antemano las fichas de arriba/abajo: recorrer con flechas es instantáneo."""
+        iid = str(paciente_id)
+        if not self.tree.exists(iid):
             return
+        ids = [
+            int(n)
+            for n in (self.tree.prev(iid), self.tree.next(iid))
+            if n and int(n) not in self._dossier_cache
+        ]
+        if ids:
+            gen = self._dossier_gen
+            self.queries.submit(
+                "patients.prefetch",
+                lambda: self.dossiers.load_many(ids),
+                lambda dossiers: self._store_prefetched(dossiers, gen),
+            )
+
+    def _store_prefetched(self, dossiers: dict[int, PatientDossier], gen: int) -> None:
+        if gen != self._dossier_gen:
+            return  # hubo cambios mientras se leía
+        for pid, d in dossiers.items():
+            self._dossier_cache.put(pid, d)
 
+    def _fill_form(self, row: sqlite3.Row) -> None:
         self.cedula.set(row["cedula"] or "")
         self.apellidos.set(row["apellidos"] or "")
         self.comentario.set(row["comentario"] or "")
@@ -441,10 +629,6 @@ class PatientsView(ttk.Frame):
         set_text(self.ant_p, row["antecedentes_personales"])
         set_text(self.ant_f, row["antecedentes_familiares"])
 
-        self.btn_new_visit.config(state=tk.NORMAL)
-        self._load_hist(paciente_id)
-        self._load_studies(paciente_id)
-
     def save(self) -> None:
         tel = "" if getattr(self.ent_tel, "_ph_on", False) else (self.telefono.get() or "").strip()
         fnac = "" if getattr(self.ent_fnac, "_ph_on", False) else (self.fnac.get() or "").strip()
@@ -468,8 +652,8 @@ class PatientsView(ttk.Frame):
             else:
                 self.selected_id = self.repo.create(p)
                 info("Paciente creado.")
-            self.refresh()
-            self.bus.publish("patients")
+            # la lista se refresca vía bus (también otras vistas suscritas)
+            self.bus.publish(PatientUpdated(self.selected_id))
         except DomainError as e:
             warn(str(e))
         except sqlite3.IntegrityError:
@@ -482,14 +666,12 @@ class PatientsView(ttk.Frame):
             warn("Selecciona un paciente primero.")
             return
 
-        win = NewVisitWindow(self, self.conn, paciente_id=self.selected_id, bus=self.bus)
+        win = NewVisitWindow(
+            self, self.conn, paciente_id=self.selected_id, cfg=self.cfg, bus=self.bus
+        )
+        # historial y estudios se recargan vía bus si se guardó la cita
         self.wait_window(win)
 
-        if not self.winfo_exists():
-            return
-
-        self.after(0, self._refresh_selected_patient_panels)
-
     def _add_placeholder(self, entry: ttk.Entry, placeholder: str) -> None:
         # Guardar placeholder en el widget (1 vez)
         if not hasattr(entry, "_ph_text"):
@@ -630,11 +812,11 @@ class PatientsView(ttk.Frame):
             return
 
         try:
-            self.repo.delete(self.selected_id)
+            paciente_id = self.selected_id
+            self.repo.delete(paciente_id)
             info("Paciente eliminado.")
             self.new_patient()
-            self.refresh()
-            self.bus.publish("patients")
+            self.bus.publish(PatientUpdated(paciente_id))
         except DomainError as e:
             warn(str(e))
         except Exception as e:
@@ -793,11 +975,8 @@ class PatientsView(ttk.Frame):
             self.conn,
             paciente_id=self.selected_id,   # opcional, por si tu ventana lo usa
             cita_id=cita_id,               # 👈 nuevo
+            cfg=self.cfg,
             bus=self.bus,
         )
-        self.wait_window(win)
-
-        # refrescar panels del paciente seleccionado
-        if self.selected_id is not None:
-            self._load_hist(self.selected_id)
-            self._load_studies(self.selected_id)
\ No newline at end of file
+        # los paneles se refrescan vía bus si se guardó la cita
+        self.wait_window(win)
\ No newline at end of file
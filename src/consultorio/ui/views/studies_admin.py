@@ -2,19 +2,54 @@ from __future__ import annotations
 
 import sqlite3
 import tkinter as tk
+from collections.abc import Sequence
 from tkinter import ttk, messagebox
-from tkcalendar import DateEntry
 
-from consultorio.config import load_config
+from consultorio.config import Settings
+from consultorio.db.connection import DbHandle
+from consultorio.db.uow import commit, unit_of_work
 from consultorio.domain.rules import DomainError
-from consultorio.repos.studies import StudyRepo, STATES_ORDER
-from consultorio.ui.events import EventBus
-from consultorio.ui.widgets.common import error, info, warn
+from consultorio.repos.studies import (
+    STATE_INDEX,
+    STATES_ORDER,
+    StudyCursor,
+    StudyFilter,
+    StudyRepo,
+    ToggleResult,
+    page_cursor,
+)
+from consultorio.services.queries import QueryExecutor
+from consultorio.ui.events import (
+    ChangeEvent,
+    EventBus,
+    LazyRefresh,
+    SettingsChanged,
+    StudiesChanged,
+    merged_study_changes,
+)
+from consultorio.ui.widgets.common import error, info, set_loading, warn
+from consultorio.ui.widgets.lazy_tab import tab_selected
+from consultorio.ui.widgets.tree_sync import TreeRow, append_rows, reconcile, update_rows
 from consultorio.ui.windows.edit_result import EditResultWindow
 
 
+# Filas por página del listado (se piden más al acercarse al final del scroll)
+PAGE_SIZE = 200
+
 STATUS_COLS = ["ordenado", "enviado", "pagado", "recibido", "entregado"]
 
+# Campos de StudiesChanged que se ven en esta tabla ("resultado" no se muestra)
+SHOWN_FIELDS = frozenset({"estado", "centro"})
+
+
+def toggle_changes(result: ToggleResult) -> StudiesChanged | None:
+    """El evento de un toggle en lote; incluye "resultado" si la cascada lo borró."""
+    if not result.outcomes:
+        return None
+    fields = {"estado", "resultado"} if result.cleared_result else {"estado"}
+    return StudiesChanged(ids=frozenset(result.outcomes), fields=frozenset(fields))
+
+
 # Paleta de colores moderna
 COLORS = {
     "primary": "#0d47a1",  # Azul profesional
@@ -42,13 +77,25 @@ class StudiesAdminView(ttk.Frame):
     - Doble click: editar resultado (solo recibido/entregado)
     """
 
-    def __init__(self, master: tk.Misc, conn: sqlite3.Connection, *, bus: EventBus):
+    def __init__(
+        self,
+        master: tk.Misc,
+        cfg: Settings,
+        conn: DbHandle,
+        *,
+        bus: EventBus,
+        queries: QueryExecutor,
+    ):
         super().__init__(master)
+        self.cfg = cfg
         self.conn = conn
         self.bus = bus
-        self.bus.subscribe("studies", self.refresh)
+        self.queries = queries
+        # Los refrescos por eventos no avisan de fechas inválidas: eso es para "Aplicar"
+        self.lazy = LazyRefresh(lambda: self.refresh(quiet=True), lambda: tab_selected(self))
+        self.bus.subscribe("studies", self._on_studies_changed)
+        self.bus.subscribe("settings", self._on_settings_changed)
 
-        self.cfg = load_config()
         self.repo = StudyRepo(conn)
 
         self.center_var = tk.StringVar(value="")
@@ -65,10 +112,21 @@ class StudiesAdminView(ttk.Frame):
         self.filter_centro = tk.StringVar(value="Todos")  # filtro
         self.assign_centro = tk.StringVar(value="")  # asignación
 
+        # Paginación keyset (ver StudyRepo.list_admin_page)
+        self._filter = StudyFilter()
+        self._cursor: StudyCursor | None = None
+        self._has_more = False
+        self._page_pending = False
+        self._total = 0
+        self.loading = tk.StringVar(value="")
+
         self._build()
         self.refresh()
 
     def _build(self) -> None:
+        # tkcalendar (y su import de babel) recién al construir la pestaña
+        from tkcalendar import DateEntry
+
         # Configurar tema moderno con ttk.Style
         style = ttk.Style()
 
@@ -361,11 +419,18 @@ class StudiesAdminView(ttk.Frame):
             style="ModernSubtitle.TLabel",
         ).pack(side=tk.LEFT, padx=(12, 0))
 
+        # "N de M": filas cargadas (se completan al hacer scroll) / total del filtro
+        self.lbl_count = ttk.Label(info_frame, text="", style="ModernSubtitle.TLabel")
+        self.lbl_count.pack(side=tk.RIGHT)
+        ttk.Label(info_frame, textvariable=self.loading, style="ModernSubtitle.TLabel").pack(
+            side=tk.RIGHT, padx=(0, 12)
+        )
+
         # Scrollbars para la tabla
         tree_scroll_frame = ttk.Frame(table_frame, style="Modern.TFrame")
         tree_scroll_frame.pack(fill=tk.BOTH, expand=True)
 
-        vsb = ttk.Scrollbar(tree_scroll_frame, orient=tk.VERTICAL)
+        vsb = self._vsb = ttk.Scrollbar(tree_scroll_frame, orient=tk.VERTICAL)
         hsb = ttk.Scrollbar(tree_scroll_frame, orient=tk.HORIZONTAL)
 
         cols = (
@@ -388,7 +453,7 @@ class StudiesAdminView(ttk.Frame):
             style="Modern.Treeview",
             height=20,
             selectmode="extended",
-            yscrollcommand=vsb.set,
+            yscrollcommand=self._on_yscroll,
             xscrollcommand=hsb.set,
         )
 
@@ -446,17 +511,14 @@ class StudiesAdminView(ttk.Frame):
 
     # ---------------- Data ----------------
 
-    def refresh(self) -> None:
-        # repoblar tabla (auto, sin botón)
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-
+    def _current_filter(self) -> StudyFilter | None:
         centro_id = self._resolve_center_id_by_name(self.filter_centro.get())
-
-        enviado_from = self.de_from.get_date().isoformat() if hasattr(self, "de_from") else None
-        enviado_to = self.de_to.get_date().isoformat() if hasattr(self, "de_to") else None
-
-        rows = self.repo.list_admin_filtered(
+        try:
+            enviado_from = self.de_from.get_date().isoformat() if hasattr(self, "de_from") else None
+            enviado_to = self.de_to.get_date().isoformat() if hasattr(self, "de_to") else None
+        except ValueError:
+            return None  # texto escrito a mano que no es una fecha
+        return StudyFilter(
             q=self.filter_q.get(),
             estado=self.filter_estado.get(),
             tipo=self.filter_tipo.get(),
@@ -464,34 +526,156 @@ class StudiesAdminView(ttk.Frame):
             enviado_from=enviado_from,
             enviado_to=enviado_to,
             include_not_sent=bool(self.filter_include_not_sent.get()),
-            limit=1500,
-        )
-
-        for idx, r in enumerate(rows):
-            tag = "even" if idx % 2 == 0 else "odd"
-            self.tree.insert(
-                "",
-                "end",
-                iid=str(r["estudio_id"]),
-                tags=(tag,),
-                values=(
-                    r["cedula"],
-                    r["paciente"],
-                    r["tipo"],
-                    r["subtipo"],
-                    r["centro_nombre"] or "",
-                    self._mark(r["ordenado_en"]),
-                    self._mark(r["enviado_en"]),
-                    self._mark(r["pagado_en"]),
-                    self._mark(r["recibido_en"]),
-                    self._mark(r["entregado_en"]),
-                ),
-            )
+        )
+
+    def refresh(self, *, quiet: bool = False) -> None:
+        # Reconciliar la tabla (auto, sin botón): tantas filas como ya se habían
+        # cargado (mínimo una página) para no perder scroll ni selección.
+        # Total + filas se leen en segundo plano; un refresh nuevo reemplaza al anterior
+        # (y a una página siguiente en curso: comparten clave).
+        loaded = len(self.tree.get_children())
+        f = self._current_filter()
+        if f is None:
+            if not quiet:
+                warn("Fecha inválida: usa el formato AAAA-MM-DD.")
+            return
+        self._filter = f
+        limit = max(PAGE_SIZE, loaded)
+
+        set_loading(self.tree, self.loading, True)
+        self.queries.submit(
+            "studies.list",
+            lambda: (self.repo.count_admin(f), self.repo.list_admin_page(f, limit=limit)),
+            lambda res: self._show_page(*res, limit=limit),
+            self._on_load_error,
+        )
+
+    def _show_page(self, total: int, rows: list[sqlite3.Row], *, limit: int) -> None:
+        if not self.winfo_exists():
+            return
+        set_loading(self.tree, self.loading, False)
+        self._page_pending = False
+        self._total = total
+        self._has_more = len(rows) == limit
+        self._cursor = page_cursor(rows[-1]) if rows else None
+        reconcile(self.tree, (self._tree_row(idx, r) for idx, r in enumerate(rows)))
+        self.lbl_count.config(text=f"{len(rows)} de {self._total}")
 
         # refrescar lista de centros (por si se agregaron en DB)
         if hasattr(self, "cbo_center"):
             self.cbo_center["values"] = ["Todos", *self._load_center_names()]
 
+    def _on_settings_changed(self, events: Sequence[ChangeEvent]) -> None:
+        for e in events:
+            if isinstance(e, SettingsChanged):
+                self.cfg = e.settings
+                self._refresh_center_values()  # los centros salen del YAML
+
+    def on_shown(self) -> None:
+        self.lazy.shown()
+
+    def _on_studies_changed(self, events: Sequence[ChangeEvent]) -> None:
+        change = merged_study_changes(events)
+        if change is None:
+            self.lazy.request()
+            return
+
+        fields = change.fields & SHOWN_FIELDS
+        if not fields:
+            return
+        if fields & self._filter_fields():
+            # Las filas pueden entrar o salir del filtro (y cambia el total)
+            self.lazy.request()
+            return
+        if self.lazy.defer():
+            return
+
+        # Solo cambian valores: releer y repintar las filas afectadas que se ven
+        ids = [i for i in change.ids if self.tree.exists(str(i))]
+        if ids:
+            self.queries.submit(None, lambda: self.repo.get_admin_many(ids), self._update_rows)
+
+    def _update_rows(self, rows: dict[int, sqlite3.Row]) -> None:
+        if not self.winfo_exists():
+            return
+        update_rows(
+            self.tree,
+            (
+                self._tree_row(self.tree.index(str(i)), r)
+                for i, r in rows.items()
+                if self.tree.exists(str(i))
+            ),
+        )
+
+    def _on_load_error(self, exc: BaseException) -> None:
+        set_loading(self.tree, self.loading, False)
+        self._page_pending = False
+        if isinstance(exc, DomainError):
+            warn(str(exc))
+        else:
+            error(str(exc))
+
+    def _filter_fields(self) -> set[str]:
+        """Campos de los que depende el filtro actual (qué filas entran y cuántas son)."""
+        f = self._filter
+        out: set[str] = set()
+        if f.estado != "Todos" or f.enviado_from or f.enviado_to or not f.include_not_sent:
+            out.add("estado")
+        if f.centro_id is not None:
+            out.add("centro")
+        return out
+
+    def _on_yscroll(self, first: float | str, last: float | str) -> None:
+        self._vsb.set(first, last)
+        # Cerca del final: pedir la página siguiente (una a la vez)
+        if self._has_more and not self._page_pending and float(last) >= 0.9:
+            self._page_pending = True
+            self.after_idle(self._load_next_page)
+
+    def _load_next_page(self) -> None:
+        if not self._has_more or self.queries.busy("studies.list"):
+            self._page_pending = False
+            return
+        f, after = self._filter, self._cursor
+        set_loading(self.tree, self.loading, True)
+        self.queries.submit(
+            "studies.list",
+            lambda: self.repo.list_admin_page(f, after=after, limit=PAGE_SIZE),
+            self._append_page,
+            self._on_load_error,
+        )
+
+    def _append_page(self, rows: list[sqlite3.Row]) -> None:
+        if not self.winfo_exists():
+            return
+        set_loading(self.tree, self.loading, False)
+        self._page_pending = False
+        self._has_more = len(rows) == PAGE_SIZE
+        if rows:
+            self._cursor = page_cursor(rows[-1])
+
+        offset = len(self.tree.get_children())
+        append_rows(self.tree, (self._tree_row(offset + i, r) for i, r in enumerate(rows)))
+        self.lbl_count.config(text=f"{offset + len(rows)} de {self._total}")
+
+    def _tree_row(self, idx: int, r: sqlite3.Row) -> TreeRow:
+        return (
+            str(r["estudio_id"]),
+            (
+                r["cedula"],
+                r["paciente"],
+                r["tipo"],
+                r["subtipo"],
+                r["centro_nombre"] or "",
+                self._mark(r["ordenado_en"]),
+                self._mark(r["enviado_en"]),
+                self._mark(r["pagado_en"]),
+                self._mark(r["recibido_en"]),
+                self._mark(r["entregado_en"]),
+            ),
+            ("even" if idx % 2 == 0 else "odd",),
+        )
+
     def _mark(self, ts: object) -> str:
         return "✔" if ts else "✘"
 
@@ -554,7 +738,7 @@ class StudiesAdminView(ttk.Frame):
             "INSERT INTO centros_histologicos (nombre) VALUES (?)",
             (name,),
         )
-        self.conn.commit()
+        commit(self.conn)
         last = cur.lastrowid
         if last is None:
             raise RuntimeError("No se pudo crear el centro histológico.")
@@ -584,15 +768,15 @@ class StudiesAdminView(ttk.Frame):
             return
 
         try:
-            centro_id = self._get_or_create_center_id(name)
-
             # Confirmar si se va a sobreescribir centro (si alguno ya tiene otro)
-            rows = [self.repo.get_admin(i) for i in ids]
+            row = self.conn.execute(
+                "SELECT centro_id FROM centros_histologicos WHERE nombre=?", (name,)
+            ).fetchone()
+            existing_id = int(row["centro_id"]) if row else None
+            rows = self.repo.get_admin_many(ids)
             diff = any(
-                (r is not None)
-                and (r["centro_id"] is not None)
-                and int(r["centro_id"]) != centro_id
-                for r in rows
+                (r["centro_id"] is not None) and int(r["centro_id"]) != existing_id
+                for r in rows.values()
             )
             if diff:
                 ok = messagebox.askyesno(
@@ -604,13 +788,16 @@ class StudiesAdminView(ttk.Frame):
                 if not ok:
                     return
 
-            self.repo.set_center_many(ids, centro_id)
+            # Centro nuevo + asignación: una sola transacción
+            with unit_of_work(self.conn):
+                centro_id = self._get_or_create_center_id(name)
+                self.repo.set_center_many(ids, centro_id)
 
             # refresca combos (por si agregaste centros nuevos)
             self._refresh_center_values()
 
             info("Centro asignado a los seleccionados.")
-            self.bus.publish("studies")
+            self.bus.publish(StudiesChanged(ids=frozenset(ids), fields=frozenset({"centro"})))
 
             # Mantener selección (cuando refresque por el bus)
             # Nota: si tu refresh borra y recrea filas, esto ayuda.
@@ -668,6 +855,10 @@ class StudiesAdminView(ttk.Frame):
         # Aquí SÍ interceptamos: primero ajustamos selección (sin romperla)
         self._update_selection_for_click(row_id, event)
 
+        # Un cambio de estado a la vez: los clicks mientras se aplica se ignoran
+        if self.queries.busy("studies.toggle"):
+            return "break"
+
         # Targets = selección actual (si está vacía, cae a la fila clickeada)
         sel = list(self.tree.selection())
         if not sel:
@@ -683,25 +874,13 @@ class StudiesAdminView(ttk.Frame):
         if not ids:
             return "break"
 
-        # Pre-chequeo: si alguno ya tiene marcado ese estado, vamos a desmarcar y eso hace cascada
-        will_unmark_any = False
-        for estudio_id in ids:
-            row = self.repo.get_admin(estudio_id)
-            if not row:
-                continue
-            # ejemplo: col_name="enviado" -> "enviado_en"
-            key = f"{col_name}_en"
-            try:
-                is_marked = bool(row[key])
-            except (KeyError, IndexError):
-                is_marked = False
-
-            if is_marked:
-                will_unmark_any = True
-                break
+        # Pre-chequeo con lo que ya muestra la tabla (✔): desmarcar hace cascada
+        will_unmark_any = any(
+            self.tree.exists(str(i)) and self.tree.set(str(i), col_name) == "✔" for i in ids
+        )
 
         if will_unmark_any:
-            idx = STATES_ORDER.index(col_name)
+            idx = STATE_INDEX[col_name]
             will_clear = ", ".join(STATES_ORDER[idx:])
             ok = messagebox.askyesno(
                 "Confirmar corrección",
@@ -713,39 +892,49 @@ class StudiesAdminView(ttk.Frame):
             if not ok:
                 return "break"
 
-        # Aplicar toggle a todos los seleccionados
-        delivered_to_prompt: list[int] = []
-        errors: list[str] = []
+        # Aplicar toggle a todos los seleccionados (una lectura + UPDATEs agrupados)
+        # en segundo plano; las filas de "entregado" se leen en el mismo viaje
+        def apply() -> tuple[ToggleResult, dict[int, sqlite3.Row]]:
+            result = self.repo.toggle_state_many(ids, col_name)
+            return result, self.repo.get_admin_many(result.needs_result)
 
-        for estudio_id in ids:
-            try:
-                self.repo.toggle_state(estudio_id, col_name)
+        set_loading(self.tree, self.loading, True)
+        self.queries.submit(
+            "studies.toggle", apply, lambda res: self._toggled(*res), self._on_toggle_error
+        )
+
+        # IMPORTANTE: cortamos el comportamiento default del Treeview para este click
+        return "break"
 
-                # Si acabamos de MARCAR entregado (no desmarcar), abrir popup si falta resultado
-                if col_name == "entregado":
-                    row = self.repo.get_admin(estudio_id)
-                    if row and row["entregado_en"] and not (row["resultado"] or "").strip():
-                        delivered_to_prompt.append(estudio_id)
+    def _on_toggle_error(self, exc: BaseException) -> None:
+        set_loading(self.tree, self.loading, False)
+        if isinstance(exc, DomainError):
+            warn(str(exc))
+        else:
+            error(str(exc))
+
+    def _toggled(self, result: ToggleResult, delivered_rows: dict[int, sqlite3.Row]) -> None:
+        if not self.winfo_exists():
+            return
+        set_loading(self.tree, self.loading, False)
 
-            except DomainError as e:
-                errors.append(f"#{estudio_id}: {e}")
-            except Exception as e:
-                errors.append(f"#{estudio_id}: {e}")
+        errors = [f"#{i}: {msg}" for i, msg in result.errors.items()]
 
-        # Refrescar UI una sola vez
-        self.bus.publish("studies")
+        # Refrescar UI una sola vez (solo las filas que cambiaron)
+        event = toggle_changes(result)
+        if event is not None:
+            self.bus.publish(event)
 
-        # Abrir popups después del refresh (uno por uno)
-        for estudio_id in delivered_to_prompt:
-            self._maybe_open_result_on_delivered(estudio_id)
+        # Si acabamos de MARCAR entregado, abrir popup si falta resultado (uno por uno)
+        for estudio_id in result.needs_result:
+            row = delivered_rows.get(estudio_id)
+            if row is not None:
+                self._maybe_open_result_on_delivered(estudio_id, row)
 
         # Si hubo errores, los mostramos (sin abortar lo que sí se pudo)
         if errors:
             warn("\n".join(errors[:6]) + ("\n..." if len(errors) > 6 else ""))
 
-        # IMPORTANTE: cortamos el comportamiento default del Treeview para este click
-        return "break"
-
     # ---------------- Double click (resultado) ----------------
 
     def _on_double_click(self, event: tk.Event) -> None:
@@ -771,18 +960,16 @@ class StudiesAdminView(ttk.Frame):
             self.repo,
             estudio_id=estudio_id,
             initial_text=(row["resultado"] or ""),
-            on_saved=lambda: self.bus.publish("studies"),
+            on_saved=lambda: self.bus.publish(
+                StudiesChanged(ids=frozenset({estudio_id}), fields=frozenset({"resultado"}))
+            ),
         )
         self.wait_window(win)
 
-    def _maybe_open_result_on_delivered(self, estudio_id: int) -> None:
+    def _maybe_open_result_on_delivered(self, estudio_id: int, row: sqlite3.Row) -> None:
         """Si el estudio quedó entregado y no tiene resultado, abre el popup.
         Si el médico cierra sin guardar, muestra advertencia.
         """
-        row = self.repo.get_admin(estudio_id)
-        if not row:
-            return
-
         if not row["entregado_en"]:
             return
 
@@ -794,18 +981,14 @@ class StudiesAdminView(ttk.Frame):
             self.repo,
             estudio_id=estudio_id,
             initial_text="",
-            on_saved=lambda: self.bus.publish("studies"),
+            on_saved=lambda: self.bus.publish(
+                StudiesChanged(ids=frozenset({estudio_id}), fields=frozenset({"resultado"}))
+            ),
         )
         self.wait_window(win)
 
-        # Si cerró sin guardar y sigue entregado sin resultado, advertir
-        row2 = self.repo.get_admin(estudio_id)
-        if (
-            row2
-            and row2["entregado_en"]
-            and not (row2["resultado"] or "").strip()
-            and not win.saved
-        ):
+        # Si cerró sin guardar, sigue entregado sin resultado: advertir
+        if not win.saved:
             warn(
                 "El estudio quedó como 'Entregado' pero no se guardó el resultado.\n"
                 "Puedes cargarlo luego con doble click sobre el estudio."
@@ -2,29 +2,59 @@ from __future__ import annotations
 
 import sqlite3
 import tkinter as tk
+from collections.abc import Sequence
 from tkinter import ttk
 from datetime import date, timedelta
 
-from tkcalendar import DateEntry
-
 from consultorio.config import Settings
+from consultorio.db.connection import DbHandle
+from consultorio.domain.rules import DomainError
 from consultorio.repos.visits import VisitRepo
+from consultorio.services.queries import QueryExecutor
 from consultorio.services.reporting import counts_pending_by_status, overdue_studies
-from consultorio.ui.events import EventBus
+from consultorio.db.timestamps import day_range
+from consultorio.ui.events import (
+    ChangeEvent,
+    EventBus,
+    LazyRefresh,
+    PatientUpdated,
+    SettingsChanged,
+    VisitCreated,
+    VisitUpdated,
+)
+from consultorio.ui.widgets.common import error, set_loading, warn
+from consultorio.ui.widgets.lazy_tab import tab_selected
+from consultorio.ui.widgets.tree_sync import reconcile
 
 
 class TodayView(ttk.Frame):
-    def __init__(self, master: tk.Misc, cfg: Settings, conn: sqlite3.Connection, *, bus: EventBus):
+    def __init__(
+        self,
+        master: tk.Misc,
+        cfg: Settings,
+        conn: DbHandle,
+        *,
+        bus: EventBus,
+        queries: QueryExecutor,
+    ):
         super().__init__(master)
         self.cfg = cfg
         self.conn = conn
         self.bus = bus
-        self.bus.subscribe("visits", self.refresh)
-        self.bus.subscribe("studies", self.refresh)
+        self.queries = queries
+        # Los refrescos por eventos no avisan de fechas inválidas: eso es para "Aplicar"
+        self.lazy = LazyRefresh(lambda: self.refresh(quiet=True), lambda: tab_selected(self))
+        # La tabla solo muestra citas (con cédula/nombre): los estudios no le afectan
+        self.bus.subscribe("visits", self._on_change)
+        self.bus.subscribe("patients", self._on_change)
+        self.bus.subscribe("settings", self._on_settings_changed)
         self.repo = VisitRepo(conn)
+        self._patient_ids: set[int] = set()
         self._build()
 
     def _build(self) -> None:
+        from tkcalendar import DateEntry  # pesado: solo al construir la pestaña
+
         today = date.today()
 
         # --- Top: filtro (alineado a la izquierda) ---
@@ -77,6 +107,9 @@ class TodayView(ttk.Frame):
         )
         ttk.Button(top, text="Este trimestre", command=self._set_this_quarter).pack(side=tk.LEFT)
 
+        self.loading = tk.StringVar(value="")
+        ttk.Label(top, textvariable=self.loading).pack(side=tk.LEFT, padx=(12, 0))
+
         # --- Paned vertical: Citas arriba / Panel inferior por definir ---
         pan = ttk.PanedWindow(self, orient=tk.VERTICAL)
         pan.pack(fill=tk.BOTH, expand=True, padx=12, pady=(0, 12))
@@ -133,9 +166,12 @@ class TodayView(ttk.Frame):
 
     # ---------- Range helpers ----------
 
-    def _get_range(self) -> tuple[date, date]:
-        d1 = self.de_from.get_date()
-        d2 = self.de_to.get_date()
+    def _get_range(self) -> tuple[date, date] | None:
+        try:
+            d1 = self.de_from.get_date()
+            d2 = self.de_to.get_date()
+        except ValueError:
+            return None  # texto escrito a mano que no es una fecha
         # tkcalendar devuelve datetime.date
         if d1 > d2:
             d1, d2 = d2, d1
@@ -191,8 +227,38 @@ class TodayView(ttk.Frame):
 
     # ---------- Refresh ----------
 
-    def refresh(self) -> None:
-        d1, d2 = self._get_range()
+    def _on_change(self, events: Sequence[ChangeEvent]) -> None:
+        if any(self._affects(e) for e in events):
+            self.lazy.request()
+
+    def _on_settings_changed(self, events: Sequence[ChangeEvent]) -> None:
+        for e in events:
+            if isinstance(e, SettingsChanged):
+                self.cfg = e.settings
+
+    def on_shown(self) -> None:
+        self.lazy.shown()
+
+    def _affects(self, e: ChangeEvent) -> bool:
+        if isinstance(e, VisitCreated):
+            rng = self._get_range()
+            if rng is None:
+                return False
+            lo, hi = day_range(*(d.isoformat() for d in rng))
+            return lo <= e.fecha_consulta < hi
+        if isinstance(e, VisitUpdated):
+            return self.tree.exists(str(e.cita_id))
+        if isinstance(e, PatientUpdated):
+            return e.paciente_id is None or e.paciente_id in self._patient_ids
+        return True
+
+    def refresh(self, *, quiet: bool = False) -> None:
+        rng = self._get_range()
+        if rng is None:
+            if not quiet:
+                warn("Fecha inválida: usa el formato AAAA-MM-DD.")
+            return
+        d1, d2 = rng
 
         # Opcional: actualizar el título del panel con el rango
         if d1 == d2:
@@ -200,24 +266,43 @@ class TodayView(ttk.Frame):
         else:
             self.mid.config(text=f"Citas ({d1.isoformat()} → {d2.isoformat()})")
 
-        # Limpiar tabla
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-
-        rows = self.repo.list_by_date_range(d1.isoformat(), d2.isoformat())
-
-        # Insertar con zebra striping
-        for idx, r in enumerate(rows):
-            tag = "even" if idx % 2 == 0 else "odd"
-            self.tree.insert(
-                "",
-                "end",
-                tags=(tag,),
-                values=(
-                    r["fecha_consulta"],
-                    r["cedula"],
-                    r["paciente"],
-                    (r["motivo_consulta"] or "")[:100],
-                    r["forma_pago"],
-                ),
-            )
+        start, end = d1.isoformat(), d2.isoformat()
+        set_loading(self.tree, self.loading, True)
+        self.queries.submit(
+            "today.list",
+            lambda: self.repo.list_by_date_range(start, end),
+            self._show_rows,
+            self._on_load_error,
+        )
+
+    def _on_load_error(self, exc: BaseException) -> None:
+        set_loading(self.tree, self.loading, False)
+        if isinstance(exc, DomainError):
+            warn(str(exc))
+        else:
+            error(str(exc))
+
+    def _show_rows(self, rows: list[sqlite3.Row]) -> None:
+        if not self.winfo_exists():
+            return
+        set_loading(self.tree, self.loading, False)
+        self._patient_ids = {int(r["paciente_id"]) for r in rows}
+
+        # Reconciliar (solo cambia lo distinto) con zebra striping
+        reconcile(
+            self.tree,
+            (
+                (
+                    str(r["cita_id"]),
+                    (
+                        r["fecha_consulta"],
+                        r["cedula"],
+                        r["paciente"],
+                        (r["motivo_consulta"] or "")[:100],
+                        r["forma_pago"],
+                    ),
+                    ("even" if idx % 2 == 0 else "odd",),
+                )
+                for idx, r in enumerate(rows)
+            ),
+        )
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import queue
+import tkinter as tk
+from collections.abc import Callable
+from tkinter import ttk
+
+from consultorio.db.backup import BackupJob, BackupProgress
+
+_POLL_MS = 100
+
+
+class BackupStatusBar(ttk.Frame):
+    """
+    Barra inferior con el estado del respaldo.
+    Los callbacks del hilo de respaldo (on_progress/on_done) solo encolan;
+    el hilo de Tk drena la cola con after() y actualiza los widgets.
+    """
+
+    def __init__(
+        self,
+        master: tk.Misc,
+        *,
+        on_backup_now: Callable[[], object],
+        on_cancel: Callable[[], None],
+    ) -> None:
+        super().__init__(master)
+        self._events: queue.SimpleQueue[BackupProgress | BackupJob] = queue.SimpleQueue()
+
+        self.status = tk.StringVar(value="")
+        ttk.Label(self, textvariable=self.status).pack(side=tk.LEFT, padx=(12, 8))
+
+        self.bar = ttk.Progressbar(self, orient=tk.HORIZONTAL, length=160, maximum=1.0)
+
+        self.btn_cancel = ttk.Button(self, text="Cancelar", command=on_cancel)
+        ttk.Button(self, text="Respaldar ahora", command=on_backup_now).pack(
+            side=tk.RIGHT, padx=(0, 12), pady=4
+        )
+
+        self.after(_POLL_MS, self._poll)
+
+    # ---- thread-safe (se llaman desde el hilo del respaldo) ----
+
+    def on_progress(self, p: BackupProgress) -> None:
+        self._events.put(p)
+
+    def on_done(self, job: BackupJob) -> None:
+        self._events.put(job)
+
+    # ---- hilo de Tk ----
+
+    def _poll(self) -> None:
+        if not self.winfo_exists():
+            return
+        last: BackupProgress | None = None
+        while True:
+            try:
+                ev = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(ev, BackupJob):
+                self._show_done(ev)
+                last = None
+            else:
+                last = ev
+        if last is not None:
+            self._show_progress(last)
+        self.after(_POLL_MS, self._poll)
+
+    def _show_progress(self, p: BackupProgress) -> None:
+        if not self.bar.winfo_ismapped():
+            self.bar.pack(side=tk.LEFT, padx=(0, 8))
+            self.btn_cancel.pack(side=tk.LEFT)
+        self.bar["value"] = p.fraction
+        self.status.set(f"Respaldando… {int(p.fraction * 100)}%")
+
+    def _show_done(self, job: BackupJob) -> None:
+        self.bar.pack_forget()
+        self.btn_cancel.pack_forget()
+        if job.ok:
+            self.status.set(f"Último respaldo: {job.dest_path.name}")
+        elif job.cancelled:
+            self.status.set("Respaldo cancelado.")
+        else:
+            self.status.set(f"Error en respaldo: {job.error}")
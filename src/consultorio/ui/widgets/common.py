@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from tkinter import messagebox
+import tkinter as tk
+from tkinter import messagebox, ttk
 
 
 def info(msg: str, title: str = "Info") -> None:
@@ -13,3 +14,11 @@ def warn(msg: str, title: str = "Atención") -> None:
 
 def error(msg: str, title: str = "Error") -> None:
     messagebox.showerror(title, msg)
+
+
+def set_loading(tree: ttk.Treeview, status: tk.StringVar, busy: bool) -> None:
+    """Estado "cargando" liviano: cursor de espera en la tabla + texto en `status`."""
+    if not tree.winfo_exists():
+        return
+    tree.configure(cursor="watch" if busy else "")
+    status.set("Cargando…" if busy else "")
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import tkinter as tk
+from collections.abc import Callable
+from tkinter import ttk
+
+
+class LazyTab(ttk.Frame):
+    """
+    Contenedor de una pestaña del Notebook: la vista (y los módulos que importa)
+    se construye la primera vez que la pestaña se muestra.
+    """
+
+    def __init__(self, master: tk.Misc, factory: Callable[[tk.Misc], tk.Widget]) -> None:
+        super().__init__(master)
+        self._factory = factory
+        self.view: tk.Widget | None = None
+
+    def on_shown(self) -> None:
+        if self.view is None:
+            # La vista hace su primer refresh al crearse
+            self.view = self._factory(self)
+            self.view.pack(fill=tk.BOTH, expand=True)
+        elif hasattr(self.view, "on_shown"):
+            self.view.on_shown()
+
+
+def tab_selected(widget: tk.Misc) -> bool:
+    """
+    ¿La pestaña del Notebook que contiene a `widget` es la seleccionada?
+    A diferencia de winfo_viewable, sigue siendo True con la ventana minimizada:
+    si no, al restaurarla ninguna pestaña refrescaría lo que quedó pendiente.
+    """
+    child: tk.Misc = widget
+    parent = child.master
+    while parent is not None:
+        if isinstance(parent, ttk.Notebook):
+            return str(parent.select()) == str(child)
+        child, parent = parent, parent.master
+    return bool(widget.winfo_viewable())
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import weakref
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass, field
+from tkinter import ttk
+
+# Fila de una tabla: (iid, values, tags). El iid es la clave estable (p.ej. el id en la DB).
+TreeRow = tuple[str, Sequence[object], Sequence[str]]
+
+# (values, tags) ya normalizados a texto
+Shown = tuple[tuple[str, ...], tuple[str, ...]]
+
+# Lo último que se escribió en cada fila, por Treeview: comparar contra esto evita
+# leer de vuelta desde Tcl (que además convierte '0123' en 123).
+_shown: weakref.WeakKeyDictionary[ttk.Treeview, dict[str, Shown]] = weakref.WeakKeyDictionary()
+
+
+def _norm(row: TreeRow) -> tuple[str, tuple[str, ...], tuple[str, ...]]:
+    iid, values, tags = row
+    return str(iid), tuple("" if v is None else str(v) for v in values), tuple(tags)
+
+
+@dataclass
+class TreeDiff:
+    remove: list[str] = field(default_factory=list)
+    insert: list[tuple[int, str]] = field(default_factory=list)  # (posición, iid)
+    update: list[str] = field(default_factory=list)
+    move: list[tuple[int, str]] = field(default_factory=list)  # (posición, iid)
+
+
+def diff_rows(
+    current: Sequence[str],
+    shown: Mapping[str, Shown],
+    rows: Sequence[tuple[str, tuple[str, ...], tuple[str, ...]]],
+) -> TreeDiff:
+    """
+    Qué hay que tocar para que una tabla con hijos `current` (valores `shown`)
+    quede igual a `rows`. Sin Tk: se puede probar por separado.
+    """
+    wanted = [iid for iid, _v, _t in rows]
+    wanted_set = set(wanted)
+    current_set = set(current)
+
+    diff = TreeDiff(remove=[iid for iid in current if iid not in wanted_set])
+
+    # Si las filas que se quedan ya están en el orden pedido, no se mueve nada
+    kept = [iid for iid in current if iid in wanted_set]
+    reorder = kept != [iid for iid in wanted if iid in current_set]
+
+    for pos, (iid, values, tags) in enumerate(rows):
+        if iid not in current_set:
+            diff.insert.append((pos, iid))
+            continue
+        if reorder:
+            diff.move.append((pos, iid))
+        if shown.get(iid) != (values, tags):
+            diff.update.append(iid)
+    return diff
+
+
+def reconcile(tree: ttk.Treeview, rows: Iterable[TreeRow]) -> TreeDiff:
+    """
+    Deja `tree` (nivel raíz) igual a `rows` tocando solo lo que cambió:
+    borra las filas que ya no están, inserta las nuevas, actualiza valores/tags
+    distintos. Como no se vacía la tabla, se conservan selección y scroll.
+    """
+    normalized = [_norm(r) for r in rows]
+    by_iid = {iid: (values, tags) for iid, values, tags in normalized}
+    shown = _shown.setdefault(tree, {})
+    diff = diff_rows(list(tree.get_children()), shown, normalized)
+
+    top = tree.yview()[0]
+    if diff.remove:
+        tree.delete(*diff.remove)
+        for iid in diff.remove:
+            shown.pop(iid, None)
+
+    inserts = {iid for _pos, iid in diff.insert}
+    moves = {iid for _pos, iid in diff.move}
+    # En orden de posición: al llegar a `pos` las anteriores ya están en su lugar
+    for pos, (iid, values, tags) in enumerate(normalized):
+        if iid in inserts:
+            tree.insert("", pos, iid=iid, values=values, tags=tags)
+            shown[iid] = (values, tags)
+        elif iid in moves:
+            tree.move(iid, "", pos)
+    for iid in diff.update:
+        values, tags = by_iid[iid]
+        tree.item(iid, values=values, tags=tags)
+        shown[iid] = (values, tags)
+
+    if diff.remove or diff.insert or diff.move:
+        tree.yview_moveto(top)
+    return diff
+
+
+def append_rows(tree: ttk.Treeview, rows: Iterable[TreeRow]) -> None:
+    """Agrega filas al final (páginas siguientes) sin perder el registro de reconcile()."""
+    shown = _shown.setdefault(tree, {})
+    for row in rows:
+        iid, values, tags = _norm(row)
+        tree.insert("", "end", iid=iid, values=values, tags=tags)
+        shown[iid] = (values, tags)
+
+
+def update_rows(tree: ttk.Treeview, rows: Iterable[TreeRow]) -> int:
+    """Actualiza en su lugar las filas que ya están en la tabla; ignora las demás."""
+    shown = _shown.setdefault(tree, {})
+    n = 0
+    for row in rows:
+        iid, values, tags = _norm(row)
+        if not tree.exists(iid) or shown.get(iid) == (values, tags):
+            continue
+        tree.item(iid, values=values, tags=tags)
+        shown[iid] = (values, tags)
+        n += 1
+    return n
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import time
+import tkinter as tk
+from tkinter import ttk
+
+from consultorio.db.tracing import QueryRecord, QueryStat, SqlTracer
+from consultorio.ui.widgets.tree_sync import TreeRow, reconcile
+
+_REFRESH_MS = 2000
+
+
+def stat_rows(stats: list[QueryStat]) -> list[TreeRow]:
+    # iid = hash de la SQL: el texto puede traer llaves/comillas que Tcl interpreta
+    return [
+        (
+            f"s{hash(s.sql) & 0xFFFFFFFFFFFF:x}",
+            (s.calls, f"{s.total_ms:.1f}", f"{s.mean_ms:.2f}", f"{s.max_ms:.1f}", s.rows, s.sql),
+            (),
+        )
+        for s in stats
+    ]
+
+
+def recent_rows(records: list[QueryRecord], *, slow_ms: float) -> list[TreeRow]:
+    return [
+        (
+            f"r{r.seq}",
+            (
+                time.strftime("%H:%M:%S", time.localtime(r.at)),
+                f"{r.ms:.2f}",
+                r.rows,
+                r.thread,
+                r.sql,
+            ),
+            ("lenta",) if r.ms >= slow_ms else (),
+        )
+        for r in records
+    ]
+
+
+class DiagnosticsWindow(tk.Toplevel):
+    """
+    Ventana oculta (Ctrl+Shift+D) con lo que midió el SqlTracer: totales por
+    sentencia y las últimas consultas. Se actualiza sola mientras está abierta.
+    """
+
+    def __init__(self, master: tk.Misc, tracer: SqlTracer) -> None:
+        super().__init__(master)
+        self.tracer = tracer
+        self.title("Diagnóstico SQL")
+        self.geometry("1000x600")
+        self._build()
+        self._tick()
+
+    def _build(self) -> None:
+        top = ttk.Frame(self)
+        top.pack(fill=tk.X, padx=8, pady=(8, 0))
+        self.summary = tk.StringVar(value="")
+        ttk.Label(top, textvariable=self.summary).pack(side=tk.LEFT)
+        ttk.Button(top, text="Reiniciar", command=self._reset).pack(side=tk.RIGHT)
+        ttk.Button(top, text="Actualizar", command=self.refresh).pack(side=tk.RIGHT, padx=8)
+
+        panes = ttk.PanedWindow(self, orient=tk.VERTICAL)
+        panes.pack(fill=tk.BOTH, expand=True, padx=8, pady=8)
+
+        self.stats_tree = self._table(
+            panes,
+            "Por sentencia (mayor tiempo total primero)",
+            [
+                ("calls", "Llamadas", 70),
+                ("total", "Total ms", 80),
+                ("mean", "Media ms", 80),
+                ("max", "Máx ms", 80),
+                ("rows", "Filas", 70),
+                ("sql", "SQL", 600),
+            ],
+        )
+        self.recent_tree = self._table(
+            panes,
+            f"Últimas {self.tracer.recent} consultas",
+            [
+                ("at", "Hora", 70),
+                ("ms", "ms", 70),
+                ("rows", "Filas", 60),
+                ("thread", "Hilo", 140),
+                ("sql", "SQL", 600),
+            ],
+        )
+        self.recent_tree.tag_configure("lenta", foreground="#b00020")
+
+    def _table(
+        self, panes: ttk.PanedWindow, label: str, cols: list[tuple[str, str, int]]
+    ) -> ttk.Treeview:
+        frm = ttk.LabelFrame(panes, text=label)
+        panes.add(frm, weight=1)
+        tree = ttk.Treeview(frm, columns=[c for c, _t, _w in cols], show="headings")
+        for col, text, width in cols:
+            tree.heading(col, text=text)
+            tree.column(col, width=width, stretch=(col == "sql"))
+        sb = ttk.Scrollbar(frm, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=sb.set)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        sb.pack(side=tk.RIGHT, fill=tk.Y)
+        return tree
+
+    def _tick(self) -> None:
+        if not self.winfo_exists():
+            return
+        self.refresh()
+        self.after(_REFRESH_MS, self._tick)
+
+    def refresh(self) -> None:
+        stats = self.tracer.stats()
+        reconcile(self.stats_tree, stat_rows(stats))
+        reconcile(
+            self.recent_tree,
+            recent_rows(self.tracer.recent_queries(), slow_ms=self.tracer.slow_ms),
+        )
+        calls = sum(s.calls for s in stats)
+        total = sum(s.total_ms for s in stats)
+        self.summary.set(
+            f"{len(stats)} sentencias, {calls} llamadas, {total:.0f} ms en total; "
+            f"lentas: ≥ {self.tracer.slow_ms:.0f} ms"
+        )
+
+    def _reset(self) -> None:
+        self.tracer.reset()
+        reconcile(self.stats_tree, [])
+        reconcile(self.recent_tree, [])
+        self.summary.set("")
@@ -4,24 +4,33 @@ import sqlite3
 import tkinter as tk
 from tkinter import ttk
 
-from consultorio.config import load_config
+from consultorio.config import Settings
+from consultorio.db.timestamps import now_ts
 from consultorio.domain.rules import DomainError, validate_forma_pago
-from consultorio.repos.studies import StudyCreate, StudyRepo
-from consultorio.repos.visits import VisitCreate, VisitCrud
-from consultorio.ui.events import EventBus
+from consultorio.repos.visits import VisitCreate
+from consultorio.services.visits import VisitService
+from consultorio.ui.events import EventBus, StudiesChanged, VisitCreated, VisitUpdated
 from consultorio.ui.widgets.common import error, info, warn
 
 
 class NewVisitWindow(tk.Toplevel):
-    def __init__(self, master, conn, paciente_id: int, *, bus, cita_id: int | None = None):
+    def __init__(
+        self,
+        master,
+        conn,
+        paciente_id: int,
+        *,
+        cfg: Settings,
+        bus,
+        cita_id: int | None = None,
+    ):
         super().__init__(master)
         self.conn = conn
         self.cita_id = cita_id
-        self.studies = StudyRepo(conn)
         self.paciente_id = paciente_id
-        self.cfg = load_config()
+        self.cfg = cfg
         self.bus = bus
-        self.crud = VisitCrud(conn)
+        self.visits = VisitService(conn, self.cfg)
 
         self.title("Nueva cita")
         self.geometry("980x820")
@@ -307,7 +316,7 @@ class NewVisitWindow(tk.Toplevel):
                         diagnostico=?,
                         plan=?,
                         forma_pago=?,
-                        actualizado_en=datetime('now')
+                        actualizado_en=datetime('now','localtime')
                     WHERE cita_id=?
                     """,
                     (
@@ -331,14 +340,16 @@ class NewVisitWindow(tk.Toplevel):
                 )
                 self.conn.commit()
 
-                self.bus.publish("visits")
+                self.bus.publish(VisitUpdated(self.cita_id, self.paciente_id))
                 info(f"Cita actualizada (ID: {self.cita_id}).")
                 self.destroy()
                 return
             # ========= FIN EDITAR =========
 
+            fecha = now_ts()
             v = VisitCreate(
                 paciente_id=self.paciente_id,
+                fecha_consulta=fecha,
                 fum=self.fum.get().strip(),
                 g_p=self._to_int(self.g_p.get()),
                 g_c=self._to_int(self.g_c.get()),
@@ -356,9 +367,7 @@ class NewVisitWindow(tk.Toplevel):
                 plan=self.txt_plan.get("1.0", tk.END).strip(),
                 forma_pago=self.forma_pago.get().strip(),
             )
-            cita_id = self.crud.create(v)
-
-            # Crear registros de estudios (sin centro; estado inicial ordenado)
+            # Estudios (sin centro; estado inicial ordenado)
             selected_citos: list[str] = []
             if self.var_pap.get():
                 selected_citos.append("PAP")
@@ -367,37 +376,18 @@ class NewVisitWindow(tk.Toplevel):
             if self.var_mi.get():
                 selected_citos.append("MI")
 
-            if len(selected_citos) > 3:
-                raise DomainError("Máximo 3 citologías.")
-
-            for sub in selected_citos:
-                self.studies.create(
-                    StudyCreate(
-                        cita_id=cita_id,
-                        paciente_id=self.paciente_id,
-                        tipo="citologia",
-                        subtipo=sub,
-                        centro_id=None,
-                        estado_actual="ordenado",
-                    )
-                )
-
             bio = self.biopsia.get()
-            if bio and bio != "Ninguna":
-                self.studies.create(
-                    StudyCreate(
-                        cita_id=cita_id,
-                        paciente_id=self.paciente_id,
-                        tipo="biopsia",
-                        subtipo=bio,
-                        centro_id=None,
-                        estado_actual="ordenado",
-                    )
-                )
+            selected_bios = [bio] if bio and bio != "Ninguna" else []
+
+            # Cita + estudios en una sola transacción (límites según config)
+            cita_id = self.visits.create_with_studies(
+                v, citologias=selected_citos, biopsias=selected_bios
+            )
 
-            # Publicar UNA sola vez: la cita y (posibles) estudios ya quedaron persistidos
-            self.bus.publish("visits")
-            self.bus.publish("studies")
+            # La cita y (posibles) estudios ya quedaron persistidos; el bus agrupa ambos
+            self.bus.publish(VisitCreated(cita_id, self.paciente_id, fecha))
+            if selected_citos or selected_bios:
+                self.bus.publish(StudiesChanged(paciente_id=self.paciente_id))
 
             info(f"Cita creada (ID: {cita_id}).")
             self.destroy()
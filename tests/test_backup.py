@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from consultorio.db.backup import BackupJob, BackupProgress, backup_filename
+from consultorio.db.backup_store import BackupStore
+from consultorio.db.connection import connect
+from consultorio.db.schema import migrate
+from consultorio.services.backups import BackupScheduler
+
+
+@pytest.fixture
+def db_path(tmp_path: Path) -> Path:
+    path = tmp_path / "data" / "t.db"
+    c = connect(path, wal_mode=True)
+    migrate(c)
+    c.executemany(
+        "INSERT INTO centros_histologicos (nombre, contacto) VALUES (?, ?)",
+        [(f"Centro {i}", "x" * 500) for i in range(2000)],
+    )
+    c.commit()
+    c.close()
+    return path
+
+
+def test_incremental_backup_reports_progress_and_renames(db_path: Path, tmp_path: Path):
+    seen: list[BackupProgress] = []
+    job = BackupJob(
+        db_path, tmp_path / "backups", pages_per_step=8, sleep=0, on_progress=seen.append
+    )
+    job.run()
+
+    assert job.ok
+    assert job.dest_path.exists()
+    assert not list((tmp_path / "backups").glob("*.tmp"))
+    assert len(seen) > 1
+    assert seen[-1].remaining == 0
+
+    with sqlite3.connect(job.dest_path) as c:
+        assert c.execute("SELECT COUNT(*) FROM centros_histologicos").fetchone()[0] == 2000
+
+
+def test_cancelled_backup_leaves_no_files(db_path: Path, tmp_path: Path):
+    job: BackupJob
+
+    def cancel_on_first(_p: BackupProgress) -> None:
+        job.cancel()
+
+    job = BackupJob(
+        db_path, tmp_path / "backups", pages_per_step=4, sleep=0, on_progress=cancel_on_first
+    )
+    job.run()
+
+    assert job.cancelled and not job.ok
+    assert not any((tmp_path / "backups").iterdir())
+
+
+def test_scheduler_runs_in_background_and_final_backup(db_path: Path, tmp_path: Path):
+    sched = BackupScheduler(db_path, tmp_path / "backups", interval_minutes=0)
+    job = sched.run_now()
+    assert job.wait(10) and job.ok
+
+    final = sched.shutdown(final_backup=True)
+    assert final is not None
+    assert final.wait(10) and final.ok
+    assert sched.shutdown(final_backup=True) is None
+
+
+def test_shutdown_does_not_wait_for_running_backup(db_path: Path, tmp_path: Path):
+    release = threading.Event()
+    sched = BackupScheduler(
+        db_path, tmp_path / "backups", on_progress=lambda _p: release.wait(10)
+    )
+    running = sched.run_now()
+
+    # No bloquea: devuelve el respaldo en curso y el final queda para después
+    assert sched.shutdown(final_backup=True) is running
+    assert not running.done
+    release.set()
+    assert running.wait(10) and running.ok
+
+    final = sched.shutdown(final_backup=True)
+    assert final is not None and final is not running
+    assert final.wait(10) and final.ok
+    assert sched.shutdown(final_backup=True) is None
+
+
+def test_scheduler_ingests_into_store(db_path: Path, tmp_path: Path):
+    store = BackupStore(tmp_path / "backups" / "store")
+    sched = BackupScheduler(db_path, tmp_path / "backups", store=store)
+    job = sched.run_now()
+    assert job.wait(10) and job.ok
+
+    assert not job.dest_path.exists()
+    [snap] = store.list_snapshots()
+    assert store.verify(snap.snapshot_id) == "ok"
+
+
+def test_backups_in_the_same_second_get_distinct_names():
+    a = backup_filename(datetime(2026, 3, 1, 10, 0, 0, 1000))
+    b = backup_filename(datetime(2026, 3, 1, 10, 0, 0, 750000))
+    assert a != b
+    assert a == "consultorio-20260301-100000-001000.db"
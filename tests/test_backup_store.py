@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from consultorio.db.backup_store import BackupStore, BackupStoreError, RetentionPolicy
+
+
+@pytest.fixture
+def db_file(tmp_path: Path) -> Path:
+    path = tmp_path / "src.db"
+    c = sqlite3.connect(path)
+    c.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, payload TEXT)")
+    c.executemany(
+        "INSERT INTO t (payload) VALUES (?)", [(f"fila {i} " * 40,) for i in range(3000)]
+    )
+    c.commit()
+    c.close()
+    return path
+
+
+def _chunk_files(store: BackupStore) -> set[str]:
+    return {p.name for p in store.chunks_dir.glob("*/*")}
+
+
+def test_unchanged_pages_are_stored_once(db_file: Path, tmp_path: Path):
+    store = BackupStore(tmp_path / "store", chunk_size=4096)
+    s1 = store.add_snapshot(db_file, created_at=datetime(2026, 1, 1, 10))
+    before = _chunk_files(store)
+
+    c = sqlite3.connect(db_file)
+    c.execute("UPDATE t SET payload='cambiado' WHERE id=1")
+    c.commit()
+    c.close()
+
+    s2 = store.add_snapshot(db_file, created_at=datetime(2026, 1, 2, 10))
+    new = _chunk_files(store) - before
+
+    assert s1.snapshot_id != s2.snapshot_id
+    assert 0 < len(new) <= 3
+    assert len(new) < len(s2.chunks)
+    # comprimido: el almacén ocupa menos que dos copias completas
+    stored = sum(p.stat().st_size for p in store.chunks_dir.glob("*/*"))
+    assert stored < s1.size
+
+
+def test_restore_roundtrip_and_verify(db_file: Path, tmp_path: Path):
+    store = BackupStore(tmp_path / "store")
+    snap = store.add_snapshot(db_file)
+
+    dest = store.restore(snap.snapshot_id, tmp_path / "restored" / "r.db")
+    assert dest.read_bytes() == db_file.read_bytes()
+    assert store.verify(snap.snapshot_id) == "ok"
+
+
+def test_missing_chunk_fails_restore(db_file: Path, tmp_path: Path):
+    store = BackupStore(tmp_path / "store")
+    snap = store.add_snapshot(db_file)
+    next(store.chunks_dir.glob("*/*")).unlink()
+
+    with pytest.raises(BackupStoreError):
+        store.restore(snap.snapshot_id, tmp_path / "r.db")
+    assert not (tmp_path / "r.db").exists()
+
+
+def test_gfs_retention_keeps_daily_weekly_monthly(db_file: Path, tmp_path: Path):
+    store = BackupStore(tmp_path / "store")
+    start = datetime(2026, 1, 1, 9)
+    for i in range(90):
+        store.add_snapshot(db_file, created_at=start + timedelta(days=i))
+
+    removed = store.apply_retention(RetentionPolicy(daily=7, weekly=4, monthly=3))
+    kept = store.list_snapshots()
+
+    assert removed
+    days = {s.created_at.date() for s in kept}
+    last = start + timedelta(days=89)
+    assert {(last - timedelta(days=i)).date() for i in range(7)} <= days
+    assert len({s.created_at.isocalendar()[:2] for s in kept}) >= 4
+    months = {(s.created_at.year, s.created_at.month) for s in kept}
+    assert months == {(2026, 1), (2026, 2), (2026, 3)}
+    # Los bloques siguen completos para lo que quedó
+    assert store.verify(kept[0].snapshot_id) == "ok"
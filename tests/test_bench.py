@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from consultorio.db.connection import connect
+from consultorio.db.schema import migrate
+from consultorio.tools.bench import (
+    BenchCase,
+    BenchResult,
+    compare,
+    db_meta,
+    percentile,
+    repo_cases,
+    run_case,
+    run_suite,
+    to_baseline,
+)
+from consultorio.tools.synth import SynthSpec, generate
+
+
+@pytest.fixture
+def conn(tmp_path: Path):
+    c = connect(tmp_path / "t.db", wal_mode=False)
+    migrate(c)
+    yield c
+    c.close()
+
+
+def test_percentile_interpolates():
+    xs = [4.0, 1.0, 3.0, 2.0, 5.0]
+    assert percentile(xs, 50) == 3.0
+    assert percentile(xs, 0) == 1.0
+    assert percentile(xs, 100) == 5.0
+    assert percentile(xs, 95) == pytest.approx(4.8)
+    assert percentile([7.0], 95) == 7.0
+
+
+def test_run_case_counts_rows():
+    r = run_case(BenchCase("x", lambda: [1, 2, 3]), repeat=5, warmup=0)
+    assert (r.name, r.runs, r.rows) == ("x", 5, 3)
+    assert 0 <= r.p50_ms <= r.p95_ms
+    assert r.rows_per_s > 0
+
+
+def test_compare_flags_only_real_regressions():
+    def result(name: str, p50: float) -> BenchResult:
+        return BenchResult(name, 10, p50, p50, 1, 1.0)
+
+    baseline = to_baseline(
+        [result("lento", 10.0), result("ruido", 0.01), result("igual", 10.0)], {}
+    )
+    current = [
+        result("lento", 20.0),
+        result("ruido", 0.05),
+        result("igual", 11.0),
+        result("nuevo", 1.0),
+    ]
+    regressions = compare(current, json.loads(json.dumps(baseline)), tolerance=0.25)
+    assert [(r.name, r.ratio) for r in regressions] == [("lento", 2.0)]
+
+
+def test_repo_cases_run_on_generated_data(conn: sqlite3.Connection):
+    generate(conn, SynthSpec(patients=40, seed=3, until=date(2026, 3, 1)))
+    before = conn.execute("SELECT * FROM estudios ORDER BY estudio_id").fetchall()
+
+    results = run_suite(repo_cases(conn, seed=3), repeat=2, warmup=0)
+
+    names = {r.name for r in results}
+    assert "PatientRepo.search[apellido]" in names
+    assert "StudyRepo.toggle_state[marcar+desmarcar]" in names
+    assert all(r.runs == 2 for r in results)
+    # toggle marca y desmarca en una transacción que se deshace: nada cambia
+    after = conn.execute("SELECT * FROM estudios ORDER BY estudio_id").fetchall()
+    assert [tuple(r) for r in after] == [tuple(r) for r in before]
+
+    doc = to_baseline(results, db_meta(conn))
+    assert doc["meta"]["pacientes"] == 40
+    assert set(doc["results"]) == names
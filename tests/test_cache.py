@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from consultorio.services.cache import LruCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache: LruCache[str, list[int]] = LruCache(2)
+    cache.put("per", [1, 2])
+    cache.put("pere", [1])
+    assert cache.get("per") == [1, 2]  # ahora "pere" es el menos usado
+
+    cache.put("perez", [1])
+
+    assert "pere" not in cache
+    assert cache.get("per") == [1, 2]
+    assert cache.get("perez") == [1]
+    assert (cache.hits, cache.misses) == (3, 0)
+
+
+def test_miss_and_clear():
+    cache: LruCache[str, int] = LruCache(4)
+    assert cache.get("x") is None
+    cache.put("x", 1)
+    cache.clear()
+
+    assert len(cache) == 0
+    assert cache.misses == 1
+
+
+def test_zero_size_disables_the_cache():
+    cache: LruCache[str, int] = LruCache(0)
+    cache.put("x", 1)
+    assert cache.get("x") is None
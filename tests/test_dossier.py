@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from consultorio.db.connection import ConnectionManager, connect
+from consultorio.db.schema import migrate
+from consultorio.repos import dossier
+from consultorio.repos.dossier import PatientDossierRepo
+from consultorio.repos.patients import PatientRepo, PatientUpsert
+from consultorio.repos.studies import StudyCreate, StudyRepo
+from consultorio.repos.visits import VisitCreate, VisitCrud
+
+
+@pytest.fixture
+def conn(tmp_path: Path):
+    c = connect(tmp_path / "t.db", wal_mode=False)
+    migrate(c)
+    yield c
+    c.close()
+
+
+def _seed(conn: sqlite3.Connection | ConnectionManager) -> int:
+    pid = PatientRepo(conn).create(PatientUpsert(None, "12345678", "Ana", "Perez", comentario=""))
+    visits = [("2026-01-10 09:00:00", ["PAP", "MD"]), ("2026-02-10 09:00:00", ["MI"])]
+    for fecha, subtipos in visits:
+        cita_id = VisitCrud(conn).create(
+            VisitCreate(paciente_id=pid, fecha_consulta=fecha, forma_pago="efectivo")
+        )
+        StudyRepo(conn).create_many(
+            [StudyCreate(cita_id, pid, "citologia", s, None) for s in subtipos]
+        )
+    return pid
+
+
+def test_load_returns_patient_visits_and_studies_newest_first(conn: sqlite3.Connection):
+    pid = _seed(conn)
+
+    d = PatientDossierRepo(conn).load(pid)
+
+    assert d is not None
+    assert d.paciente_id == pid
+    assert d.patient["cedula"] == "12345678"
+    assert [v["fecha_consulta"][:10] for v in d.visits] == ["2026-02-10", "2026-01-10"]
+    assert [s["subtipo"] for s in d.studies] == ["MI", "MD", "PAP"]
+    assert PatientDossierRepo(conn).load(pid + 1) is None
+
+
+def test_dossier_queries_are_index_ordered(conn: sqlite3.Connection):
+    for sql in (dossier._VISITS_SQL, dossier._STUDIES_SQL):
+        plan = "\n".join(
+            str(r["detail"]) for r in conn.execute(f"EXPLAIN QUERY PLAN {sql}", (1,))
+        )
+        assert "idx_citas_paciente_fecha" in plan
+        assert "TEMP B-TREE" not in plan
+
+
+def test_load_many_reads_neighbours_through_the_manager(tmp_path: Path):
+    db = ConnectionManager(tmp_path / "t.db", wal_mode=True, readers=2)
+    try:
+        migrate(db.writer)
+        pid = _seed(db)
+        other = PatientRepo(db).create(
+            PatientUpsert(None, "87654321", "Eva", "Gomez", comentario="")
+        )
+
+        out = PatientDossierRepo(db).load_many([pid, other, other + 1])
+
+        assert sorted(out) == [pid, other]
+        assert len(out[pid].studies) == 3
+        assert out[other].visits == []
+    finally:
+        db.close()
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Sequence
+
+from consultorio.ui.events import (
+    ChangeEvent,
+    EventBus,
+    LazyRefresh,
+    PatientUpdated,
+    StudiesChanged,
+    VisitCreated,
+    merged_study_changes,
+)
+
+
+def test_topics_published_together_refresh_each_subscriber_once():
+    batches: list[list[ChangeEvent]] = []
+    calls: list[str] = []
+    bus = EventBus()
+
+    def today(events: Sequence[ChangeEvent]) -> None:
+        batches.append(list(events))
+
+    bus.subscribe("visits", today)
+    bus.subscribe("studies", today)
+    bus.subscribe("studies", lambda _e: calls.append("studies"))
+
+    visit = VisitCreated(1, 7, "2026-03-01 10:00:00")
+    studies = StudiesChanged(paciente_id=7)
+    bus.publish(visit)
+    bus.publish(studies)
+    bus.publish(StudiesChanged(paciente_id=7))  # igual al anterior: se descarta
+    assert batches == []
+
+    bus.flush()
+
+    assert batches == [[visit, studies]]
+    assert calls == ["studies"]
+    assert bus.stats.published == 3
+    assert bus.stats.delivered == 2
+    assert bus.stats.coalesced == 3
+
+
+def test_dispatch_is_scheduled_once_per_idle_cycle():
+    scheduled: list[Callable[[], None]] = []
+    seen: list[ChangeEvent] = []
+    bus = EventBus(schedule=scheduled.append)
+    bus.subscribe("patients", seen.extend)
+
+    bus.publish(PatientUpdated(1))
+    bus.publish(PatientUpdated(2))
+    assert len(scheduled) == 1
+
+    scheduled.pop()()
+    assert seen == [PatientUpdated(1), PatientUpdated(2)]
+
+    bus.publish(PatientUpdated(3))
+    assert len(scheduled) == 1
+
+
+def test_failing_subscriber_does_not_block_others():
+    calls: list[str] = []
+    bus = EventBus()
+
+    def boom(_events: Sequence[ChangeEvent]) -> None:
+        raise RuntimeError("x")
+
+    bus.subscribe("studies", boom)
+    bus.subscribe("studies", lambda _e: calls.append("ok"))
+    bus.publish(StudiesChanged())
+    bus.flush()
+
+    assert calls == ["ok"]
+
+
+def test_merged_study_changes_unions_known_changes():
+    merged = merged_study_changes(
+        [
+            StudiesChanged(ids=frozenset({1, 2}), fields=frozenset({"estado"})),
+            VisitCreated(1, 7, "2026-03-01 10:00:00"),
+            StudiesChanged(ids=frozenset({3}), fields=frozenset({"centro"})),
+        ]
+    )
+    assert merged == StudiesChanged(
+        ids=frozenset({1, 2, 3}), fields=frozenset({"estado", "centro"})
+    )
+
+    # Un cambio sin ids (p.ej. altas desde una cita nueva) obliga a recargar todo
+    assert merged_study_changes([StudiesChanged(paciente_id=7)]) is None
+
+
+def test_hidden_tab_refreshes_once_when_shown():
+    refreshes: list[int] = []
+    visible = False
+    lazy = LazyRefresh(lambda: refreshes.append(1), lambda: visible)
+
+    # Oculta: varios cambios solo la marcan
+    assert lazy.request() is False
+    assert lazy.defer() is True
+    assert refreshes == []
+
+    visible = True
+    assert lazy.shown() is True
+    assert refreshes == [1]
+
+    # Volver a verla sin cambios de por medio no refresca
+    assert lazy.shown() is False
+    assert refreshes == [1]
+
+    # Visible: refresca al momento
+    assert lazy.request() is True
+    assert refreshes == [1, 1]
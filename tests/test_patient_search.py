@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from consultorio.db.connection import connect
+from consultorio.db.schema import fts5_trigram_available, migrate
+from consultorio.repos.patients import PatientRepo, PatientUpsert
+
+pytestmark = pytest.mark.skipif(not fts5_trigram_available(), reason="SQLite sin FTS5/trigram")
+
+
+@pytest.fixture
+def conn(tmp_path: Path):
+    c = connect(tmp_path / "t.db", wal_mode=False)
+    migrate(c)
+    yield c
+    c.close()
+
+
+def _add(repo: PatientRepo, cedula: str, nombres: str, apellidos: str, **kw) -> int:
+    return repo.create(PatientUpsert(None, cedula, nombres, apellidos, comentario="", **kw))
+
+
+def test_surname_prefix_ranks_before_partial_matches(conn: sqlite3.Connection):
+    repo = PatientRepo(conn)
+    _add(repo, "11111111", "Rosa", "Mendez Garcia")
+    _add(repo, "22222222", "Luis", "Garcia")
+    _add(repo, "33333333", "Garcia", "Zamora")
+
+    apellidos = [r["apellidos"] for r in repo.search("Garcia")]
+    assert apellidos[0] == "Garcia"
+    assert set(apellidos[1:]) == {"Mendez Garcia", "Zamora"}
+
+
+def test_exact_cedula_ranks_first(conn: sqlite3.Connection):
+    repo = PatientRepo(conn)
+    _add(repo, "12345678", "Ana", "Perez", telefono="04141234567")
+    _add(repo, "1234567", "Eva", "Rios")
+
+    rows = repo.search("1234567")
+    assert [r["cedula"] for r in rows] == ["1234567", "12345678"]
+
+
+def test_index_follows_updates_and_deletes(conn: sqlite3.Connection):
+    repo = PatientRepo(conn)
+    pid = _add(repo, "12345678", "Ana", "Perez")
+    repo.update(PatientUpsert(pid, "12345678", "Ana", "Quintero", comentario=""))
+
+    assert repo.search("Perez") == []
+    assert [r["paciente_id"] for r in repo.search("Quintero")] == [pid]
+
+    conn.execute("DELETE FROM pacientes WHERE paciente_id=?", (pid,))
+    conn.commit()
+    assert repo.search("Quintero") == []
+
+
+def test_multiple_terms_and_short_query_fallback(conn: sqlite3.Connection):
+    repo = PatientRepo(conn)
+    _add(repo, "12345678", "Ana Maria", "Perez")
+    _add(repo, "87654321", "Ana", "Lopez")
+
+    assert [r["cedula"] for r in repo.search("ana perez")] == ["12345678"]
+    # < 3 caracteres: el trigram no aplica, va por LIKE
+    assert len(repo.search("An")) == 2
+    row = repo.search("Lopez")[0]
+    assert set(row.keys()) >= {"paciente_id", "edad", "cedula", "telefono", "creado_en"}
+
+
+def test_accents_and_case_are_ignored(conn: sqlite3.Connection):
+    repo = PatientRepo(conn)
+    pid = _add(repo, "12345678", "José Ángel", "Núñez Pérez")
+
+    for q in ("nunez", "NÚÑEZ", "perez", "jose angel", "Nu"):
+        assert [r["paciente_id"] for r in repo.search(q)] == [pid], q
+
+
+def test_migration_backfills_normalized_columns(conn: sqlite3.Connection):
+    conn.execute(
+        "INSERT INTO pacientes (cedula, nombres, apellidos) VALUES ('99999999', 'María', 'Muñoz')"
+    )
+    conn.execute("UPDATE pacientes SET apellidos_norm=NULL, nombres_norm=NULL")
+    conn.execute("PRAGMA user_version = 3")
+    conn.commit()
+
+    migrate(conn)
+
+    row = conn.execute(
+        "SELECT apellidos_norm, nombres_norm, nombre_completo_norm FROM pacientes"
+    ).fetchone()
+    assert tuple(row) == ("munoz", "maria", "munoz maria")
+    assert [r["cedula"] for r in PatientRepo(conn).search("munoz")] == ["99999999"]
+
+
+def test_short_prefix_query_uses_indexes(conn: sqlite3.Connection):
+    seen: list[str] = []
+    conn.set_trace_callback(seen.append)
+    PatientRepo(conn).search("pe")
+    conn.set_trace_callback(None)
+    sql = next(s for s in seen if "FROM pacientes" in s and "sqlite_master" not in s)
+    plan = "\n".join(r["detail"] for r in conn.execute(f"EXPLAIN QUERY PLAN {sql}"))
+    assert "idx_pacientes_apellidos_norm" in plan
+    assert "idx_pacientes_nombres_norm" in plan
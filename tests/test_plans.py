@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import sqlite3
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from consultorio.db.connection import connect
+from consultorio.db.schema import migrate
+from consultorio.tools.plans import (
+    SCAN,
+    TEMP_ORDER,
+    QueryShape,
+    analyze,
+    capture_sql,
+    check_all,
+    existing_indexes,
+    explain,
+    format_report,
+)
+from consultorio.tools.synth import SynthSpec, generate
+
+
+@pytest.fixture
+def conn(tmp_path: Path):
+    c = connect(tmp_path / "t.db", wal_mode=False)
+    migrate(c)
+    yield c
+    c.close()
+
+
+def _plan(conn: sqlite3.Connection, sql: str):
+    return analyze(sql, explain(conn, sql), existing_indexes(conn))
+
+
+def test_every_repo_statement_has_an_accepted_plan(conn: sqlite3.Connection):
+    generate(conn, SynthSpec(patients=40, seed=5, until=date(2026, 3, 1)))
+    reports = check_all(conn)
+    bad = [r for r in reports if not r.ok]
+    assert not bad, format_report(bad)
+    shapes = {r.shape for r in reports}
+    assert "PatientRepo.search[texto]" in shapes
+    assert "StudyRepo.list_admin_page[q=perez+enviado+biopsia+centro+solo_enviados]" in shapes
+
+
+def test_capture_rolls_back_writes(conn: sqlite3.Connection):
+    conn.execute("INSERT INTO centros_histologicos(nombre) VALUES ('A')")
+    sql = capture_sql(conn, lambda c: c.execute("DELETE FROM centros_histologicos"))
+    assert sql == ["DELETE FROM centros_histologicos"]
+    assert conn.execute("SELECT COUNT(*) FROM centros_histologicos").fetchone()[0] == 1
+
+
+def test_flags_scan_with_index_suggestion(conn: sqlite3.Connection):
+    [f] = _plan(conn, "SELECT * FROM pacientes WHERE lower(comentario) = 'x'")
+    assert (f.kind, f.table) == (SCAN, "pacientes")
+    [f] = _plan(conn, "SELECT * FROM estudios e WHERE e.resultado = 'x'")
+    assert f.suggestion == "CREATE INDEX idx_estudios_resultado ON estudios(resultado)"
+
+
+def test_flags_temp_sort_and_knows_existing_indexes(conn: sqlite3.Connection):
+    [f] = _plan(conn, "SELECT * FROM citas c WHERE c.paciente_id = 1 ORDER BY c.diagnostico")
+    assert f.kind == TEMP_ORDER
+    assert f.suggestion == (
+        "CREATE INDEX idx_citas_paciente_id_diagnostico ON citas(paciente_id, diagnostico)"
+    )
+    # Un índice que ya existe no se vuelve a sugerir
+    conn.execute("CREATE INDEX idx_prueba ON estudios(resultado)")
+    [f] = _plan(conn, "SELECT * FROM estudios NOT INDEXED WHERE resultado = 'x'")
+    assert f.suggestion and f.suggestion.startswith("ya existe idx_prueba")
+
+
+def test_accept_covers_one_finding_each(conn: sqlite3.Connection):
+    generate(conn, SynthSpec(patients=5, seed=1, until=date(2026, 3, 1)))
+    sql = "SELECT * FROM estudios e WHERE e.resultado = 'x'"
+    shape = QueryShape(
+        "doble",
+        lambda c, s: (c.execute(sql), c.execute(sql + " AND e.resultado_editado_en IS NULL")),
+        accept=((SCAN, "conocido"),),
+    )
+    first, second = check_all(conn, [shape])
+    assert first.ok and [reason for _f, reason in first.accepted] == ["conocido"]
+    assert not second.ok and second.findings[0].kind == SCAN
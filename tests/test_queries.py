@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+
+import pytest
+
+from consultorio.db.connection import ConnectionManager
+from consultorio.db.schema import migrate
+from consultorio.repos.patients import PatientRepo, PatientUpsert
+from consultorio.services.queries import QueryExecutor
+
+
+@pytest.fixture
+def db(tmp_path: Path):
+    m = ConnectionManager(tmp_path / "t.db", wal_mode=True, readers=2)
+    migrate(m.writer)
+    yield m
+    m.close()
+
+
+@pytest.fixture
+def queries():
+    q = QueryExecutor(workers=1)
+    yield q
+    q.shutdown()
+
+
+def test_repo_call_runs_off_thread_and_is_delivered_on_drain(
+    db: ConnectionManager, queries: QueryExecutor
+):
+    repo = PatientRepo(db)
+    pid = repo.create(PatientUpsert(None, "12345678", "Ana", "Perez", comentario=""))
+    seen: list[object] = []
+    threads: list[str] = []
+
+    def search() -> list[int]:
+        threads.append(threading.current_thread().name)
+        return [r["paciente_id"] for r in repo.search("Perez")]
+
+    queries.submit("patients.search", search, seen.append)
+    assert queries.busy("patients.search")
+    assert queries.wait()
+
+    assert seen == [[pid]]
+    assert threads[0] != threading.current_thread().name
+    assert not queries.busy("patients.search")
+
+
+def test_newer_submission_supersedes_older_one(queries: QueryExecutor):
+    started, release = threading.Event(), threading.Event()
+    seen: list[str] = []
+
+    def slow() -> str:
+        started.set()
+        release.wait(5)
+        return "old"
+
+    queries.submit("search", slow, seen.append)
+    started.wait(5)
+    queries.submit("search", lambda: "new", seen.append)
+    queries.submit("search", lambda: "newest", seen.append)
+    release.set()
+    assert queries.wait()
+
+    # la que corría se descarta; la que esperaba en cola no llega a correr
+    assert seen == ["newest"]
+    assert queries.stats.superseded == 2
+
+
+def test_errors_are_routed_to_on_error(queries: QueryExecutor):
+    errors: list[BaseException] = []
+
+    def boom() -> None:
+        raise ValueError("x")
+
+    queries.submit(None, boom, lambda _r: None, errors.append)
+    assert queries.wait()
+
+    assert [type(e) for e in errors] == [ValueError]
+    assert queries.stats.failed == 1
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from consultorio.db.connection import connect
+from consultorio.db.schema import migrate
+from consultorio.repos.patients import PatientRepo, PatientUpsert
+from consultorio.repos.studies import StudyCreate, StudyRepo
+from consultorio.repos.visits import VisitCreate, VisitCrud
+from consultorio.services.reporting import (
+    check_study_counters,
+    counts_by_status_and_type,
+    counts_pending_by_status,
+    rebuild_study_counters,
+)
+
+
+@pytest.fixture
+def conn(tmp_path: Path):
+    c = connect(tmp_path / "t.db", wal_mode=False)
+    migrate(c)
+    yield c
+    c.close()
+
+
+def _studies(conn: sqlite3.Connection, *tipos: str) -> list[int]:
+    pid = PatientRepo(conn).create(PatientUpsert(None, "12345678", "Ana", "Perez", comentario=""))
+    cita_id = VisitCrud(conn).create(VisitCreate(paciente_id=pid, forma_pago="efectivo"))
+    repo = StudyRepo(conn)
+    return [
+        repo.create(
+            StudyCreate(cita_id=cita_id, paciente_id=pid, tipo=t, subtipo="PAP", centro_id=None)
+        )
+        for t in tipos
+    ]
+
+
+def test_triggers_keep_counters_exact(conn: sqlite3.Connection):
+    ids = _studies(conn, "citologia", "citologia", "biopsia")
+    assert counts_pending_by_status(conn) == {"ordenado": 3}
+
+    conn.execute("UPDATE estudios SET estado_actual='entregado' WHERE estudio_id=?", (ids[0],))
+    conn.execute("UPDATE estudios SET tipo='biopsia' WHERE estudio_id=?", (ids[1],))
+    conn.execute("DELETE FROM estudios WHERE estudio_id=?", (ids[2],))
+    conn.commit()
+
+    assert counts_pending_by_status(conn) == {"ordenado": 1}
+    assert counts_by_status_and_type(conn) == {
+        ("entregado", "citologia"): 1,
+        ("ordenado", "biopsia"): 1,
+    }
+    assert check_study_counters(conn) == {}
+
+
+def test_rebuild_repairs_drift(conn: sqlite3.Connection):
+    _studies(conn, "citologia", "biopsia")
+    conn.execute("UPDATE estudios_counters SET n = 42 WHERE tipo='biopsia'")
+    conn.commit()
+    assert check_study_counters(conn) == {("ordenado", "biopsia"): (42, 1)}
+
+    rebuild_study_counters(conn)
+
+    assert check_study_counters(conn) == {}
+    assert counts_pending_by_status(conn) == {"ordenado": 2}
+
+
+def test_migration_counts_existing_rows(conn: sqlite3.Connection):
+    _studies(conn, "citologia", "citologia")
+    conn.execute("DELETE FROM estudios_counters")
+    conn.execute("PRAGMA user_version = 4")
+    conn.commit()
+
+    migrate(conn)
+
+    assert counts_by_status_and_type(conn) == {("ordenado", "citologia"): 2}
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from consultorio.db import schema
+from consultorio.db.connection import connect
+from consultorio.db.schema import latest_version, migrate, schema_version
+from consultorio.repos import patients
+from consultorio.repos.patients import PatientRepo, PatientUpsert
+
+
+@pytest.fixture
+def conn(tmp_path: Path):
+    c = connect(tmp_path / "t.db", wal_mode=False)
+    yield c
+    c.close()
+
+
+def test_fresh_db_gets_latest_version(conn: sqlite3.Connection):
+    assert schema_version(conn) == 0
+    assert migrate(conn) == latest_version()
+    assert schema_version(conn) == latest_version()
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(citas)")}
+    assert {"examen_fisico", "diagnostico", "plan"} <= cols
+
+
+def test_up_to_date_db_skips_all_work(conn: sqlite3.Connection):
+    migrate(conn)
+
+    seen: list[str] = []
+    conn.set_trace_callback(seen.append)
+    try:
+        migrate(conn)
+    finally:
+        conn.set_trace_callback(None)
+
+    assert not any("CREATE" in s or "ALTER" in s or "table_info" in s for s in seen)
+    assert len(seen) <= 3  # foreign_keys + user_version + la FTS en sqlite_master
+
+
+def test_legacy_db_without_version_is_upgraded(conn: sqlite3.Connection):
+    # DB previa al versionado: tablas viejas sin columnas nuevas y user_version=0
+    conn.execute(
+        """CREATE TABLE pacientes (
+            paciente_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cedula TEXT NOT NULL UNIQUE,
+            nombres TEXT NOT NULL,
+            apellidos TEXT NOT NULL,
+            telefono TEXT,
+            fecha_nacimiento TEXT,
+            domicilio TEXT,
+            antecedentes_personales TEXT,
+            antecedentes_familiares TEXT,
+            creado_en TEXT NOT NULL DEFAULT (datetime('now')),
+            actualizado_en TEXT
+        )"""
+    )
+    conn.execute("INSERT INTO pacientes (cedula, nombres, apellidos) VALUES ('123456', 'A', 'B')")
+    conn.commit()
+
+    migrate(conn)
+
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(pacientes)")}
+    assert "comentario" in cols
+    assert conn.execute("SELECT COUNT(*) FROM pacientes").fetchone()[0] == 1
+    assert schema_version(conn) == latest_version()
+
+
+def test_failed_step_rolls_back_everything(conn: sqlite3.Connection, monkeypatch):
+    def boom(c: sqlite3.Connection) -> None:
+        c.execute("CREATE TABLE tmp_x (a INTEGER)")
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(
+        schema, "_MIGRATIONS", [*schema._MIGRATIONS, (latest_version() + 1, "boom", boom)]
+    )
+    with pytest.raises(RuntimeError):
+        migrate(conn)
+
+    assert schema_version(conn) == 0
+    tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    assert "pacientes" not in tables
+    assert "tmp_x" not in tables
+
+
+def test_fts_triggers_follow_the_sqlite_build(conn: sqlite3.Connection, monkeypatch):
+    if not schema.fts5_trigram_available():
+        pytest.skip("SQLite sin FTS5/trigram")
+    migrate(conn)
+
+    def triggers() -> set[str]:
+        rows = conn.execute("SELECT name FROM sqlite_master WHERE type='trigger'").fetchall()
+        return {r[0] for r in rows if r[0].startswith("pacientes_fts")}
+
+    # Misma DB abierta en un SQLite sin FTS5: sin triggers, se escribe y se busca con LIKE
+    monkeypatch.setattr(schema, "fts5_trigram_available", lambda: False)
+    monkeypatch.setattr(patients, "fts5_trigram_available", lambda: False)
+    migrate(conn)
+    assert triggers() == set()
+    repo = PatientRepo(conn)
+    repo.create(PatientUpsert(None, "12345678", "Ana", "Perez", comentario=""))
+    assert [r["cedula"] for r in repo.search("perez")] == ["12345678"]
+
+    # De vuelta en un SQLite con FTS5: triggers de nuevo y el índice incluye lo de antes
+    monkeypatch.undo()
+    migrate(conn)
+    assert triggers() == set(schema._PACIENTES_FTS_TRIGGERS)
+    n = conn.execute("SELECT COUNT(*) FROM pacientes_fts WHERE pacientes_fts MATCH 'perez'")
+    assert n.fetchone()[0] == 1
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from consultorio.config import Settings, SettingsProvider
+
+_YAML = """
+clinic:
+  payment_methods: ["efectivo", "transferencia"]
+  study_statuses: ["ordenado", "enviado"]
+"""
+
+
+def _write(path: Path, text: str, mtime_ns: int) -> None:
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_settings_are_parsed_once_and_reloaded_on_mtime_change(tmp_path: Path):
+    path = tmp_path / "config.yaml"
+    _write(path, _YAML, 1_000_000_000)
+    changes: list[Settings] = []
+    provider = SettingsProvider(path, on_change=changes.append)
+
+    cfg = provider.get()
+    assert provider.get() is cfg
+    assert provider.reload_if_changed() is False
+
+    _write(path, _YAML.replace('"transferencia"', '"pago movil"'), 2_000_000_000)
+    assert provider.reload_if_changed() is True
+
+    assert changes == [provider.get()]
+    assert provider.get().clinic.payment_method_set == frozenset({"efectivo", "pago movil"})
+
+
+def test_broken_yaml_keeps_previous_settings(tmp_path: Path):
+    path = tmp_path / "config.yaml"
+    _write(path, _YAML, 1_000_000_000)
+    provider = SettingsProvider(path)
+    cfg = provider.get()
+
+    _write(path, "clinic: [", 2_000_000_000)
+
+    assert provider.reload_if_changed() is False
+    assert provider.get() is cfg
+
+
+def test_relative_path_is_resolved_once(tmp_path: Path, monkeypatch):
+    (tmp_path / "config").mkdir()
+    _write(tmp_path / "config" / "config.yaml", _YAML, 1_000_000_000)
+    monkeypatch.chdir(tmp_path)
+    provider = SettingsProvider("config/config.yaml")
+
+    monkeypatch.chdir(tmp_path / "config")
+
+    assert provider.get().clinic.study_statuses == ["ordenado", "enviado"]
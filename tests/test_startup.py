@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from consultorio.services.startup import StartupTimeline
+
+
+def test_marks_are_recorded_once_in_order():
+    tl = StartupTimeline(t0=0.0)
+    tl.marks["config"] = 5.0
+    tl.mark("config")  # ya estaba: no se pisa
+    tl.marks["first_paint"] = 120.0
+    tl.marks["migrate"] = 40.0
+
+    assert tl.marks["config"] == 5.0
+    report = tl.report(budget_ms=800)
+    names = [line.split()[-1] for line in report.splitlines()[1:4]]
+    assert names == ["config", "migrate", "first_paint"]
+    assert "presupuesto 800 ms -> ok" in report
+
+
+def test_over_budget_only_looks_at_first_paint():
+    tl = StartupTimeline(marks={"first_data": 5000.0})
+    assert not tl.over_budget(800)
+    assert "presupuesto" not in tl.report()
+
+    tl.marks["first_paint"] = 900.0
+    assert tl.over_budget(800)
+    assert "EXCEDIDO" in tl.report(800)
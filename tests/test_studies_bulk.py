@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from consultorio.db.connection import ConnectionManager, connect
+from consultorio.db.schema import migrate
+from consultorio.repos.patients import PatientRepo, PatientUpsert
+from consultorio.repos.studies import StudyCreate, StudyRepo
+from consultorio.repos.visits import VisitCreate, VisitCrud
+from consultorio.ui.views.studies_admin import toggle_changes
+
+
+@pytest.fixture
+def conn(tmp_path: Path):
+    c = connect(tmp_path / "t.db", wal_mode=False)
+    migrate(c)
+    yield c
+    c.close()
+
+
+def _studies(conn: sqlite3.Connection, n: int) -> list[int]:
+    pid = PatientRepo(conn).create(PatientUpsert(None, "12345678", "Ana", "Perez", comentario=""))
+    cita_id = VisitCrud(conn).create(VisitCreate(paciente_id=pid, forma_pago="efectivo"))
+    repo = StudyRepo(conn)
+    study = StudyCreate(
+        cita_id=cita_id, paciente_id=pid, tipo="citologia", subtipo="PAP", centro_id=None
+    )
+    repo.create_many([study] * n)
+    return [int(r[0]) for r in conn.execute("SELECT estudio_id FROM estudios ORDER BY estudio_id")]
+
+
+def _center(conn: sqlite3.Connection) -> int:
+    cur = conn.execute("INSERT INTO centros_histologicos (nombre) VALUES ('Centro')")
+    conn.commit()
+    return int(cur.lastrowid)
+
+
+def test_toggle_many_matches_single_toggle_rules(conn: sqlite3.Connection):
+    ids = _studies(conn, 4)
+    repo = StudyRepo(conn)
+    repo.set_center_many(ids[:3], _center(conn))
+    repo.toggle_state(ids[2], "enviado")
+
+    result = repo.toggle_state_many([*ids, 999], "enviado")
+
+    assert result.outcomes[ids[0]] == ("enviado", ["enviado"])
+    assert result.outcomes[ids[1]] == ("enviado", ["enviado"])
+    # ya enviado -> se desmarca con cascada
+    assert result.outcomes[ids[2]] == ("ordenado", ["enviado", "pagado", "recibido", "entregado"])
+    assert "centro" in result.errors[ids[3]]
+    assert result.errors[999] == "Estudio no encontrado."
+
+    estados = dict(conn.execute("SELECT estudio_id, estado_actual FROM estudios").fetchall())
+    assert [estados[i] for i in ids] == ["enviado", "enviado", "ordenado", "ordenado"]
+
+
+def test_toggle_many_groups_updates_in_one_commit(conn: sqlite3.Connection):
+    ids = _studies(conn, 300)
+    repo = StudyRepo(conn)
+    repo.set_center_many(ids, _center(conn))
+
+    seen: list[str] = []
+    conn.set_trace_callback(seen.append)
+    result = repo.toggle_state_many(ids, "enviado")
+    conn.set_trace_callback(None)
+
+    assert len(result.outcomes) == 300 and not result.errors
+    # (el trace repite la sentencia por cada disparo de trigger: se cuentan distintas)
+    assert len({s for s in seen if s.lstrip().startswith("UPDATE estudios SET")}) == 1
+    assert sum(s.lstrip().startswith("SELECT") for s in seen) == 1
+    assert seen.count("COMMIT") == 1
+
+
+def test_delivered_without_result_is_reported(conn: sqlite3.Connection):
+    ids = _studies(conn, 2)
+    repo = StudyRepo(conn)
+    repo.set_center_many(ids, _center(conn))
+    for state in ("enviado", "pagado", "recibido"):
+        repo.toggle_state_many(ids, state)
+    repo.set_result(ids[0], "Negativo")
+
+    result = repo.toggle_state_many(ids, "entregado")
+
+    assert result.needs_result == [ids[1]]
+
+
+def test_get_admin_many_chunks_large_selections(conn: sqlite3.Connection):
+    ids = _studies(conn, 1200)
+    repo = StudyRepo(conn)
+
+    seen: list[str] = []
+    conn.set_trace_callback(seen.append)
+    rows = repo.get_admin_many([*ids, 999_999])
+    conn.set_trace_callback(None)
+
+    assert sorted(rows) == ids
+    assert rows[ids[0]]["paciente"] == "Perez, Ana"
+    assert dict(rows[ids[5]]) == dict(repo.get_admin(ids[5]))
+    assert len([s for s in seen if s.lstrip().startswith("SELECT")]) == 3
+
+
+def test_unmarking_recibido_reports_cleared_result(conn: sqlite3.Connection):
+    ids = _studies(conn, 2)
+    repo = StudyRepo(conn)
+    repo.set_center_many(ids, _center(conn))
+    for state in ("enviado", "pagado", "recibido"):
+        repo.toggle_state_many(ids, state)
+    repo.set_result(ids[0], "Negativo")
+
+    result = repo.toggle_state_many(ids, "recibido")
+
+    assert result.cleared_result == [ids[0]]
+    event = toggle_changes(result)
+    assert event is not None
+    assert event.ids == frozenset(ids)
+    assert event.fields == frozenset({"estado", "resultado"})
+    # sin resultado que borrar, el evento es solo de estado
+    assert toggle_changes(repo.toggle_state_many(ids, "pagado")).fields == {"estado"}
+
+
+def test_toggle_many_reads_states_inside_its_write_transaction(tmp_path: Path):
+    db = ConnectionManager(tmp_path / "m.db", wal_mode=True, readers=1)
+    try:
+        migrate(db.writer)
+        ids = _studies(db.writer, 2)
+        StudyRepo(db).set_center_many(ids, _center(db.writer))
+
+        seen: list[str] = []
+        db.writer.set_trace_callback(seen.append)
+        StudyRepo(db).toggle_state_many(ids, "enviado")
+        db.writer.set_trace_callback(None)
+
+        # La lectura de estados va al escritor, entre BEGIN y COMMIT
+        begin, end = seen.index("BEGIN"), seen.index("COMMIT")
+        assert any(s.lstrip().startswith("SELECT") for s in seen[begin:end])
+    finally:
+        db.close()
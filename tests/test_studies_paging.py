@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from consultorio.db.connection import connect
+from consultorio.db.schema import migrate
+from consultorio.repos.patients import PatientRepo, PatientUpsert
+from consultorio.repos.studies import StudyCreate, StudyFilter, StudyRepo, page_cursor
+from consultorio.repos.visits import VisitCreate, VisitCrud
+
+
+@pytest.fixture
+def conn(tmp_path: Path):
+    c = connect(tmp_path / "t.db", wal_mode=False)
+    migrate(c)
+    yield c
+    c.close()
+
+
+def _seed(conn: sqlite3.Connection, n: int) -> None:
+    pid = PatientRepo(conn).create(PatientUpsert(None, "12345678", "Ana", "Perez", comentario=""))
+    cita_id = VisitCrud(conn).create(VisitCreate(paciente_id=pid, forma_pago="efectivo"))
+    StudyRepo(conn).create_many(
+        [
+            StudyCreate(
+                cita_id=cita_id,
+                paciente_id=pid,
+                tipo="biopsia" if i % 3 == 0 else "citologia",
+                subtipo="PAP",
+                centro_id=None,
+            )
+            for i in range(n)
+        ]
+    )
+    # Varios estudios por segundo: el desempate por estudio_id importa
+    conn.execute(
+        "UPDATE estudios SET ordenado_en = printf('2026-01-%02d 08:00:00', 1 + estudio_id / 4)"
+    )
+    conn.commit()
+
+
+def test_pages_cover_everything_once_in_order(conn: sqlite3.Connection):
+    _seed(conn, 103)
+    repo = StudyRepo(conn)
+    f = StudyFilter()
+
+    seen: list[int] = []
+    cursor = None
+    while True:
+        page = repo.list_admin_page(f, after=cursor, limit=10)
+        seen.extend(int(r["estudio_id"]) for r in page)
+        if len(page) < 10:
+            break
+        cursor = page_cursor(page[-1])
+
+    expected = [
+        int(r[0])
+        for r in conn.execute(
+            "SELECT estudio_id FROM estudios ORDER BY ordenado_en DESC, estudio_id DESC"
+        )
+    ]
+    assert seen == expected
+    assert repo.count_admin(f) == 103
+
+
+def test_count_matches_filters(conn: sqlite3.Connection):
+    _seed(conn, 30)
+    repo = StudyRepo(conn)
+    for f in (
+        StudyFilter(tipo="biopsia"),
+        StudyFilter(estado="ordenado", tipo="citologia"),
+        StudyFilter(q="perez", tipo="biopsia"),
+        StudyFilter(enviado_from="2026-01-01", include_not_sent=False),
+    ):
+        assert repo.count_admin(f) == len(repo.list_admin_page(f, limit=1000)), f
+
+
+def test_filtered_page_is_served_by_an_index(conn: sqlite3.Connection):
+    seen: list[str] = []
+    conn.set_trace_callback(seen.append)
+    StudyRepo(conn).list_admin_page(
+        StudyFilter(estado="enviado"), after=("2026-01-01 00:00:00", 10)
+    )
+    conn.set_trace_callback(None)
+
+    plan = "\n".join(r["detail"] for r in conn.execute(f"EXPLAIN QUERY PLAN {seen[-1]}"))
+    assert "idx_estudios_estado_ordenado" in plan
+    assert "TEMP B-TREE" not in plan
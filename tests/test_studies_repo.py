@@ -143,3 +143,18 @@ def test_result_only_allowed_when_recibido_or_entregado(conn: sqlite3.Connection
         "SELECT resultado FROM estudios WHERE estudio_id=?", (estudio_id,)
     ).fetchone()
     assert row["resultado"] == "Negativo"
+
+
+def test_admin_search_ignores_accents(conn: sqlite3.Connection):
+    paciente_id = PatientRepo(conn).create(
+        PatientUpsert(None, "12345678", "Inés", "Núñez", comentario="")
+    )
+    cita_id = VisitCrud(conn).create(VisitCreate(paciente_id=paciente_id, forma_pago="efectivo"))
+    StudyRepo(conn).create(
+        StudyCreate(
+            cita_id=cita_id, paciente_id=paciente_id, tipo="citologia", subtipo="PAP", centro_id=None
+        )
+    )
+
+    rows = StudyRepo(conn).list_admin_filtered(q="nunez ines")
+    assert [r["cedula"] for r in rows] == ["12345678"]
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import sqlite3
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from consultorio.db.connection import connect
+from consultorio.db.schema import migrate
+from consultorio.domain.rules import DomainError
+from consultorio.repos.studies import STATE_TO_COL, STATES_ORDER
+from consultorio.services.reporting import check_study_counters
+from consultorio.tools.synth import SynthSpec, generate
+
+SPEC = SynthSpec(patients=60, seed=7, until=date(2026, 3, 1), batch=25)
+
+
+@pytest.fixture
+def conn(tmp_path: Path):
+    c = connect(tmp_path / "t.db", wal_mode=False)
+    migrate(c)
+    yield c
+    c.close()
+
+
+def _dump(conn: sqlite3.Connection) -> list[tuple]:
+    return [
+        tuple(r)
+        for table in ("pacientes", "citas", "estudios")
+        for r in conn.execute(f"SELECT * FROM {table} ORDER BY rowid").fetchall()
+    ]
+
+
+def test_same_seed_same_rows(conn: sqlite3.Connection, tmp_path: Path):
+    counts = generate(conn, SPEC)
+    other = connect(tmp_path / "otra.db", wal_mode=False)
+    try:
+        migrate(other)
+        assert generate(other, SPEC) == counts
+        assert _dump(other) == _dump(conn)
+    finally:
+        other.close()
+
+    assert counts.patients == 60
+    assert counts.visits >= 60
+    assert counts.studies > 0
+
+
+def test_generated_studies_follow_the_state_rules(conn: sqlite3.Connection):
+    generate(conn, SPEC)
+
+    states = {r[0] for r in conn.execute("SELECT DISTINCT estado_actual FROM estudios")}
+    assert states <= set(STATES_ORDER)
+    assert len(states) > 1
+    for r in conn.execute("SELECT * FROM estudios").fetchall():
+        marked = [st for st in STATES_ORDER if r[STATE_TO_COL[st]]]
+        # Secuencial estricto, estado_actual = último marcado, todo antes de `until`
+        assert marked == STATES_ORDER[: len(marked)]
+        assert r["estado_actual"] == marked[-1]
+        assert max(r[STATE_TO_COL[st]] for st in marked) <= "2026-03-01 23:59:59"
+        if len(marked) > 1:
+            assert r["centro_id"] is not None
+        assert (r["resultado"] is not None) == ("recibido" in marked)
+    assert check_study_counters(conn) == {}
+
+
+def test_refuses_a_database_with_patients(conn: sqlite3.Connection):
+    generate(conn, SynthSpec(patients=1, until=SPEC.until))
+    with pytest.raises(DomainError):
+        generate(conn, SPEC)
+
+
+def test_refuses_a_database_with_visits_or_studies(conn: sqlite3.Connection):
+    generate(conn, SynthSpec(patients=1, until=SPEC.until))
+    conn.execute("PRAGMA foreign_keys=OFF")
+    conn.execute("DELETE FROM pacientes")
+    conn.commit()
+    with pytest.raises(DomainError, match="citas"):
+        generate(conn, SPEC)
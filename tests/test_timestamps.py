@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import sqlite3
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+from consultorio.db import schema
+from consultorio.db.connection import connect
+from consultorio.db.schema import migrate
+from consultorio.db.timestamps import day_range
+from consultorio.domain.rules import DomainError
+from consultorio.repos.patients import PatientRepo, PatientUpsert
+from consultorio.repos.studies import StudyFilter, StudyRepo
+from consultorio.repos.visits import VisitCreate, VisitCrud, VisitRepo
+
+
+@pytest.fixture
+def conn(tmp_path: Path):
+    c = connect(tmp_path / "t.db", wal_mode=False)
+    migrate(c)
+    yield c
+    c.close()
+
+
+def _plan_of(conn: sqlite3.Connection, call: Callable[[], object]) -> str:
+    """Ejecuta `call`, captura su SELECT (ya con parámetros) y devuelve el plan."""
+    seen: list[str] = []
+    conn.set_trace_callback(seen.append)
+    try:
+        call()
+    finally:
+        conn.set_trace_callback(None)
+    sql = next(s for s in seen if s.lstrip().upper().startswith("SELECT"))
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    return "\n".join(str(r["detail"]) for r in rows)
+
+
+def _visit(conn: sqlite3.Connection, fecha: str) -> int:
+    pid = conn.execute("SELECT paciente_id FROM pacientes LIMIT 1").fetchone()
+    if pid is None:
+        paciente_id = PatientRepo(conn).create(
+            PatientUpsert(None, "12345678", "Ana", "Perez", comentario="")
+        )
+    else:
+        paciente_id = int(pid[0])
+    return VisitCrud(conn).create(
+        VisitCreate(paciente_id=paciente_id, fecha_consulta=fecha, forma_pago="efectivo")
+    )
+
+
+def test_day_range_is_inclusive():
+    assert day_range("2026-03-01", "2026-03-31") == ("2026-03-01", "2026-04-01")
+    assert day_range("2026-03-05") == ("2026-03-05", "2026-03-06")
+
+
+def test_date_range_includes_both_ends(conn: sqlite3.Connection):
+    _visit(conn, "2026-03-01 00:00:00")
+    _visit(conn, "2026-03-31 23:59:59")
+    _visit(conn, "2026-04-01 00:00:00")
+
+    rows = VisitRepo(conn).list_by_date_range("2026-03-01", "2026-03-31")
+    assert [r["fecha_consulta"] for r in rows] == ["2026-03-31 23:59:59", "2026-03-01 00:00:00"]
+
+
+
+def test_malformed_dates_are_domain_errors(conn: sqlite3.Connection):
+    with pytest.raises(DomainError, match="Fecha inválida"):
+        VisitRepo(conn).list_by_date_range("2026-13-01", "2026-03-31")
+    with pytest.raises(DomainError, match="Fecha inválida"):
+        StudyRepo(conn).list_admin_page(StudyFilter(enviado_from="01/03/2026"))
+
+def test_migration_normalizes_legacy_values(conn: sqlite3.Connection, monkeypatch):
+    _visit(conn, "2026-03-01 08:00:00")
+    conn.execute("UPDATE citas SET fecha_consulta='2026-03-02T09:15:00.123'")
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+
+    migrate(conn)
+
+    fecha = conn.execute("SELECT fecha_consulta FROM citas").fetchone()[0]
+    assert fecha == "2026-03-02 09:15:00"
+    assert schema.schema_version(conn) == schema.latest_version()
+
+
+def test_visit_range_plan_uses_index_without_sort(conn: sqlite3.Connection):
+    plan = _plan_of(conn, lambda: VisitRepo(conn).list_by_date_range("2026-01-01", "2026-01-31"))
+    assert "idx_citas_fecha" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_patient_history_plan_uses_index_without_sort(conn: sqlite3.Connection):
+    plan = _plan_of(conn, lambda: VisitRepo(conn).list_for_patient(1))
+    assert "idx_citas_paciente_fecha" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_studies_listing_plan_is_ordered_by_index(conn: sqlite3.Connection):
+    plan = _plan_of(conn, lambda: StudyRepo(conn).list_admin_filtered())
+    assert "idx_estudios_ordenado_en" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_studies_sent_range_plan_uses_an_index(conn: sqlite3.Connection):
+    plan = _plan_of(
+        conn,
+        lambda: StudyRepo(conn).list_admin_filtered(
+            enviado_from="2026-01-01", enviado_to="2026-01-31", include_not_sent=False
+        ),
+    )
+    assert "SCAN e\n" not in plan + "\n"
+    assert "idx_estudios_enviado_en" in plan or "idx_estudios_ordenado_en" in plan
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from consultorio.db.connection import ConnectionManager, connect
+from consultorio.db.schema import migrate
+from consultorio.db.tracing import SqlTracer, install_slow_log, normalize_sql, slow_log
+from consultorio.repos.patients import PatientRepo, PatientUpsert
+from consultorio.ui.windows.diagnostics import recent_rows
+
+
+@pytest.fixture
+def tracer() -> SqlTracer:
+    return SqlTracer(slow_ms=10_000, recent=5)
+
+
+@pytest.fixture
+def conn(tmp_path: Path, tracer: SqlTracer):
+    c = connect(tmp_path / "t.db", wal_mode=False, tracer=tracer)
+    migrate(c)
+    yield c
+    c.close()
+
+
+def _stat(tracer: SqlTracer, prefix: str):
+    return next(s for s in tracer.stats() if s.sql.startswith(prefix))
+
+
+def test_normalize_sql_groups_literals_and_in_lists():
+    a = normalize_sql("SELECT *  FROM estudios\n WHERE estado_actual = 'enviado' AND x IN (?, ?)")
+    b = normalize_sql("SELECT * FROM estudios WHERE estado_actual = 'pagado' AND x IN (?,?,?,?)")
+    assert a == b == "SELECT * FROM estudios WHERE estado_actual = ? AND x IN (?, ...)"
+    assert normalize_sql("RELEASE uow_1") == "RELEASE uow_1"
+
+
+def test_disabled_tracing_leaves_a_plain_connection(tmp_path: Path):
+    c = connect(tmp_path / "plain.db", wal_mode=False)
+    try:
+        assert type(c) is sqlite3.Connection
+        assert type(c.execute("SELECT 1")) is sqlite3.Cursor
+    finally:
+        c.close()
+
+
+def test_counts_calls_and_rows(conn: sqlite3.Connection, tracer: SqlTracer):
+    repo = PatientRepo(conn)
+    for i in range(3):
+        repo.create(PatientUpsert(None, f"1234567{i}", "Ana", f"Perez{i}", comentario=""))
+    tracer.reset()
+
+    conn.execute("SELECT paciente_id FROM pacientes WHERE paciente_id > ?", (0,)).fetchall()
+    conn.execute("SELECT paciente_id FROM pacientes WHERE paciente_id > ?", (1,)).fetchall()
+    assert conn.execute("SELECT cedula FROM pacientes WHERE paciente_id = 1").fetchone()
+    assert len(list(conn.execute("SELECT nombres FROM pacientes"))) == 3
+    conn.execute("UPDATE pacientes SET comentario = 'x'")
+
+    stat = _stat(tracer, "SELECT paciente_id")
+    assert (stat.calls, stat.rows) == (2, 5)
+    assert 0 < stat.max_ms <= stat.total_ms
+    assert stat.mean_ms == pytest.approx(stat.total_ms / 2)
+    assert _stat(tracer, "SELECT cedula").rows == 1
+    assert _stat(tracer, "SELECT nombres").rows == 3
+    assert _stat(tracer, "UPDATE pacientes").rows == 3
+
+    recent = tracer.recent_queries()
+    assert len(recent) == 5
+    assert recent[0].sql.startswith("UPDATE pacientes")
+
+
+
+def test_recent_rows_are_keyed_by_a_sequence_that_never_repeats(
+    conn: sqlite3.Connection, tracer: SqlTracer
+):
+    seen: set[str] = set()
+    for i in range(3):
+        for _ in range(7):
+            conn.execute("SELECT 1").fetchall()
+        iids = [iid for iid, _vals, _tags in recent_rows(tracer.recent_queries(), slow_ms=1e9)]
+        assert len(iids) == 5 and not seen & set(iids)
+        seen |= set(iids)
+        if i == 1:
+            tracer.reset()
+    seqs = [r.seq for r in tracer.recent_queries()]
+    assert seqs == sorted(seqs, reverse=True)
+
+def test_slow_queries_are_logged_once_without_parameters(
+    conn: sqlite3.Connection, tracer: SqlTracer, caplog
+):
+    tracer.slow_ms = 0.0
+    with caplog.at_level(logging.WARNING, logger=slow_log.name):
+        conn.execute("SELECT 1 WHERE 'secreto' = ?", ("12345678",)).fetchall()
+    lines = [r.getMessage() for r in caplog.records if r.name == slow_log.name]
+    assert len(lines) == 1
+    assert "SELECT ? WHERE ? = ?" in lines[0]
+    assert "secreto" not in lines[0] and "12345678" not in lines[0]
+
+
+def test_manager_traces_writer_and_readers(tmp_path: Path, tracer: SqlTracer):
+    db = ConnectionManager(tmp_path / "m.db", wal_mode=True, readers=1, tracer=tracer)
+    try:
+        migrate(db.writer)
+        PatientRepo(db).create(PatientUpsert(None, "12345678", "Ana", "Perez", comentario=""))
+        tracer.reset()
+        assert PatientRepo(db).get(1) is not None
+    finally:
+        db.close()
+    stat = _stat(tracer, "SELECT * FROM pacientes")
+    assert (stat.calls, stat.rows) == (1, 1)
+
+
+def test_slow_log_rotates(tmp_path: Path):
+    path = tmp_path / "logs" / "lentas.log"
+    install_slow_log(path, max_bytes=200, backups=2)
+    try:
+        for i in range(20):
+            slow_log.warning("%d ms SELECT * FROM pacientes WHERE paciente_id = ?", i)
+    finally:
+        for h in list(slow_log.handlers):
+            slow_log.removeHandler(h)
+            h.close()
+        slow_log.propagate = True
+    assert path.exists()
+    assert (tmp_path / "logs" / "lentas.log.1").exists()
+    assert not (tmp_path / "logs" / "lentas.log.3").exists()
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from consultorio.ui.widgets.tree_sync import diff_rows
+
+
+def _rows(*spec: tuple[str, str]) -> list[tuple[str, tuple[str, ...], tuple[str, ...]]]:
+    return [(iid, (value,), ()) for iid, value in spec]
+
+
+def test_unchanged_rows_are_not_touched():
+    rows = _rows(("1", "a"), ("2", "b"))
+    shown = {iid: (values, tags) for iid, values, tags in rows}
+
+    diff = diff_rows(["1", "2"], shown, rows)
+
+    assert (diff.remove, diff.insert, diff.update, diff.move) == ([], [], [], [])
+
+
+def test_insert_update_and_remove():
+    shown = {iid: (v, t) for iid, v, t in _rows(("1", "a"), ("2", "b"), ("3", "c"))}
+
+    diff = diff_rows(["1", "2", "3"], shown, _rows(("0", "z"), ("1", "a"), ("3", "C")))
+
+    assert diff.remove == ["2"]
+    assert diff.insert == [(0, "0")]
+    assert diff.update == ["3"]
+    assert diff.move == []
+
+
+def test_reordered_rows_are_moved():
+    shown = {iid: (v, t) for iid, v, t in _rows(("1", "a"), ("2", "b"))}
+
+    diff = diff_rows(["1", "2"], shown, _rows(("2", "b"), ("1", "a")))
+
+    assert diff.move == [(0, "2"), (1, "1")]
+    assert diff.update == []
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from pathlib import Path
+
+import pytest
+
+from consultorio.db.connection import ConnectionManager, connect
+from consultorio.db.schema import migrate
+from consultorio.db.uow import in_unit_of_work, read_transaction, unit_of_work
+from consultorio.repos.patients import PatientRepo, PatientUpsert
+
+
+@pytest.fixture
+def conn(tmp_path: Path):
+    c = connect(tmp_path / "t.db", wal_mode=False)
+    migrate(c)
+    yield c
+    c.close()
+
+
+def _patient(i: int) -> PatientUpsert:
+    return PatientUpsert(None, f"{10000000 + i}", "Ana", f"Perez {i}", comentario="")
+
+
+def _count(conn: sqlite3.Connection) -> int:
+    return int(conn.execute("SELECT COUNT(*) FROM pacientes").fetchone()[0])
+
+
+def test_repos_commit_once_inside_unit_of_work(conn: sqlite3.Connection):
+    seen: list[str] = []
+    conn.set_trace_callback(seen.append)
+    repo = PatientRepo(conn)
+    with unit_of_work(conn):
+        for i in range(5):
+            repo.create(_patient(i))
+        assert in_unit_of_work(conn)
+    conn.set_trace_callback(None)
+
+    assert not in_unit_of_work(conn)
+    assert seen.count("COMMIT") == 1
+    assert _count(conn) == 5
+
+
+def test_error_rolls_back_everything(conn: sqlite3.Connection):
+    repo = PatientRepo(conn)
+    with pytest.raises(RuntimeError):
+        with unit_of_work(conn):
+            repo.create(_patient(1))
+            raise RuntimeError("falla")
+    assert _count(conn) == 0
+
+
+def test_nested_block_rolls_back_to_savepoint(conn: sqlite3.Connection):
+    repo = PatientRepo(conn)
+    with unit_of_work(conn):
+        repo.create(_patient(1))
+        with pytest.raises(RuntimeError):
+            with unit_of_work(conn):
+                repo.create(_patient(2))
+                raise RuntimeError("solo este")
+        repo.create(_patient(3))
+
+    cedulas = [r[0] for r in conn.execute("SELECT cedula FROM pacientes ORDER BY cedula")]
+    assert cedulas == ["10000001", "10000003"]
+
+
+def test_connection_manager_reads_see_pending_writes(tmp_path: Path):
+    db = ConnectionManager(tmp_path / "m.db", wal_mode=True)
+    try:
+        migrate(db.writer)
+        repo = PatientRepo(db)
+        with unit_of_work(db):
+            pid = repo.create(_patient(1))
+            assert repo.get(pid) is not None
+        assert repo.get(pid) is not None
+    finally:
+        db.close()
+
+
+def test_read_transaction_sees_one_snapshot(tmp_path: Path):
+    db = ConnectionManager(tmp_path / "wal.db", wal_mode=True, readers=1)
+    try:
+        migrate(db.writer)
+        repo = PatientRepo(db)
+        repo.create(_patient(1))
+        with read_transaction(db) as c:
+            before = int(c.execute("SELECT COUNT(*) FROM pacientes").fetchone()[0])
+            repo.create(_patient(2))  # confirma en el escritor mientras se lee
+            after = int(c.execute("SELECT COUNT(*) FROM pacientes").fetchone()[0])
+        assert before == after == 1
+        assert int(db.execute("SELECT COUNT(*) FROM pacientes").fetchone()[0]) == 2
+    finally:
+        db.close()
+
+
+def test_unit_of_work_waits_for_another_threads_open_write(tmp_path: Path):
+    db = ConnectionManager(tmp_path / "w.db", wal_mode=True, readers=1)
+    try:
+        migrate(db.writer)
+        repo = PatientRepo(db)
+        # Escritura sin commit en este hilo (como entre un execute y su commit)
+        db.execute("INSERT INTO centros_histologicos (nombre) VALUES ('pendiente')")
+
+        def worker() -> None:
+            with unit_of_work(db):
+                repo.create(_patient(1))
+
+        t = threading.Thread(target=worker)
+        t.start()
+        t.join(timeout=0.2)
+        assert t.is_alive()  # espera el lock: no confirma lo pendiente de este hilo
+        db.rollback()
+        t.join(timeout=5)
+        assert not t.is_alive()
+
+        assert db.execute("SELECT COUNT(*) FROM centros_histologicos").fetchone()[0] == 0
+        assert db.execute("SELECT COUNT(*) FROM pacientes").fetchone()[0] == 1
+    finally:
+        db.close()
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import dataclasses
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from consultorio.config import ClinicLimits, load_config
+from consultorio.db.connection import connect
+from consultorio.db.schema import migrate
+from consultorio.domain.rules import DomainError
+from consultorio.repos.patients import PatientRepo, PatientUpsert
+from consultorio.repos.studies import StudyRepo
+from consultorio.repos.visits import VisitCreate
+from consultorio.services.visits import VisitService
+
+
+@pytest.fixture
+def conn(tmp_path: Path):
+    c = connect(tmp_path / "t.db", wal_mode=False)
+    migrate(c)
+    yield c
+    c.close()
+
+
+@pytest.fixture
+def paciente_id(conn: sqlite3.Connection) -> int:
+    return PatientRepo(conn).create(PatientUpsert(None, "12345678", "Ana", "Perez", comentario=""))
+
+
+def _count(conn: sqlite3.Connection, table: str) -> int:
+    return int(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0])
+
+
+def test_visit_and_studies_are_created_together(conn: sqlite3.Connection, paciente_id: int):
+    commits: list[str] = []
+    conn.set_trace_callback(lambda sql: commits.append(sql) if sql == "COMMIT" else None)
+
+    cita_id = VisitService(conn, load_config()).create_with_studies(
+        VisitCreate(paciente_id=paciente_id, forma_pago="efectivo"),
+        citologias=["PAP", "MD", "MI"],
+        biopsias=["Cono"],
+    )
+    conn.set_trace_callback(None)
+
+    rows = conn.execute(
+        "SELECT tipo, subtipo, estado_actual FROM estudios WHERE cita_id=? ORDER BY estudio_id",
+        (cita_id,),
+    ).fetchall()
+    assert [tuple(r) for r in rows] == [
+        ("citologia", "PAP", "ordenado"),
+        ("citologia", "MD", "ordenado"),
+        ("citologia", "MI", "ordenado"),
+        ("biopsia", "Cono", "ordenado"),
+    ]
+    assert len(commits) == 1
+
+
+def test_failure_rolls_back_the_visit(conn: sqlite3.Connection, paciente_id: int, monkeypatch):
+    def boom(self, items):
+        raise sqlite3.OperationalError("disco lleno")
+
+    monkeypatch.setattr(StudyRepo, "insert_many", boom)
+    with pytest.raises(sqlite3.OperationalError):
+        VisitService(conn, load_config()).create_with_studies(
+            VisitCreate(paciente_id=paciente_id, forma_pago="efectivo"), citologias=["PAP"]
+        )
+    assert _count(conn, "citas") == 0
+
+
+def test_limits_come_from_config(conn: sqlite3.Connection, paciente_id: int):
+    cfg = load_config()
+    cfg = dataclasses.replace(
+        cfg,
+        clinic=dataclasses.replace(
+            cfg.clinic,
+            limits=ClinicLimits(max_cytologies_per_visit=1, max_biopsies_per_visit=1),
+        ),
+    )
+    service = VisitService(conn, cfg)
+    v = VisitCreate(paciente_id=paciente_id, forma_pago="efectivo")
+
+    with pytest.raises(DomainError):
+        service.create_with_studies(v, citologias=["PAP", "MD"])
+    with pytest.raises(DomainError):
+        service.create_with_studies(v, biopsias=["Cono", "Vulvar"])
+    assert _count(conn, "citas") == 0
+
+    service.create_with_studies(v, citologias=["PAP"], biopsias=["Cono"])
+    assert _count(conn, "estudios") == 2